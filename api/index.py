@@ -11,14 +11,15 @@ try:
     
     from backend.app import create_app
     from backend.models import db, User
+    from backend.migrations import upgrade_database
     
     # Create Flask app
     app = create_app()
     
     # Initialize database
     with app.app_context():
-        # Create tables
-        db.create_all()
+        # Create tables and upgrade existing databases
+        upgrade_database()
         
         # Initialize with default test user if needed
         if User.query.count() == 0:
@@ -27,7 +28,7 @@ try:
                 username='admin',
                 email='admin@example.com',
                 phone='13800000000',
-                balance=10000.00,
+                balance=1000000,  # 10000元（以分保存）
                 is_admin=True
             )
             admin_user.set_password('admin123')
@@ -37,7 +38,7 @@ try:
                 username='user001',
                 email='user001@example.com',
                 phone='13800000001',
-                balance=500.00,
+                balance=50000,  # 500元
                 is_admin=False
             )
             test_user.set_password('123456')
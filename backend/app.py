@@ -2,11 +2,31 @@
 Flask应用主文件
 """
 import os
+import atexit
 from pathlib import Path
-from flask import Flask, render_template
+from flask import Flask, jsonify
 from flask_cors import CORS
 from backend.config import Config
 from backend.models import db
+from backend.migrations import upgrade_database
+
+def start_order_expiry(app):
+    """启动待支付订单超时调度（同时定期结算平台抽成），进程退出时停止"""
+    from backend.scheduler import OrderExpiryScheduler
+    scheduler = OrderExpiryScheduler(
+        app.config['PENDING_ORDER_TTL'], app.config['ORDER_EXPIRY_BATCH_SIZE'], app.config['COMMISSION_SETTLE_INTERVAL']
+    )
+    if app.extensions.setdefault('order_expiry', scheduler) is not scheduler:
+        return app.extensions['order_expiry']
+    scheduler.start(app)
+    atexit.register(stop_order_expiry, app)
+    return scheduler
+
+def stop_order_expiry(app):
+    """停止待支付订单超时调度（进程退出时自动调用），之后的请求会重新启动"""
+    scheduler = app.extensions.pop('order_expiry', None)
+    if scheduler:
+        scheduler.stop()
 
 def create_app():
     """创建Flask应用"""
@@ -15,20 +35,28 @@ def create_app():
     template_path = os.path.join(base_path, 'frontend', 'templates')
     static_path = os.path.join(base_path, 'frontend', 'static')
     
+    # 静态文件由 init_assets 注册的路由提供（内容哈希地址、预压缩）
     app = Flask(__name__, 
                 template_folder=template_path,
-                static_folder=static_path,
-                static_url_path='/static')
+                static_folder=None)
     
     # 加载配置
     app.config.from_object(Config)
     
+    # JSON 编码（安装了 orjson 时使用 orjson）
+    from backend.utils.json_provider import init_json
+    init_json(app)
+    
     # 启用CORS
     CORS(app)
     
     # 初始化数据库
     db.init_app(app)
     
+    # 服务端会话
+    from backend.sessions import init_session
+    init_session(app)
+    
     # 注册蓝图
     from backend.routes.auth import auth_bp
     from backend.routes.account import account_bp
@@ -40,63 +68,89 @@ def create_app():
     app.register_blueprint(order_bp, url_prefix='/api/orders')
     app.register_blueprint(user_bp, url_prefix='/api/users')
     
+    # 密码哈希任务排队已满
+    from backend.utils.passwords import PasswordHasherBusy
+    
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        return jsonify({'success': False, 'message': '系统繁忙，请稍后再试'}), 503
+    
+    # 注册命令行任务
+    from backend.commands import register_commands
+    register_commands(app)
+    
+    # 待支付订单超时调度：收到第一个请求时启动，命令行任务和脚本中不会启动
+    if app.config['ORDER_EXPIRY_ENABLED']:
+        @app.before_request
+        def ensure_order_expiry():
+            if 'order_expiry' not in app.extensions:
+                start_order_expiry(app)
+    
     # 静态文件路由 - 在Vercel上确保静态文件被提供
-    from flask import send_from_directory
+    from backend.assets import init_assets
+    init_assets(app, static_path)
     
-    @app.route('/static/<path:filename>')
-    def serve_static(filename):
-        """提供静态文件"""
-        return send_from_directory(static_path, filename)
+    # 前端路由：页面只在首次访问时渲染，之后直接返回缓存的内容
+    from backend.pages import PageShells, render_page
+    from backend.sessions import sessionless
+    app.extensions['page_shells'] = PageShells()
     
-    # 前端路由
     @app.route('/')
+    @sessionless
     def index():
         """首页"""
-        return render_template('index.html')
+        return render_page('index.html')
     
     @app.route('/login')
+    @sessionless
     def login_page():
         """登录页面"""
-        return render_template('login.html')
+        return render_page('login.html')
     
     @app.route('/register')
+    @sessionless
     def register_page():
         """注册页面"""
-        return render_template('register.html')
+        return render_page('register.html')
     
     @app.route('/rental')
+    @sessionless
     def rental_page():
         """租赁页面"""
-        return render_template('rental.html')
+        return render_page('rental.html')
     
     @app.route('/publish')
+    @sessionless
     def publish_page():
         """发布账号页面"""
-        return render_template('publish.html')
+        return render_page('publish.html')
     
     @app.route('/profile')
+    @sessionless
     def profile_page():
         """个人中心页面"""
-        return render_template('profile.html')
+        return render_page('profile.html')
     
     @app.route('/activity')
+    @sessionless
     def activity_page():
         """出币活动页面"""
-        return render_template('activity.html')
+        return render_page('activity.html')
     
     @app.route('/admin')
+    @sessionless
     def admin_page():
         """管理员后台页面"""
-        return render_template('admin.html')
+        return render_page('admin.html')
     
     return app
 
 if __name__ == '__main__':
     app = create_app()
     
-    # 创建数据库表
+    # 创建数据库表并升级已有数据库
     with app.app_context():
-        db.create_all()
+        upgrade_database()
         print("数据库表创建成功！")
     
     # 运行应用
@@ -0,0 +1,158 @@
+"""
+静态资源
+
+模板通过 asset_url('css/style.css') 生成带内容哈希的地址 /static/css/style.css?v=<哈希>，
+哈希与当前内容一致的请求返回一年有效的 immutable 缓存头；不带哈希的请求仍按 ETag
+重新验证。CSS 中的 url('/static/...') 在输出时同样改写为带哈希的地址，图片更新后
+引用它的 CSS 的哈希也随之变化。
+
+资源表在首次使用时生成，文本类资源在此时预先压缩为 gzip（安装了 brotli 时同时生成 br），
+请求时按 Accept-Encoding 直接返回压缩后的内容；调试模式或 TEMPLATES_AUTO_RELOAD 开启时
+文件修改后自动重新生成。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import abort, current_app, request
+from backend.sessions import sessionless
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 512
+
+CSS_STATIC_URL = re.compile(r"""url\((['"]?)/static/([^'")?#]+)\1\)""")
+
+
+def auto_reload():
+    """开发时模板和静态文件修改后立即生效（调试模式或 TEMPLATES_AUTO_RELOAD）"""
+    return current_app.debug or bool(current_app.config['TEMPLATES_AUTO_RELOAD'])
+
+
+class Asset:
+    """一个静态文件的内容、哈希及压缩版本"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.hash = hashlib.sha256(body).hexdigest()[:12]
+        self.encodings = {}
+        if mimetype.startswith(COMPRESSIBLE_TYPES) and len(body) >= MIN_COMPRESS_SIZE:
+            self.encodings['gzip'] = gzip.compress(body, compresslevel=9)
+            if brotli is not None:
+                self.encodings['br'] = brotli.compress(body)
+
+
+class AssetManifest:
+    """静态目录下全部文件的资源表"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._assets = None
+        self._mtimes = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        """静态目录下的文件及修改时间"""
+        mtimes = {}
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(root, name)
+                mtimes[os.path.relpath(path, self.folder).replace(os.sep, '/')] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def _build(self, mtimes):
+        assets = {}
+        # 先处理其他文件，CSS 改写引用地址时需要用到它们的哈希
+        for filename in sorted(mtimes, key=lambda name: name.endswith('.css')):
+            with open(os.path.join(self.folder, filename), 'rb') as f:
+                body = f.read()
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            if mimetype == 'text/css':
+                body = self._rewrite_css(body.decode('utf-8'), assets).encode('utf-8')
+            assets[filename] = Asset(body, mimetype)
+        return assets
+
+    @staticmethod
+    def _rewrite_css(css, assets):
+        def replace(match):
+            quote, filename = match.groups()
+            asset = assets.get(filename)
+            if asset is None:
+                return match.group(0)
+            return f'url({quote}/static/{filename}?v={asset.hash}{quote})'
+        return CSS_STATIC_URL.sub(replace, css)
+
+    def assets(self):
+        """资源表，首次调用时生成；开发时文件有变化则重新生成"""
+        reload = auto_reload()
+        if self._assets is not None and not reload:
+            return self._assets
+        with self._lock:
+            mtimes = self._scan() if reload or self._assets is None else self._mtimes
+            if self._assets is None or mtimes != self._mtimes:
+                self._assets, self._mtimes = self._build(mtimes), mtimes
+            return self._assets
+
+    def url(self, filename):
+        """带内容哈希的静态文件地址"""
+        asset = self.assets().get(filename)
+        if asset is None:
+            return f'/static/{filename}'
+        return f'/static/{filename}?v={asset.hash}'
+
+    def send(self, filename):
+        """返回静态文件，地址中的哈希与内容一致时允许长期缓存"""
+        asset = self.assets().get(filename)
+        if asset is None:
+            abort(404)
+        return send_asset(asset, immutable=request.args.get('v') == asset.hash)
+
+
+def send_asset(asset, immutable=False):
+    """
+    返回资源内容，按 Accept-Encoding 选择预压缩的版本
+
+    immutable 为 True 时允许浏览器缓存一年，否则每次使用前按 ETag 重新验证。
+    """
+    encoding = next(
+        (name for name in ('br', 'gzip') if name in asset.encodings and request.accept_encodings[name]),
+        None
+    )
+    body = asset.encodings[encoding] if encoding else asset.body
+    response = current_app.response_class(body, mimetype=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.encodings:
+        response.vary.add('Accept-Encoding')
+    # 不同编码是不同的表示，ETag 需要区分
+    response.set_etag(f'{asset.hash}-{encoding}' if encoding else asset.hash)
+
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def init_assets(app, folder):
+    """注册静态文件路由和模板函数 asset_url"""
+    manifest = AssetManifest(folder)
+    app.extensions['assets'] = manifest
+    
+    @sessionless
+    def static(filename):
+        return manifest.send(filename)
+    
+    app.add_url_rule('/static/<path:filename>', 'static', static)
+    app.add_template_global(manifest.url, 'asset_url')
+    return manifest
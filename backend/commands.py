@@ -0,0 +1,99 @@
+"""
+命令行任务
+
+通过 Flask CLI 执行，例如：flask --app backend.app recompute-prices
+"""
+import time
+import click
+from backend.models.account import recompute_order_amounts
+from backend.models.commission import settle_commissions
+from backend.models.ledger import snapshot_balances, reconcile_ledger, RECONCILE_CHUNK_SIZE
+from backend.models.order import expire_pending_orders
+from backend.utils.money import to_yuan
+
+
+def register_commands(app):
+    """注册命令行任务"""
+
+    @app.cli.command('recompute-prices')
+    @click.option('--batch-size', default=1000, show_default=True, help='每批更新的账号数')
+    @click.option('--with-deposit', is_flag=True, help='同时按订单金额重置押金（会覆盖卖家修改过的押金）')
+    def recompute_prices(batch_size, with_deposit):
+        """按当前比例表重算全部账号的订单金额"""
+        total = recompute_order_amounts(batch_size, with_deposit=with_deposit)
+        click.echo(f'已更新 {total} 个账号的订单金额{"和押金" if with_deposit else ""}')
+
+    @app.cli.command('settle-commissions')
+    def settle_commissions_command():
+        """将未结算的平台抽成计入平台账户"""
+        total = settle_commissions()
+        click.echo(f'已结算平台抽成 {to_yuan(total):.2f}')
+
+    @app.cli.command('expire-orders')
+    @click.option('--loop', is_flag=True, help='持续运行，作为独立的超时扫描进程（同时定期结算平台抽成）')
+    def expire_orders(loop):
+        """取消超时未支付的订单并释放账号"""
+        from backend.scheduler import OrderExpiryScheduler, IDLE_INTERVAL
+        
+        if not loop:
+            total = expire_pending_orders(app.config['PENDING_ORDER_TTL'], app.config['ORDER_EXPIRY_BATCH_SIZE'])
+            click.echo(f'已取消 {total} 个超时订单')
+            return
+        
+        scheduler = OrderExpiryScheduler(
+            app.config['PENDING_ORDER_TTL'], app.config['ORDER_EXPIRY_BATCH_SIZE'], app.config['COMMISSION_SETTLE_INTERVAL']
+        )
+        while True:
+            delay = scheduler.run_once()
+            time.sleep(IDLE_INTERVAL if delay is None else min(delay, IDLE_INTERVAL))
+
+    @app.cli.command('sweep-sessions')
+    def sweep_sessions():
+        """删除全部过期的服务端会话"""
+        from backend.sessions import ServerSessionInterface
+        
+        if not isinstance(app.session_interface, ServerSessionInterface):
+            click.echo('当前 SESSION_TYPE 不使用服务端会话存储')
+            return
+        
+        store = app.session_interface.store
+        total = 0
+        while True:
+            removed = store.sweep()
+            total += removed
+            if not removed:
+                break
+        click.echo(f'已删除 {total} 个过期会话，当前有效会话 {store.count()} 个')
+
+    @app.cli.command('sweep-idempotency-keys')
+    def sweep_idempotency_keys_command():
+        """删除全部过期的幂等键"""
+        from backend.idempotency import sweep_idempotency_keys
+        
+        total = 0
+        while True:
+            removed = sweep_idempotency_keys()
+            total += removed
+            if not removed:
+                break
+        click.echo(f'已删除 {total} 个过期幂等键')
+
+    @app.cli.command('snapshot-ledger')
+    def snapshot_ledger():
+        """为有新流水的用户生成余额快照（建议定期执行）"""
+        total = snapshot_balances()
+        click.echo(f'已更新 {total} 个用户的余额快照')
+
+    @app.cli.command('reconcile-ledger')
+    @click.option('--chunk-size', default=RECONCILE_CHUNK_SIZE, show_default=True, help='每批读取的行数')
+    def reconcile_ledger_command(chunk_size):
+        """核对资金流水与用户余额"""
+        result = reconcile_ledger(chunk_size)
+        click.echo(f'已核对 {result["entries"]} 条分录、{result["users"]} 个用户')
+        for account, total in sorted(result['accounts'].items()):
+            click.echo(f'  {account}: {to_yuan(total):.2f}')
+        for problem in result['problems']:
+            click.echo(problem)
+        if result['problems']:
+            raise click.ClickException(f'发现 {len(result["problems"])} 处不一致')
+        click.echo('账目一致')
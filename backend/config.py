@@ -25,5 +25,57 @@ class Config:
     SQLALCHEMY_ECHO = False
     
     # 会话配置
-    SESSION_TYPE = 'filesystem'
-    PERMANENT_SESSION_LIFETIME = 86400  # 24小时
+    # cookie：Flask 签名 Cookie；memory：进程内存储（单进程）；sqlalchemy：数据库 sessions 表（多进程共享）
+    # Vercel 上各实例不共享临时数据库，继续使用 Cookie 会话
+    SESSION_TYPE = os.environ.get('SESSION_TYPE', 'cookie' if os.environ.get('VERCEL') else 'sqlalchemy')
+    PERMANENT_SESSION_LIFETIME = 86400  # 24小时，服务端会话的有效期
+    SESSION_MEMORY_MAXSIZE = 10000  # memory 存储最多保存的会话数
+    SESSION_SWEEP_INTERVAL = 300  # 请求中顺带清理过期会话的间隔（秒）
+    
+    # 密码哈希配置
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # Werkzeug 格式，修改后登录时自动升级
+    # 哈希进程数，0 表示在请求线程中计算（Vercel 不支持进程池）
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0 if os.environ.get('VERCEL') else os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING = 16  # 同时执行和排队的哈希任务上限
+    PASSWORD_HASH_TIMEOUT = 5  # 排队等待的最长时间（秒），超时返回503
+    
+    # 开发时设置 TEMPLATES_AUTO_RELOAD=1，页面和静态文件修改后立即生效；未设置时跟随调试模式
+    TEMPLATES_AUTO_RELOAD = os.environ.get('TEMPLATES_AUTO_RELOAD') == '1' or None
+    
+    # 列表接口响应压缩
+    GZIP_MIN_SIZE = 1024  # 响应体不小于该字节数时压缩
+    GZIP_LEVEL = 6
+    
+    # 单笔充值、提现金额上限（元），超出时返回400
+    MAX_TRANSACTION_AMOUNT = 1000000
+    
+    # 抽奖奖品：(名称, 金额, 权重)，权重之和不要求为100
+    LOTTERY_PRIZES = [
+        ('一等奖', 100, 1),
+        ('二等奖', 50, 5),
+        ('三等奖', 20, 10),
+        ('四等奖', 10, 20),
+        ('五等奖', 5, 30),
+        ('谢谢参与', 0, 34),
+    ]
+    LOTTERY_MAX_BATCH = 10  # 一次请求最多连抽次数
+    
+    # 批量发布账号
+    ACCOUNT_BULK_MAX = 10000  # 一次请求最多发布的账号数
+    
+    # 导入账号库存（CSV / NDJSON）
+    IMPORT_CHUNK_SIZE = 1000  # 每个事务写入的行数
+    IMPORT_MAX_ERRORS = 100  # 导入报告中最多列出的错误行数
+    
+    # 幂等键：下单、支付、充值、提现、批量发布请求带 Idempotency-Key 时，相同的键在有效期内只执行一次
+    IDEMPOTENCY_KEY_TTL = 86400  # 保存响应的时间（秒）
+    IDEMPOTENCY_SWEEP_INTERVAL = 300  # 请求中顺带清理过期幂等键的间隔（秒）
+    
+    # 待支付订单超时配置
+    PENDING_ORDER_TTL = int(os.environ.get('PENDING_ORDER_TTL', 900))  # 超时时间（秒）
+    ORDER_EXPIRY_BATCH_SIZE = 500  # 每个事务取消的订单数
+    # 是否在应用进程内运行超时扫描；多进程部署时关闭，改为单独运行 flask expire-orders --loop
+    ORDER_EXPIRY_ENABLED = os.environ.get('ORDER_EXPIRY_ENABLED', '0' if os.environ.get('VERCEL') else '1') == '1'
+    
+    # 平台抽成结算：超时扫描线程（或 expire-orders --loop 进程）每隔该秒数结算一次
+    COMMISSION_SETTLE_INTERVAL = int(os.environ.get('COMMISSION_SETTLE_INTERVAL', 3600))
@@ -0,0 +1,155 @@
+"""
+幂等键
+
+下单、支付、充值、提现接口支持 Idempotency-Key 请求头：客户端超时重试时带上相同的键，
+服务端直接返回第一次的响应，不会重复创建订单或重复扣款。
+
+视图执行期间 db.session.commit() 只 flush 不提交；视图提交后，幂等键记录连同响应在
+同一个事务中写入并提交，因此不会出现视图的修改已生效而响应没有保存的情况。视图回滚
+（校验失败、余额不足、异常）时不写入记录，客户端可以用同一个键重试。并发的相同请求
+各自执行视图，只有先提交的一个生效，其余的在写入记录时因唯一约束冲突整体回滚，
+返回先提交的响应。此后的重复请求直接返回保存的响应（响应头 Idempotent-Replayed: true），
+同一个键用于不同的请求内容返回422。过期记录由清理任务按 expires_at 分批删除。
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from backend.models import db, IdempotencyKey
+from backend.utils.auth import current_user_id
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+SWEEP_BATCH_SIZE = 1000
+CLAIM_ATTEMPTS = 3  # 冲突的记录随即被删除（过期清理）时重新执行视图的次数
+
+_table = IdempotencyKey.__table__
+
+
+def _fingerprint():
+    """请求方法、地址和请求体的哈希"""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _load(user_id, key):
+    return db.session.execute(
+        select(_table).where(_table.c.user_id == user_id, _table.c.key == key)
+    ).first()
+
+
+def _existing_response(record, fingerprint):
+    """已有记录时的响应：返回保存的响应，或者说明冲突的原因"""
+    if record.fingerprint != fingerprint:
+        return jsonify({'success': False, 'message': '该幂等键已用于其他请求'}), 422
+    response = current_app.response_class(record.body, status=record.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+@contextmanager
+def _deferred_commit():
+    """
+    视图执行期间把 db.session 的 commit 改为 flush，产生 {'committed': 视图是否已提交}
+
+    视图提交后又回滚时 committed 恢复为 False。
+    """
+    session = db.session()
+    state = {'committed': False}
+    rollback = session.rollback
+
+    def deferred_commit():
+        session.flush()
+        state['committed'] = True
+
+    def deferred_rollback():
+        rollback()
+        state['committed'] = False
+
+    session.commit, session.rollback = deferred_commit, deferred_rollback
+    try:
+        yield state
+    finally:
+        del session.commit, session.rollback
+
+
+def idempotent(view):
+    """支持 Idempotency-Key 请求头的接口（放在 login_required 之后），不带该请求头时照常执行"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'message': f'Idempotency-Key 长度必须为1到{MAX_KEY_LENGTH}个字符'}), 400
+
+        user_id = current_user_id()
+        fingerprint = _fingerprint()
+        record = _load(user_id, key)
+        # 旧版本在处理中写入的记录没有响应，视为已失效
+        if record and record.expires_at > datetime.now() and record.status_code is not None:
+            return _existing_response(record, fingerprint)
+
+        for _ in range(CLAIM_ATTEMPTS):
+            with _deferred_commit() as state:
+                response = current_app.make_response(view(*args, **kwargs))
+
+            # 视图没有提交（提前返回、回滚）或者出错时丢弃全部修改，幂等键保持可用
+            if not state['committed'] or response.status_code >= 500:
+                db.session.rollback()
+                break
+
+            # 幂等键记录、响应与视图的修改在同一个事务中提交
+            now = datetime.now()
+            try:
+                if record:
+                    db.session.execute(delete(_table).where(_table.c.id == record.id))
+                db.session.execute(_table.insert().values(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=fingerprint,
+                    status_code=response.status_code,
+                    body=response.get_data(as_text=True),
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+                ))
+                db.session.commit()
+                break
+            except IntegrityError:
+                # 并发的相同请求已经提交，本次的修改全部撤销
+                db.session.rollback()
+                record = _load(user_id, key)
+                if record is not None:
+                    return _existing_response(record, fingerprint)
+        else:
+            return jsonify({'success': False, 'message': '相同的请求正在处理中，请稍后重试'}), 409
+
+        _maybe_sweep()
+        return response
+    return wrapper
+
+
+def sweep_idempotency_keys(batch_size=SWEEP_BATCH_SIZE):
+    """按 expires_at 索引删除最多 batch_size 个过期幂等键，返回删除数量"""
+    expired = (
+        select(_table.c.id)
+        .where(_table.c.expires_at <= datetime.now())
+        .limit(batch_size)
+    )
+    with db.engine.begin() as conn:
+        return conn.execute(delete(_table).where(_table.c.id.in_(expired))).rowcount
+
+
+def _maybe_sweep():
+    """每隔 IDEMPOTENCY_SWEEP_INTERVAL 秒顺带清理一批过期幂等键"""
+    state = current_app.extensions.setdefault('idempotency', {'next_sweep': 0})
+    if time.monotonic() < state['next_sweep']:
+        return
+    state['next_sweep'] = time.monotonic() + current_app.config['IDEMPOTENCY_SWEEP_INTERVAL']
+    sweep_idempotency_keys()
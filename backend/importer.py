@@ -0,0 +1,255 @@
+"""
+账号库存导入
+
+卖家在表格中维护库存，导出为 CSV 或 NDJSON（每行一个 JSON 对象）后导入。文件按行流式解析，
+每 chunk_size 行校验一次并在一个事务中写入，内存占用与文件大小无关。
+
+每行必须带 external_key（卖家自己的编号）：该卖家已有相同编号的账号时更新账号信息，
+否则发布新账号，因此同一个文件可以重复导入。不合法的行计入 rejected，不影响其他行；
+某一批写入数据库失败时回滚该批，批中各行按写入失败计入 rejected，继续导入后面的行；
+文件本身损坏（编码错误、CSV 格式错误）时停止读取，已读到的合法行照常写入。
+"""
+import csv
+import io
+import json
+import re
+import time
+import uuid
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from backend.models import db, Account
+from backend.models.account import LISTING_OPTIONAL_FIELDS, validate_listing, listing_row
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+MAX_EXTERNAL_KEY_LENGTH = 100
+
+# CSV 表头：字段名或表格中常用的中文列名
+COLUMN_ALIASES = {
+    '外部编号': 'external_key',
+    '收号时间': 'collection_time',
+    '上号时间': 'login_time',
+    '常用地': 'common_location',
+    '区服': 'server_region',
+    '登录方式': 'login_method',
+    '本人人脸': 'face_verification',
+    '段位': 'rank',
+    '总资产': 'total_assets',
+    '纯币资产': 'pure_coin_assets',
+    '等级': 'level',
+    '体力等级': 'stamina_level',
+    '保险箱格数': 'safe_box_slots',
+    'aw子弹': 'aw_bullets',
+    '刀皮': 'knife_skins',
+    '价格': 'price',
+    '备注': 'remarks',
+}
+
+# CSV 中需要转换为整数的列
+INTEGER_FIELDS = ('safe_box_slots', 'level', 'stamina_level', 'aw_bullets')
+
+# CSV 中多个刀皮之间的分隔符
+KNIFE_SKIN_SEPARATOR = re.compile(r'[|,，、;；\s]+')
+
+# 更新已有账号时覆盖的列（编号、状态和创建时间保持不变）
+UPDATE_COLUMNS = LISTING_OPTIONAL_FIELDS + [
+    'server_region', 'total_assets', 'pure_coin_assets', 'safe_box_slots', 'knife_skins', 'price',
+    'deposit', 'knife_skin_mask', 'order_amount', 'updated_at'
+]
+
+
+class ImportFileError(ValueError):
+    """文件无法继续读取"""
+
+
+class ImportReport:
+    """导入进度：已读行数、新增、更新、拒绝的行数及速度"""
+
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.errors = []  # 只保留前 max_errors 条，避免大文件的错误列表占满内存
+        self.aborted = None
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'message': message})
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'aborted': self.aborted,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+        }
+
+
+def detect_format(filename=None, content_type=None):
+    """根据文件扩展名或 Content-Type 判断格式，无法判断时返回 None"""
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower()
+        if extension in ('ndjson', 'jsonl'):
+            return 'ndjson'
+        if extension == 'csv':
+            return 'csv'
+    if content_type:
+        if 'ndjson' in content_type or 'jsonl' in content_type:
+            return 'ndjson'
+        if 'csv' in content_type:
+            return 'csv'
+    return None
+
+
+def _from_csv(record):
+    """将 CSV 的一行（全部为字符串）转换为发布数据，返回 (错误信息, 数据)"""
+    data = {}
+    for column, value in record.items():
+        if column is None:
+            continue  # 多出的单元格
+        field = COLUMN_ALIASES.get(column.strip(), column.strip())
+        value = value.strip() if isinstance(value, str) else value
+        if value:  # 空单元格视为未填写
+            data[field] = value
+
+    for field in INTEGER_FIELDS:
+        if field in data:
+            try:
+                data[field] = int(data[field])
+            except ValueError:
+                return f'{field} 格式不正确', None
+    if 'knife_skins' in data:
+        data['knife_skins'] = [skin for skin in KNIFE_SKIN_SEPARATOR.split(data['knife_skins']) if skin]
+    return None, data
+
+
+def _read_csv(stream):
+    """逐行读取 CSV，产生 (行号, 错误信息, 数据)"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for record in reader:
+        error, data = _from_csv(record)
+        yield reader.line_num, error, data
+
+
+def _read_ndjson(stream):
+    """逐行读取 NDJSON，产生 (行号, 错误信息, 数据)"""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, None, json.loads(line)
+        except ValueError:
+            yield line_number, 'JSON 格式不正确', None
+
+
+READERS = {'csv': _read_csv, 'ndjson': _read_ndjson}
+
+
+def _read_rows(stream, file_format):
+    """读取文件，把编码和格式错误统一转换为 ImportFileError"""
+    rows = READERS[file_format](stream)
+    while True:
+        try:
+            yield next(rows)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            raise ImportFileError('文件编码必须为 UTF-8')
+        except csv.Error as e:
+            raise ImportFileError(f'CSV 格式不正确: {e}')
+
+
+def _upsert_chunk(user_id, rows, report):
+    """在一个事务中写入一批账号：已有的 external_key 更新，其余新增"""
+    table = Account.__table__
+    keys = [row['external_key'] for row in rows]
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.external_key],
+        set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS}
+    )
+    try:
+        existing = set(db.session.execute(
+            select(table.c.external_key).where(table.c.user_id == user_id, table.c.external_key.in_(keys))
+        ).scalars())
+        db.session.execute(stmt, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # 同一批中重复的编号只有第一行是新增
+    inserted = len({key for key in keys if key not in existing})
+    report.inserted += inserted
+    report.updated += len(rows) - inserted
+
+
+def import_accounts(user_id, stream, file_format, chunk_size, max_errors=100, on_progress=None):
+    """
+    从二进制流中导入 user_id 的账号，返回 ImportReport
+
+    每写入一批调用一次 on_progress(report)。某一批写入失败时回滚该批，批中每一行以
+    "写入失败" 计入 rejected 并继续导入；之前的批次已经提交，修正后重新导入即可。
+    """
+    report = ImportReport(max_errors)
+    # 新账号的编号：本次导入共用前缀，按行序号编号，比单条和批量发布的编号长，不会重复
+    prefix = f'ACC{datetime.now().strftime("%Y%m%d%H%M%S")}{uuid.uuid4().hex[:6].upper()}'
+    chunk, lines = [], []  # 待写入的行及其在文件中的行号
+
+    def flush():
+        if chunk:
+            try:
+                _upsert_chunk(user_id, chunk, report)
+            except Exception as e:
+                for line in lines:
+                    report.reject(line, f'写入失败: {str(e)}')
+            chunk.clear()
+            lines.clear()
+        if on_progress:
+            on_progress(report)
+
+    try:
+        for line, error, data in _read_rows(stream, file_format):
+            report.rows += 1
+            if error is None:
+                error, fields = validate_listing(data)
+            if error is None:
+                external_key = data.get('external_key')
+                if not isinstance(external_key, (str, int)) or isinstance(external_key, bool) or external_key == '':
+                    error = '缺少必填字段: external_key'
+                elif len(str(external_key)) > MAX_EXTERNAL_KEY_LENGTH:
+                    error = f'external_key 不能超过{MAX_EXTERNAL_KEY_LENGTH}个字符'
+            if error:
+                report.reject(line, error)
+                continue
+
+            chunk.append(listing_row(
+                fields,
+                user_id=user_id,
+                external_key=str(external_key),
+                account_number=f'{prefix}{report.rows:07d}'
+            ))
+            lines.append(line)
+            if len(chunk) >= chunk_size:
+                flush()
+    except ImportFileError as e:
+        report.aborted = str(e)
+    flush()
+    return report
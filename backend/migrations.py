@@ -0,0 +1,169 @@
+"""
+数据库结构升级
+
+db.create_all() 只会创建缺失的表，不会修改已有的 game_rental.db。
+这里按顺序维护一组幂等的升级步骤，启动时在 create_all() 之后执行，
+旧数据库文件会被补齐新增的列和索引，并回填数据。
+"""
+import json
+from sqlalchemy import Integer, inspect, text
+from backend.models import db
+from backend.models.account import knife_skins_to_mask, recompute_order_amounts
+from backend.models.ledger import LedgerEntry, record_opening_balances
+from backend.models.search import create_account_fts
+from backend.utils.money import to_cents
+
+# 回填数据时每批处理的行数
+BACKFILL_BATCH_SIZE = 1000
+
+# 以分为单位保存的金额列（旧数据库中为 NUMERIC(10, 2) 的元）
+MONEY_COLUMNS = [
+    ('users', 'balance'),
+    ('accounts', 'price'),
+    ('accounts', 'deposit'),
+    ('accounts', 'order_amount'),
+    ('orders', 'rental_amount'),
+    ('orders', 'deposit_amount'),
+    ('orders', 'total_amount'),
+    ('platform_commissions', 'amount'),
+]
+
+
+def _column_names(table_name):
+    """获取表中现有的列名"""
+    return {column['name'] for column in inspect(db.engine).get_columns(table_name)}
+
+
+def _add_column(table_name, column_ddl):
+    """为已有的表添加列"""
+    db.session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column_ddl}'))
+
+
+def _backfill_knife_skin_mask():
+    """根据 knife_skins 回填刀皮位掩码"""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            text('SELECT id, knife_skins FROM accounts WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        updates = [
+            {'id': row.id, 'mask': knife_skins_to_mask(json.loads(row.knife_skins) if row.knife_skins else None)}
+            for row in rows
+        ]
+        db.session.execute(text('UPDATE accounts SET knife_skin_mask = :mask WHERE id = :id'), updates)
+        last_id = rows[-1].id
+
+
+def upgrade_knife_skin_mask():
+    """accounts.knife_skin_mask：刀皮位掩码列及索引"""
+    if 'knife_skin_mask' in _column_names('accounts'):
+        return
+    _add_column('accounts', 'knife_skin_mask INTEGER NOT NULL DEFAULT 0')
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_accounts_knife_skin_mask ON accounts (knife_skin_mask)'
+    ))
+    _backfill_knife_skin_mask()
+
+
+def upgrade_order_amount():
+    """accounts.order_amount：持久化的订单金额"""
+    if 'order_amount' in _column_names('accounts'):
+        return
+    _add_column('accounts', 'order_amount INTEGER NOT NULL DEFAULT 0')
+    # 此时押金可能仍以元保存（由 upgrade_money_cents 转换），只计算订单金额
+    recompute_order_amounts(BACKFILL_BATCH_SIZE, with_deposit=False)
+
+
+def upgrade_account_fts():
+    """accounts_fts：账号全文索引及同步触发器"""
+    create_account_fts()
+
+
+def _backfill_cents(table_name, column_name, legacy_name):
+    """
+    按原来的元金额回填分
+
+    旧数据以浮点数保存，先按原来读取时的方式格式化为两位小数，与接口此前输出的金额一致。
+    """
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            text(f'SELECT id, {legacy_name} AS amount FROM {table_name} WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        updates = [{'id': row.id, 'cents': to_cents('%.2f' % (row.amount or 0))} for row in rows]
+        db.session.execute(text(f'UPDATE {table_name} SET {column_name} = :cents WHERE id = :id'), updates)
+        last_id = rows[-1].id
+
+
+def _convert_to_cents(table_name, column_name):
+    """
+    将以元保存的金额列改为以分保存的 INTEGER 列
+
+    SQLite 不能修改列类型：先把原列改名，新增同名的 INTEGER 列并回填，再删除原列。
+    原列上的索引需要先删除，由 upgrade_indexes 在新列上重建。
+    """
+    inspector = inspect(db.session.connection())
+    column = next(c for c in inspector.get_columns(table_name) if c['name'] == column_name)
+    if isinstance(column['type'], Integer):
+        return
+    for index in inspector.get_indexes(table_name):
+        if column_name in index['column_names']:
+            db.session.execute(text(f'DROP INDEX IF EXISTS {index["name"]}'))
+    legacy_name = f'{column_name}_yuan'
+    db.session.execute(text(f'ALTER TABLE {table_name} RENAME COLUMN {column_name} TO {legacy_name}'))
+    _add_column(table_name, f'{column_name} INTEGER NOT NULL DEFAULT 0')
+    _backfill_cents(table_name, column_name, legacy_name)
+    db.session.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {legacy_name}'))
+
+
+def upgrade_money_cents():
+    """金额列：元（NUMERIC）改为分（INTEGER）"""
+    for table_name, column_name in MONEY_COLUMNS:
+        _convert_to_cents(table_name, column_name)
+
+
+def upgrade_ledger():
+    """ledger_entries：启用资金流水之前已有的余额记为期初余额"""
+    if db.session.query(LedgerEntry.id).first() is not None:
+        return
+    record_opening_balances(BACKFILL_BATCH_SIZE)
+
+
+def upgrade_external_key():
+    """accounts.external_key：导入时使用的卖家编号（唯一索引由 upgrade_indexes 创建）"""
+    if 'external_key' in _column_names('accounts'):
+        return
+    _add_column('accounts', 'external_key VARCHAR(100)')
+
+
+def upgrade_indexes():
+    """补齐模型中声明的全部索引"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.session.connection(), checkfirst=True)
+
+
+# 升级步骤，按添加顺序执行（补齐索引始终放在最后，此时所需的列都已存在）
+UPGRADE_STEPS = [
+    upgrade_knife_skin_mask,
+    upgrade_order_amount,
+    upgrade_account_fts,
+    upgrade_money_cents,
+    upgrade_ledger,
+    upgrade_external_key,
+    upgrade_indexes,
+]
+
+
+def upgrade_database():
+    """创建缺失的表并执行全部升级步骤"""
+    db.create_all()
+    for step in UPGRADE_STEPS:
+        step()
+    db.session.commit()
@@ -1,8 +1,13 @@
 """
 模型初始化文件
 """
-from backend.models.user import db, User
+from backend.models.user import db, User, credit_balance, debit_balance, mark_user_changed
 from backend.models.account import Account
 from backend.models.order import Order
+from backend.models.commission import PlatformCommission
+from backend.models.session import SessionRecord
+from backend.models.ledger import LedgerTransaction, LedgerEntry, LedgerSnapshot
+from backend.models.idempotency import IdempotencyKey
 
-__all__ = ['db', 'User', 'Account', 'Order']
+__all__ = ['db', 'User', 'Account', 'Order', 'PlatformCommission', 'SessionRecord', 'LedgerTransaction', 'LedgerEntry',
+           'LedgerSnapshot', 'IdempotencyKey', 'credit_balance', 'debit_balance', 'mark_user_changed']
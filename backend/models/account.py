@@ -1,18 +1,230 @@
 """
 游戏账号模型
 """
+import math
 from datetime import datetime
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.orm import validates
 from backend.models.user import db
+from backend.utils.money import Cents, apply_ratio, parse_amount, to_cents
+from backend.utils.serializers import ModelSerializer
+
+# 订单金额比例：保险箱格数 -> 比例（订单金额(元) = 纯币资产 × 100 ÷ 比例）
+SAFE_BOX_RATIOS = {9: 38, 6: 40, 4: 42}
+DEFAULT_SAFE_BOX_RATIO = 40
+
+# 允许的刀皮列表（顺序即位掩码中的位序，只能在末尾追加）
+ALLOWED_KNIFE_SKINS = ['北极星', '黑海', '赤霄怜悯', '影锋', '信条']
+KNIFE_SKIN_BITS = {skin: 1 << i for i, skin in enumerate(ALLOWED_KNIFE_SKINS)}
+ALL_KNIFE_SKIN_MASKS = range(1 << len(ALLOWED_KNIFE_SKINS))
+
+
+def knife_skins_to_mask(knife_skins):
+    """将刀皮列表转换为位掩码"""
+    mask = 0
+    for skin in knife_skins or []:
+        mask |= KNIFE_SKIN_BITS.get(skin, 0)
+    return mask
+
+
+def knife_skin_masks_matching(knife_skins, match_all=False):
+    """
+    列出满足刀皮条件的全部掩码取值
+
+    刀皮集合是封闭的，掩码只有 2^5 种取值，因此“包含任意/全部刀皮”
+    可以改写为 knife_skin_mask IN (...)，直接走索引而不必扫描 JSON。
+    """
+    wanted = knife_skins_to_mask(knife_skins)
+    if match_all:
+        if any(skin not in KNIFE_SKIN_BITS for skin in knife_skins):
+            return []
+        return [m for m in ALL_KNIFE_SKIN_MASKS if m & wanted == wanted]
+    return [m for m in ALL_KNIFE_SKIN_MASKS if m & wanted]
+
+
+def order_amount_for(pure_coin_assets, safe_box_slots):
+    """计算订单金额（分）：纯币资产 × 100 ÷ 比例"""
+    ratio = SAFE_BOX_RATIOS.get(safe_box_slots, DEFAULT_SAFE_BOX_RATIO)
+    # 纯币资产保留两位小数，先换成百分之一单位的整数
+    return apply_ratio(to_cents(pure_coin_assets), 100, ratio)
+
+
+def deposit_for(order_amount):
+    """计算押金（分）：租金的30%"""
+    return apply_ratio(order_amount, 30, 100)
+
+
+# 发布账号时可选填的字段
+LISTING_OPTIONAL_FIELDS = [
+    'collection_time', 'login_time', 'common_location', 'login_method', 'face_verification',
+    'rank', 'level', 'stamina_level', 'aw_bullets', 'remarks'
+]
+
+# 发布数据中的文本字段和整数字段
+LISTING_TEXT_FIELDS = [
+    'collection_time', 'login_time', 'common_location', 'server_region', 'login_method',
+    'face_verification', 'rank', 'remarks'
+]
+LISTING_INTEGER_FIELDS = ['level', 'stamina_level', 'aw_bullets']
+
+# 数值上限：资产列为 NUMERIC(10, 2)，金额换算为分后不能超出 SQLite 的 INTEGER
+MAX_ASSETS = 10 ** 8
+MAX_PRICE_CENTS = 10 ** 10
+MAX_INTEGER = 2 ** 63
+
+
+def _parse_assets(value):
+    """解析资产数值，不是有效数字时返回 None"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def check_listing_fields(data):
+    """
+    检查 data 中出现的字段的类型和范围，返回错误信息，全部合法时返回 None
+
+    不合法的值（对象、数组、非数字的等级等）在这里拒绝，不会写入数据库后才出错，
+    也不会以文本形式存入整数列。
+    """
+    for field in LISTING_TEXT_FIELDS:
+        value = data.get(field)
+        if value is not None and not isinstance(value, str):
+            return f'{field} 必须是字符串'
+    if 'server_region' in data and not data['server_region']:
+        return '区服不能为空'
+    
+    for field in LISTING_INTEGER_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or not -MAX_INTEGER <= value < MAX_INTEGER:
+            return f'{field} 必须是整数'
+    
+    for field in ('total_assets', 'pure_coin_assets'):
+        if field in data:
+            value = _parse_assets(data[field])
+            if value is None:
+                return '资产格式不正确'
+            if value < 0:
+                return '资产不能为负数'
+            if value >= MAX_ASSETS:
+                return '资产超出范围'
+    return None
+
+
+def check_knife_skins(knife_skins):
+    """校验刀皮列表，返回 (错误信息, 刀皮列表)，未填写（None）视为空列表"""
+    if knife_skins is None:
+        return None, []
+    if not isinstance(knife_skins, list):
+        return '刀皮必须是数组', None
+    for skin in knife_skins:
+        if skin not in ALLOWED_KNIFE_SKINS:
+            return f'不允许的刀皮: {skin}', None
+    return None, knife_skins
+
+
+def validate_listing(data):
+    """
+    校验一条发布数据
+
+    返回 (错误信息, None) 或 (None, 字段)。字段中价格和押金为分，
+    单条发布、批量发布和导入共用同一套规则。
+    """
+    if not isinstance(data, dict):
+        return '账号数据格式不正确', None
+    
+    # 验证必填字段（account_number 由系统生成）
+    required_fields = ['pure_coin_assets', 'safe_box_slots', 'price', 'server_region', 'total_assets']
+    for field in required_fields:
+        if field not in data:
+            return f'缺少必填字段: {field}', None
+    
+    # 验证字段类型、资产范围
+    error = check_listing_fields(data)
+    if error:
+        return error, None
+    
+    # 验证总资产 > 纯币资产
+    if _parse_assets(data['total_assets']) <= _parse_assets(data['pure_coin_assets']):
+        return '总资产必须大于纯币资产', None
+    
+    price = parse_amount(data['price'])
+    if price is None or price < 0:
+        return '价格格式不正确', None
+    if price >= MAX_PRICE_CENTS:
+        return '价格超出范围', None
+    
+    # 验证保险箱格数
+    if data['safe_box_slots'] not in [4, 6, 9]:
+        return '保险箱格数只能是4、6或9', None
+    
+    # 验证刀皮
+    error, knife_skins = check_knife_skins(data.get('knife_skins'))
+    if error:
+        return error, None
+    
+    fields = {field: data.get(field) for field in LISTING_OPTIONAL_FIELDS}
+    fields.update(
+        server_region=data['server_region'],
+        total_assets=data['total_assets'],
+        pure_coin_assets=data['pure_coin_assets'],
+        safe_box_slots=data['safe_box_slots'],
+        knife_skins=knife_skins,
+        price=price,
+        # 押金为租金的30%
+        deposit=deposit_for(order_amount_for(data['pure_coin_assets'], data['safe_box_slots'])),
+    )
+    return None, fields
+
+
+def listing_row(fields, **values):
+    """
+    由 validate_listing 的结果生成可直接批量插入 accounts 表的一行
+
+    批量插入绕过 ORM 的校验器和事件，订单金额、刀皮掩码和时间在这里一并算好；
+    values 中给出 user_id、account_number 等其余列。
+    """
+    now = values.pop('now', None) or datetime.now()
+    row = dict(fields)
+    row.update(
+        knife_skin_mask=knife_skins_to_mask(fields['knife_skins']),
+        order_amount=order_amount_for(fields['pure_coin_assets'], fields['safe_box_slots']),
+        status='available',
+        created_at=now,
+        updated_at=now,
+    )
+    row.update(values)
+    return row
 
 class Account(db.Model):
     """游戏账号表"""
     __tablename__ = 'accounts'
+    __table_args__ = (
+        # 列表查询总是按状态筛选并按创建时间倒序，以下索引覆盖各种筛选组合
+        db.Index('ix_accounts_status_created_at', 'status', 'created_at'),
+        db.Index('ix_accounts_status_slots_created_at', 'status', 'safe_box_slots', 'created_at'),
+        db.Index('ix_accounts_status_level', 'status', 'level'),
+        db.Index('ix_accounts_status_pure_coin_assets', 'status', 'pure_coin_assets'),
+        db.Index('ix_accounts_status_order_amount', 'status', 'order_amount'),
+        # 卖家查看自己发布的账号：按状态筛选，或不筛选状态直接按 (created_at, id) 翻页（id 即 rowid，隐含在索引末尾）
+        db.Index('ix_accounts_user_status_created_at', 'user_id', 'status', 'created_at'),
+        db.Index('ix_accounts_user_created_at', 'user_id', 'created_at'),
+        # 导入时按卖家自己的编号更新已有账号
+        db.Index('ux_accounts_user_external_key', 'user_id', 'external_key', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # 基础信息
     account_number = db.Column(db.String(50), unique=True, nullable=False)  # 编号
+    external_key = db.Column(db.String(100), nullable=True)  # 卖家自己的编号（导入时用于更新已有账号）
     collection_time = db.Column(db.String(50), nullable=True)  # 收号时间
     login_time = db.Column(db.String(50), nullable=True)  # 上号时间
     common_location = db.Column(db.String(100), nullable=True)  # 常用地
@@ -31,10 +243,12 @@ class Account(db.Model):
     
     # 刀皮信息 (多选，使用JSON存储)
     knife_skins = db.Column(db.JSON, nullable=True)  # 持有刀皮：北极星、黑海、赤霄怜悯、影锋、信条
+    knife_skin_mask = db.Column(db.Integer, default=0, nullable=False, index=True)  # 刀皮位掩码，与knife_skins同步
     
     # 价格信息
-    price = db.Column(db.Numeric(10, 2), nullable=False)  # 价格
-    deposit = db.Column(db.Numeric(10, 2), nullable=False)  # 押金
+    price = db.Column(Cents, nullable=False)  # 价格（分）
+    deposit = db.Column(Cents, nullable=False)  # 押金（分）
+    order_amount = db.Column(Cents, default=0, nullable=False)  # 订单金额（租金，分），保存时自动计算
     
     # 其他信息
     remarks = db.Column(db.Text, nullable=True)  # 备注
@@ -46,42 +260,82 @@ class Account(db.Model):
     # 关联关系
     orders = db.relationship('Order', backref='account', lazy='dynamic')
     
+    @validates('knife_skins')
+    def _sync_knife_skin_mask(self, key, knife_skins):
+        """设置刀皮时同步更新位掩码"""
+        self.knife_skin_mask = knife_skins_to_mask(knife_skins)
+        return knife_skins
+    
     def calculate_order_amount(self):
-        """计算订单金额：纯币资产 × 100 ÷ 比例"""
-        ratio_map = {9: 38, 6: 40, 4: 42}
-        ratio = ratio_map.get(self.safe_box_slots, 40)
-        return float(self.pure_coin_assets) * 100 / ratio
+        """计算订单金额（分）：纯币资产 × 100 ÷ 比例"""
+        return order_amount_for(self.pure_coin_assets, self.safe_box_slots)
     
     def calculate_deposit(self):
-        """计算押金：租金的30%"""
-        rental_amount = self.calculate_order_amount()
-        return round(rental_amount * 0.3, 2)
+        """计算押金（分）：租金的30%"""
+        return deposit_for(self.calculate_order_amount())
     
     def to_dict(self):
         """转换为字典"""
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'account_number': self.account_number,
-            'collection_time': self.collection_time,
-            'login_time': self.login_time,
-            'common_location': self.common_location,
-            'server_region': self.server_region,
-            'login_method': self.login_method,
-            'face_verification': self.face_verification,
-            'rank': self.rank,
-            'total_assets': float(self.total_assets) if self.total_assets else None,
-            'pure_coin_assets': float(self.pure_coin_assets),
-            'level': self.level,
-            'stamina_level': self.stamina_level,
-            'safe_box_slots': self.safe_box_slots,
-            'aw_bullets': self.aw_bullets,
-            'knife_skins': self.knife_skins,
-            'price': float(self.price),
-            'deposit': float(self.deposit),
-            'remarks': self.remarks,
-            'status': self.status,
-            'order_amount': self.calculate_order_amount(),
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        }
+        return account_serializer.dump(self)
+
+
+account_serializer = ModelSerializer(Account, [
+    'id', 'user_id', 'account_number', 'collection_time', 'login_time', 'common_location',
+    'server_region', 'login_method', 'face_verification', 'rank', 'total_assets',
+    'pure_coin_assets', 'level', 'stamina_level', 'safe_box_slots', 'aw_bullets',
+    'knife_skins', 'price', 'deposit', 'remarks', 'status', 'order_amount',
+    'created_at', 'updated_at',
+])
+
+
+@event.listens_for(Account, 'before_insert')
+@event.listens_for(Account, 'before_update')
+def _store_order_amount(mapper, connection, account):
+    """保存账号时同步订单金额"""
+    account.order_amount = account.calculate_order_amount()
+
+
+def recompute_order_amounts(batch_size=1000, with_deposit=False):
+    """
+    按当前比例表批量重算全部账号的订单金额（with_deposit 为 True 时同时重算押金）
+
+    修改 SAFE_BOX_RATIOS 后执行。与保存账号时使用同一个 order_amount_for / deposit_for
+    做整数四舍五入，结果与单条保存完全一致。按主键分段读取，只更新金额有变化的账号
+    （未变化的账号 updated_at 保持不变），每段单独提交，避免长时间持有写锁。
+    押金可能是卖家修改过的，默认保持不变；with_deposit 为 True 时按订单金额重置押金。
+    返回更新的账号数。
+    """
+    table = Account.__table__
+    columns = [table.c.id, table.c.pure_coin_assets, table.c.safe_box_slots, table.c.order_amount]
+    if with_deposit:
+        columns.append(table.c.deposit)
+    values = {'order_amount': bindparam('new_order_amount')}
+    if with_deposit:
+        values['deposit'] = bindparam('new_deposit')
+    stmt = table.update().where(table.c.id == bindparam('account_id')).values(**values)
+    
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.session.execute(
+            select(*columns).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        
+        changes = []
+        for row in rows:
+            order_amount = order_amount_for(row.pure_coin_assets, row.safe_box_slots)
+            change = {'account_id': row.id, 'new_order_amount': order_amount}
+            changed = order_amount != row.order_amount
+            if with_deposit:
+                change['new_deposit'] = deposit_for(order_amount)
+                changed = changed or change['new_deposit'] != row.deposit
+            if changed:
+                changes.append(change)
+        if changes:
+            db.session.execute(stmt, changes)
+        db.session.commit()
+        total += len(changes)
+    return total
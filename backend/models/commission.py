@@ -0,0 +1,80 @@
+"""
+平台抽成模型
+
+支付时只向 platform_commissions 追加一行抽成记录，不再直接修改管理员余额，
+避免所有支付争用同一行。未结算的抽成定期汇总计入平台账户余额，
+平台总收入 = 平台账户余额 + 未结算抽成，随时可以精确读取。
+"""
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from backend.models.user import db, User, credit_balance
+from backend.models.ledger import ESCROW, COMMISSION, post_transaction
+from backend.utils.money import Cents
+
+class PlatformCommission(db.Model):
+    """平台抽成记录表（只追加）"""
+    __tablename__ = 'platform_commissions'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)  # 来源订单
+    amount = db.Column(Cents, nullable=False)  # 抽成金额（分）
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    settled_at = db.Column(db.DateTime, nullable=True, index=True)  # 计入平台账户的时间，未结算为空
+
+
+def get_platform_user_id():
+    """获取平台账户（管理员）ID，首次查询后缓存在应用中"""
+    cache = current_app.extensions.setdefault('platform_account', {})
+    if 'user_id' not in cache:
+        admin = User.query.filter_by(is_admin=True).order_by(User.id).first()
+        if not admin:
+            return None
+        cache['user_id'] = admin.id
+    return cache['user_id']
+
+
+def record_commission(order_id, amount):
+    """追加一条抽成记录，抽成从订单托管转入待结算抽成账户，随调用方的事务一起提交"""
+    db.session.add(PlatformCommission(order_id=order_id, amount=amount))
+    post_transaction('commission', [(None, ESCROW, -amount), (None, COMMISSION, amount)], order_id)
+
+
+def pending_commission_total():
+    """未结算的抽成总额（分）"""
+    return db.session.query(func.coalesce(func.sum(PlatformCommission.amount), 0)).filter(
+        PlatformCommission.settled_at.is_(None)
+    ).scalar()
+
+
+def settle_commissions():
+    """
+    将未结算的抽成汇总计入平台账户余额
+
+    以当前最大记录ID为界，界内的记录一次性标记为已结算并计入平台账户，
+    结算期间新追加的记录留到下次。没有平台账户时不做处理。
+    返回本次结算的金额（分）。
+    """
+    platform_user_id = get_platform_user_id()
+    if platform_user_id is None:
+        return 0
+    
+    last_id = db.session.query(func.max(PlatformCommission.id)).filter(
+        PlatformCommission.settled_at.is_(None)
+    ).scalar()
+    if last_id is None:
+        return 0
+    
+    # 标记与求和使用同一条 UPDATE ... RETURNING，并发结算不会重复入账
+    table = PlatformCommission.__table__
+    settled = db.session.execute(
+        table.update()
+        .where(table.c.id <= last_id, table.c.settled_at.is_(None))
+        .values(settled_at=datetime.now())
+        .returning(table.c.amount)
+    ).scalars().all()
+    total = sum(settled)
+    if settled:
+        credit_balance(platform_user_id, total, 'commission_settle')
+    db.session.commit()
+    return total
@@ -0,0 +1,21 @@
+"""
+幂等键模型
+"""
+from datetime import datetime
+from backend.models.user import db
+
+class IdempotencyKey(db.Model):
+    """幂等键表：同一用户的同一 Idempotency-Key 只执行一次，保存响应供重试时直接返回"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_id_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)  # 客户端传入的 Idempotency-Key
+    fingerprint = db.Column(db.String(64), nullable=False)  # 请求地址和内容的哈希，同一个键不能用于不同的请求
+    status_code = db.Column(db.Integer, nullable=True)  # 响应状态码（与视图的修改一起写入，旧版本处理中的记录为空）
+    body = db.Column(db.Text, nullable=True)  # 响应内容（JSON）
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # 过期时间，清理任务按此列分批删除
@@ -0,0 +1,321 @@
+"""
+资金流水（复式记账）
+
+每一笔余额变动都在同一个事务中记一笔交易（ledger_transactions），并向 ledger_entries
+追加金额合计为0的分录：用户账户一方（user_id 非空）和对应的系统账户一方（现金、
+订单托管、待结算抽成、抽奖奖金、期初余额）。流水只追加、不修改，金额以分为单位的整数保存。
+
+用户的账面余额 = 最近一次快照 + 快照之后的分录之和，按 (user_id, id) 索引只读取
+快照之后的分录；快照由 snapshot-ledger 任务定期生成。reconcile-ledger 任务分批扫描
+全部分录，核对每笔交易是否平衡、快照是否正确，以及账面余额是否等于 users.balance。
+"""
+from datetime import datetime
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.sqlite import insert
+from backend.models.user import db, User
+from backend.utils.pagination import encode_cursor, decode_cursor, MAX_PER_PAGE
+from backend.utils.money import to_yuan
+from backend.utils.serializers import format_datetime
+
+# 分录中的账户，用户账户为 USER，其余为系统账户
+USER = 'user'
+CASH = 'cash'  # 充值、提现的外部资金
+ESCROW = 'escrow'  # 订单支付的托管资金，支付完成时分配完毕，余额恒为0
+COMMISSION = 'commission'  # 未结算的平台抽成
+LOTTERY = 'lottery'  # 抽奖奖金
+OPENING = 'opening'  # 启用流水之前已有的余额及创建用户时的初始余额
+
+# 用户余额变动的交易类型及对方系统账户
+TRANSACTION_ACCOUNTS = {
+    'recharge': CASH,  # 充值
+    'withdraw': CASH,  # 提现
+    'order_payment': ESCROW,  # 支付订单
+    'order_income': ESCROW,  # 出租收入
+    'deposit_refund': ESCROW,  # 退还定金
+    'commission_settle': COMMISSION,  # 平台抽成结算
+    'lottery': LOTTERY,  # 抽奖奖金
+    'opening': OPENING,  # 期初余额
+}
+
+# 对账时每批读取的行数
+RECONCILE_CHUNK_SIZE = 5000
+
+
+class LedgerTransaction(db.Model):
+    """资金交易表（只追加）"""
+    __tablename__ = 'ledger_transactions'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(20), nullable=False)  # 交易类型
+    order_id = db.Column(db.Integer, nullable=True)  # 相关订单
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class LedgerEntry(db.Model):
+    """资金分录表（只追加），同一交易的分录金额之和为0"""
+    __tablename__ = 'ledger_entries'
+    __table_args__ = (
+        db.Index('ix_ledger_entries_user_id_id', 'user_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    txn_id = db.Column(db.Integer, db.ForeignKey('ledger_transactions.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # 系统账户为空
+    account = db.Column(db.String(20), nullable=False)  # USER 或系统账户
+    amount = db.Column(db.Integer, nullable=False)  # 金额（分），增加为正
+
+
+class LedgerSnapshot(db.Model):
+    """用户余额快照：id 不超过 entry_id 的全部分录之和"""
+    __tablename__ = 'ledger_snapshots'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    entry_id = db.Column(db.Integer, nullable=False)
+    balance = db.Column(db.Integer, nullable=False)  # 余额（分）
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+def post_transaction(kind, postings, order_id=None, connection=None):
+    """
+    记一笔交易，postings 为 (user_id, 账户, 金额分) 列表，金额之和必须为0
+
+    默认随 db.session 的事务一起提交；在 flush 事件中调用时传入当前连接。
+    """
+    postings = [posting for posting in postings if posting[2]]
+    if not postings:
+        return None
+    if sum(cents for _, _, cents in postings) != 0:
+        raise ValueError(f'交易分录不平衡: {postings}')
+    executor = connection if connection is not None else db.session
+    txn_id = executor.execute(
+        LedgerTransaction.__table__.insert()
+        .values(kind=kind, order_id=order_id, created_at=datetime.now())
+        .returning(LedgerTransaction.__table__.c.id)
+    ).scalar()
+    executor.execute(LedgerEntry.__table__.insert(), [
+        {'txn_id': txn_id, 'user_id': user_id, 'account': account, 'amount': cents}
+        for user_id, account, cents in postings
+    ])
+    return txn_id
+
+
+def post_balance_change(user_id, cents, kind, order_id=None, connection=None):
+    """记录用户余额变动 cents（分，增加为正），对方为该交易类型对应的系统账户"""
+    account = TRANSACTION_ACCOUNTS[kind]
+    return post_transaction(kind, [(user_id, USER, cents), (None, account, -cents)], order_id, connection)
+
+
+@event.listens_for(User, 'after_insert')
+def _post_initial_balance(mapper, connection, target):
+    """创建用户时指定的初始余额记为期初余额"""
+    if target.balance:
+        post_balance_change(target.id, target.balance, 'opening', connection=connection)
+
+
+def record_opening_balances(batch_size=1000):
+    """为尚无任何分录的用户记录期初余额（启用流水之前的数据），返回处理的用户数"""
+    users = User.__table__
+    entries = LedgerEntry.__table__
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(users.c.id, users.c.balance)
+            .where(
+                users.c.id > last_id,
+                users.c.balance != 0,
+                ~select(entries.c.id).where(entries.c.user_id == users.c.id).exists()
+            )
+            .order_by(users.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return total
+        for row in rows:
+            post_balance_change(row.id, row.balance, 'opening')
+        total += len(rows)
+        last_id = rows[-1].id
+
+
+def ledger_balance(user_id, before_id=None):
+    """
+    用户的账面余额（分）：快照加上快照之后的分录
+
+    before_id 不为空时返回 id 小于 before_id 的分录之和（即该分录之前的余额）：
+    before_id 在快照之后时加上快照到 before_id 之间的分录，否则从快照中减去
+    before_id 到快照之间的分录，两种情况都只按 (user_id, id) 索引读取一段分录。
+    """
+    snapshot = db.session.execute(
+        select(LedgerSnapshot.entry_id, LedgerSnapshot.balance).where(LedgerSnapshot.user_id == user_id)
+    ).first()
+    entry_id, balance = snapshot if snapshot else (0, 0)
+    total = func.coalesce(func.sum(LedgerEntry.amount), 0)
+    if before_id is not None and before_id <= entry_id:
+        return balance - db.session.execute(
+            select(total).where(
+                LedgerEntry.user_id == user_id, LedgerEntry.id >= before_id, LedgerEntry.id <= entry_id
+            )
+        ).scalar()
+    query = select(total).where(LedgerEntry.user_id == user_id, LedgerEntry.id > entry_id)
+    if before_id is not None:
+        query = query.where(LedgerEntry.id < before_id)
+    return balance + db.session.execute(query).scalar()
+
+
+def user_statement(user_id, cursor, per_page):
+    """
+    用户资金明细，按分录倒序的游标分页
+
+    游标中只有上一页最后一条分录的 id，本页起始余额由 ledger_balance 在服务端计算，
+    客户端无法通过游标改变显示的余额。返回 (明细列表, next_cursor)，游标无法解析时抛出 InvalidCursor。
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    query = (
+        select(LedgerEntry.id, LedgerEntry.amount, LedgerTransaction.kind,
+               LedgerTransaction.order_id, LedgerTransaction.created_at)
+        .join(LedgerTransaction, LedgerTransaction.id == LedgerEntry.txn_id)
+        .where(LedgerEntry.user_id == user_id)
+    )
+    if cursor:
+        _, before_id = decode_cursor(cursor, LedgerEntry.id)
+        query = query.where(LedgerEntry.id < before_id)
+        balance = ledger_balance(user_id, before_id)
+    else:
+        balance = ledger_balance(user_id)
+    rows = db.session.execute(query.order_by(LedgerEntry.id.desc()).limit(per_page + 1)).all()
+
+    items = []
+    for row in rows[:per_page]:
+        items.append({
+            'id': row.id,
+            'kind': row.kind,
+            'order_id': row.order_id,
+            'amount': to_yuan(row.amount),
+            'balance': to_yuan(balance),  # 本条分录之后的余额
+            'created_at': format_datetime(row.created_at),
+        })
+        balance -= row.amount
+
+    next_cursor = None
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(None, rows[per_page - 1].id)
+    return items, next_cursor
+
+
+def snapshot_balances():
+    """
+    为上次快照之后有分录的用户生成新的余额快照，返回更新的用户数
+
+    每次快照覆盖 (上次快照的最大 entry_id, 当前最大分录ID] 区间，只按主键扫描这段新分录；
+    没有新分录的用户保留原快照，其后也没有分录，读取余额时不需要再扫描。
+    """
+    since = db.session.query(func.coalesce(func.max(LedgerSnapshot.entry_id), 0)).scalar()
+    upto = db.session.query(func.max(LedgerEntry.id)).scalar()
+    if upto is None or upto <= since:
+        return 0
+
+    deltas = db.session.execute(
+        select(LedgerEntry.user_id, func.sum(LedgerEntry.amount).label('amount'))
+        .where(LedgerEntry.id > since, LedgerEntry.id <= upto, LedgerEntry.user_id.isnot(None))
+        .group_by(LedgerEntry.user_id)
+    ).all()
+    if deltas:
+        table = LedgerSnapshot.__table__
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                'entry_id': stmt.excluded.entry_id,
+                'balance': table.c.balance + stmt.excluded.balance,
+                'created_at': stmt.excluded.created_at,
+            }
+        )
+        now = datetime.now()
+        db.session.execute(stmt, [
+            {'user_id': row.user_id, 'entry_id': upto, 'balance': row.amount, 'created_at': now}
+            for row in deltas
+        ])
+    db.session.commit()
+    return len(deltas)
+
+
+def reconcile_ledger(chunk_size=RECONCILE_CHUNK_SIZE):
+    """
+    对账：按ID分批扫描全部分录和用户
+
+    检查每笔交易的分录之和为0、每个快照等于截至其 entry_id 的分录之和、
+    托管账户余额为0、待结算抽成账户等于未结算的抽成记录之和，以及每个用户的
+    账面余额等于 users.balance。返回对账结果，problems 为空表示账目一致。
+    """
+    from backend.models.commission import pending_commission_total
+
+    snapshots = sorted(
+        db.session.execute(select(LedgerSnapshot.entry_id, LedgerSnapshot.user_id, LedgerSnapshot.balance)).all(),
+        reverse=True
+    )
+    user_totals = {}
+    account_totals = {}
+    open_txns = {}
+    problems = []
+    entries = 0
+
+    def check_snapshot(snapshot):
+        actual = user_totals.get(snapshot.user_id, 0)
+        if actual != snapshot.balance:
+            problems.append(f'用户 {snapshot.user_id} 的快照余额 {snapshot.balance} 与分录之和 {actual} 不一致')
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(LedgerEntry.id, LedgerEntry.txn_id, LedgerEntry.user_id, LedgerEntry.account, LedgerEntry.amount)
+            .where(LedgerEntry.id > last_id)
+            .order_by(LedgerEntry.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            while snapshots and snapshots[-1].entry_id < row.id:
+                check_snapshot(snapshots.pop())
+            if row.user_id is not None:
+                user_totals[row.user_id] = user_totals.get(row.user_id, 0) + row.amount
+            account_totals[row.account] = account_totals.get(row.account, 0) + row.amount
+            # 同一交易的分录连续写入，合计回到0时即可丢弃
+            txn_total = open_txns.get(row.txn_id, 0) + row.amount
+            if txn_total:
+                open_txns[row.txn_id] = txn_total
+            else:
+                open_txns.pop(row.txn_id, None)
+        entries += len(rows)
+        last_id = rows[-1].id
+    for snapshot in reversed(snapshots):
+        check_snapshot(snapshot)
+
+    for txn_id, total in sorted(open_txns.items()):
+        problems.append(f'交易 {txn_id} 的分录之和为 {total}')
+    if account_totals.get(ESCROW, 0):
+        problems.append(f'托管账户余额为 {account_totals[ESCROW]}')
+    pending = pending_commission_total()
+    if account_totals.get(COMMISSION, 0) != pending:
+        problems.append(f'待结算抽成账户 {account_totals.get(COMMISSION, 0)} 与未结算抽成 {pending} 不一致')
+
+    users = User.__table__
+    checked = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(users.c.id, users.c.balance).where(users.c.id > last_id).order_by(users.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            expected = row.balance
+            actual = user_totals.pop(row.id, 0)
+            if actual != expected:
+                problems.append(f'用户 {row.id} 的余额 {expected} 与账面余额 {actual} 不一致')
+        checked += len(rows)
+        last_id = rows[-1].id
+    for user_id, total in sorted(user_totals.items()):
+        problems.append(f'分录中的用户 {user_id} 不存在（账面余额 {total}）')
+
+    return {'entries': entries, 'users': checked, 'accounts': account_totals, 'problems': problems}
@@ -0,0 +1,100 @@
+"""
+抽奖
+
+奖品按 Config.LOTTERY_PRIZES 中的权重抽取，使用 Walker 别名表：建表 O(n)，每次抽取
+只需一个随机下标和一次比较，与奖品数量无关。随机数来自 SystemRandom，客户端无法预测。
+
+抽奖次数的扣减与奖金入账在同一个事务中完成：先用条件 UPDATE 占用今日免费机会
+（last_lottery_date 不等于今天），不足的部分用条件 UPDATE 扣减 lottery_chances
+（lottery_chances >= 需要的次数），次数不够时整体回滚，不会多扣也不会超发。
+"""
+import random
+from datetime import date
+from flask import current_app
+from sqlalchemy import or_
+from backend.models.user import db, User, credit_balance, mark_user_changed
+from backend.utils.money import to_cents
+
+_random = random.SystemRandom()
+
+
+class AliasTable:
+    """Walker 别名表"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+        # 剩下的项概率为1（只因浮点误差才可能落入 small）
+
+    def sample(self):
+        """抽取一个下标"""
+        i = _random.randrange(len(self.prob))
+        return i if _random.random() < self.prob[i] else self.alias[i]
+
+
+class PrizeTable:
+    """奖品表及其别名表，奖金以分保存"""
+
+    def __init__(self, prizes):
+        self.prizes = [{'name': name, 'amount': to_cents(amount)} for name, amount, _ in prizes]
+        self.alias_table = AliasTable([weight for _, _, weight in prizes])
+
+    def draw(self):
+        return self.prizes[self.alias_table.sample()]
+
+
+def get_prize_table():
+    """当前配置的奖品表，首次使用时建表并缓存在应用中"""
+    table = current_app.extensions.get('lottery_prizes')
+    if table is None:
+        table = PrizeTable(current_app.config['LOTTERY_PRIZES'])
+        current_app.extensions['lottery_prizes'] = table
+    return table
+
+
+def draw_lottery(user_id, count=1):
+    """
+    为用户抽奖 count 次并将奖金计入余额
+
+    优先使用今日免费机会，其余从 lottery_chances 扣减。次数不足时返回 None 且不做任何修改，
+    否则提交事务并返回抽中的奖品列表。
+    """
+    users = User.__table__
+    today = date.today()
+
+    used_daily = db.session.execute(
+        users.update()
+        .where(users.c.id == user_id, or_(users.c.last_lottery_date.is_(None), users.c.last_lottery_date != today))
+        .values(last_lottery_date=today)
+    ).rowcount
+
+    remaining = count - used_daily
+    if remaining > 0:
+        consumed = db.session.execute(
+            users.update()
+            .where(users.c.id == user_id, users.c.lottery_chances >= remaining)
+            .values(lottery_chances=users.c.lottery_chances - remaining)
+        ).rowcount
+        if not consumed:
+            db.session.rollback()
+            return None
+
+    prize_table = get_prize_table()
+    prizes = [prize_table.draw() for _ in range(count)]
+    total = sum(prize['amount'] for prize in prizes)
+    if total:
+        credit_balance(user_id, total, 'lottery')
+    mark_user_changed(user_id)
+    db.session.commit()
+    return prizes
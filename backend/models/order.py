@@ -1,12 +1,20 @@
 """
 订单模型
 """
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import func
 from backend.models.user import db
+from backend.models.account import Account
+from backend.utils.money import Cents
+from backend.utils.serializers import ModelSerializer
 
 class Order(db.Model):
     """订单表"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        # 超时未支付订单的扫描
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False, index=True)  # 订单编号
@@ -17,9 +25,9 @@ class Order(db.Model):
     account_id = db.Column(db.Integer, db.ForeignKey('accounts.id'), nullable=False, index=True)  # 账号
     
     # 金额信息
-    rental_amount = db.Column(db.Numeric(10, 2), nullable=False)  # 租金
-    deposit_amount = db.Column(db.Numeric(10, 2), nullable=False)  # 押金
-    total_amount = db.Column(db.Numeric(10, 2), nullable=False)  # 总金额（租金+押金）
+    rental_amount = db.Column(Cents, nullable=False)  # 租金（分）
+    deposit_amount = db.Column(Cents, nullable=False)  # 押金（分）
+    total_amount = db.Column(Cents, nullable=False)  # 总金额（租金+押金，分）
     
     # 订单状态
     status = db.Column(db.String(20), default='pending', nullable=False)  
@@ -36,19 +44,57 @@ class Order(db.Model):
     
     def to_dict(self):
         """转换为字典"""
-        return {
-            'id': self.id,
-            'order_number': self.order_number,
-            'renter_id': self.renter_id,
-            'owner_id': self.owner_id,
-            'account_id': self.account_id,
-            'rental_amount': float(self.rental_amount),
-            'deposit_amount': float(self.deposit_amount),
-            'total_amount': float(self.total_amount),
-            'status': self.status,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'paid_at': self.paid_at.strftime('%Y-%m-%d %H:%M:%S') if self.paid_at else None,
-            'completed_at': self.completed_at.strftime('%Y-%m-%d %H:%M:%S') if self.completed_at else None,
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'remarks': self.remarks
-        }
+        return order_serializer.dump(self)
+
+
+order_serializer = ModelSerializer(Order, [
+    'id', 'order_number', 'renter_id', 'owner_id', 'account_id', 'rental_amount',
+    'deposit_amount', 'total_amount', 'status', 'created_at', 'paid_at', 'completed_at',
+    'updated_at', 'remarks',
+])
+
+
+def earliest_pending_created_at():
+    """最早一笔待支付订单的创建时间，没有时返回 None"""
+    return db.session.query(func.min(Order.created_at)).filter(Order.status == 'pending').scalar()
+
+
+def expire_pending_orders(ttl_seconds, batch_size=500):
+    """
+    取消超时未支付的订单，并将账号恢复为可租赁
+
+    每批最多处理 batch_size 笔订单，在一个短事务中完成；订单状态使用条件更新，
+    与并发的支付、取消请求互不覆盖。返回取消的订单数。
+    """
+    orders = Order.__table__
+    accounts = Account.__table__
+    cutoff = datetime.now() - timedelta(seconds=ttl_seconds)
+    total = 0
+    while True:
+        order_ids = db.session.execute(
+            db.select(orders.c.id)
+            .where(orders.c.status == 'pending', orders.c.created_at < cutoff)
+            .order_by(orders.c.created_at)
+            .limit(batch_size)
+        ).scalars().all()
+        if not order_ids:
+            break
+        
+        account_ids = db.session.execute(
+            orders.update()
+            .where(orders.c.id.in_(order_ids), orders.c.status == 'pending')
+            .values(status='cancelled')
+            .returning(orders.c.account_id)
+        ).scalars().all()
+        if account_ids:
+            db.session.execute(
+                accounts.update()
+                .where(accounts.c.id.in_(account_ids), accounts.c.status == 'rented')
+                .values(status='available')
+            )
+        db.session.commit()
+        total += len(account_ids)
+        
+        if len(order_ids) < batch_size:
+            break
+    return total
@@ -0,0 +1,84 @@
+"""
+账号全文检索
+
+使用 SQLite FTS5 虚拟表 accounts_fts 索引区服、段位、常用地和备注，
+trigram 分词器按三字切分，中文无需额外分词即可检索。
+FTS5 保留了 rank 列名，因此采用无内容表（content=''）并单独命名各列，
+由触发器在 accounts 增删改时同步。
+"""
+from sqlalchemy import text, table, column, literal_column, or_, select
+from backend.models.user import db
+
+# trigram 分词器要求检索词至少包含3个字符，更短的检索词退回 LIKE
+MIN_MATCH_LENGTH = 3
+
+# FTS 列名 -> accounts 列名
+FTS_COLUMNS = {
+    'server_region': 'server_region',
+    'account_rank': 'rank',
+    'common_location': 'common_location',
+    'remarks': 'remarks',
+}
+
+_fts_names = ', '.join(FTS_COLUMNS)
+_new_values = ', '.join(f'new.{name}' for name in FTS_COLUMNS.values())
+_old_values = ', '.join(f'old.{name}' for name in FTS_COLUMNS.values())
+
+ACCOUNT_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS accounts_fts USING fts5({_fts_names}, content='', tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS accounts_fts_insert AFTER INSERT ON accounts BEGIN
+        INSERT INTO accounts_fts(rowid, {_fts_names}) VALUES (new.id, {_new_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS accounts_fts_delete AFTER DELETE ON accounts BEGIN
+        INSERT INTO accounts_fts(accounts_fts, rowid, {_fts_names}) VALUES ('delete', old.id, {_old_values});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS accounts_fts_update
+        AFTER UPDATE OF {', '.join(FTS_COLUMNS.values())} ON accounts BEGIN
+        INSERT INTO accounts_fts(accounts_fts, rowid, {_fts_names}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO accounts_fts(rowid, {_fts_names}) VALUES (new.id, {_new_values});
+    END""",
+]
+
+accounts_fts = table('accounts_fts', column('rowid'), column('rank'))
+
+
+def create_account_fts():
+    """创建全文索引表及同步触发器，新建时导入已有账号"""
+    exists = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'accounts_fts'")
+    ).first()
+    for ddl in ACCOUNT_FTS_DDL:
+        db.session.execute(text(ddl))
+    if not exists:
+        db.session.execute(text(
+            f"INSERT INTO accounts_fts(rowid, {_fts_names}) "
+            f"SELECT id, {', '.join(FTS_COLUMNS.values())} FROM accounts"
+        ))
+
+
+def _match_expression(keywords):
+    """将检索词转换为 FTS5 查询语句，每个词作为短语并以 AND 连接"""
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in keywords)
+
+
+def apply_search(query, model, keywords):
+    """
+    为账号查询添加全文检索条件，返回 (query, hits)
+
+    所有检索词都不少于3个字符时走 FTS5 索引：以 id IN (子查询) 过滤，
+    这样统计总数和其他排序仍可使用 accounts 上的索引；hits 为带 rank 的
+    命中子查询，按相关度排序时再与之连接。否则退回 LIKE，hits 为 None。
+
+    注意不要直接将 accounts_fts 与 accounts 连接后再按状态过滤，
+    SQLite 会以 accounts 为外层循环，对每一行重复执行一次 MATCH。
+    """
+    if all(len(word) >= MIN_MATCH_LENGTH for word in keywords):
+        match = literal_column('accounts_fts').op('MATCH')(_match_expression(keywords))
+        query = query.filter(model.id.in_(select(accounts_fts.c.rowid).where(match)))
+        hits = select(accounts_fts.c.rowid, accounts_fts.c.rank).where(match).subquery('fts_hits')
+        return query, hits
+
+    columns = [getattr(model, name) for name in FTS_COLUMNS.values()]
+    for word in keywords:
+        query = query.filter(or_(*[col.like(f'%{word}%') for col in columns]))
+    return query, None
@@ -0,0 +1,12 @@
+"""
+服务端会话模型
+"""
+from backend.models.user import db
+
+class SessionRecord(db.Model):
+    """会话表，浏览器 Cookie 中只保存 sid"""
+    __tablename__ = 'sessions'
+
+    sid = db.Column(db.String(64), primary_key=True)  # 会话ID
+    data = db.Column(db.Text, nullable=False)  # 序列化后的会话内容
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # 过期时间，清理任务按此列分批删除
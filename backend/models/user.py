@@ -3,10 +3,17 @@
 """
 from datetime import datetime, date
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from backend.utils.cache import LRUCache
+from backend.utils.money import Cents
+from backend.utils.passwords import get_password_hasher
+from backend.utils.serializers import ModelSerializer
 
 db = SQLAlchemy()
 
+# 已序列化的当前用户信息：user_id -> (ETag, JSON)，由 /api/auth/current 填充
+user_payload_cache = LRUCache(maxsize=1024)
+
 class User(db.Model):
     """用户表"""
     __tablename__ = 'users'
@@ -16,7 +23,7 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=True)
     phone = db.Column(db.String(20), unique=True, nullable=True)
-    balance = db.Column(db.Numeric(10, 2), default=0.00, nullable=False)  # 账户余额
+    balance = db.Column(Cents, default=0, nullable=False)  # 账户余额（分）
     lottery_chances = db.Column(db.Integer, default=0, nullable=False)  # 完成订单获得的免費抽奖次数
     last_lottery_date = db.Column(db.Date, nullable=True)  # 上次每日免费抽奖的日期
     is_admin = db.Column(db.Boolean, default=False, nullable=False)  # 是否为管理员
@@ -30,32 +37,105 @@ class User(db.Model):
     
     def set_password(self, password):
         """设置密码"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
     
     def check_password(self, password):
         """验证密码"""
-        return check_password_hash(self.password_hash, password)
+        return get_password_hasher().verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """密码哈希参数是否与当前配置不同"""
+        return get_password_hasher().needs_rehash(self.password_hash)
     
     def has_daily_lottery(self):
         """检查是否有今天的免费抽奖机会"""
         today = date.today()
         return self.last_lottery_date != today
     
-    def use_daily_lottery(self):
-        """使用今天的免费抽奖机会"""
-        self.last_lottery_date = date.today()
-    
     def to_dict(self):
         """转换为字典"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'phone': self.phone,
-            'balance': float(self.balance),
-            'lottery_chances': self.lottery_chances,  # 完成订单获得的次数
-            'has_daily_lottery': self.has_daily_lottery(),  # 是否有今日免费抽奖机会
-            'is_admin': self.is_admin,
-            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': self.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        }
+        data = user_serializer.dump(self)
+        data['has_daily_lottery'] = self.has_daily_lottery()  # 是否有今日免费抽奖机会
+        return data
+
+
+# lottery_chances 为完成订单获得的抽奖次数
+user_serializer = ModelSerializer(User, [
+    'id', 'username', 'email', 'phone', 'balance', 'lottery_chances', 'is_admin',
+    'created_at', 'updated_at',
+])
+
+
+def credit_balance(user_id, cents, kind, order_id=None):
+    """
+    增加用户余额（分）
+
+    以 UPDATE users SET balance = balance + :cents 在数据库中完成计算，
+    不会丢失并发更新，并在同一事务中记录类型为 kind 的资金流水。
+    返回更新后的余额，用户不存在时返回 None。
+    """
+    from backend.models.ledger import post_balance_change
+    
+    users = User.__table__
+    row = db.session.execute(
+        users.update()
+        .where(users.c.id == user_id)
+        .values(balance=users.c.balance + cents)
+        .returning(users.c.balance)
+    ).first()
+    if row:
+        post_balance_change(user_id, cents, kind, order_id)
+        mark_user_changed(user_id)
+    return row.balance if row else None
+
+
+def debit_balance(user_id, cents, kind, order_id=None):
+    """
+    扣减用户余额（分）
+
+    余额检查与扣减在同一条 UPDATE ... WHERE balance >= :cents 中完成，
+    并在同一事务中记录类型为 kind 的资金流水。
+    返回更新后的余额，余额不足或用户不存在时返回 None。
+    """
+    from backend.models.ledger import post_balance_change
+    
+    users = User.__table__
+    row = db.session.execute(
+        users.update()
+        .where(users.c.id == user_id, users.c.balance >= cents)
+        .values(balance=users.c.balance - cents)
+        .returning(users.c.balance)
+    ).first()
+    if row:
+        post_balance_change(user_id, -cents, kind, order_id)
+        mark_user_changed(user_id)
+    return row.balance if row else None
+
+
+def mark_user_changed(user_id):
+    """
+    记录当前事务修改过的用户
+
+    ORM 对象的修改在 flush 时自动记录，直接执行 UPDATE 语句的地方需要手动调用。
+    事务提交后这些用户的缓存信息被移除，回滚则丢弃记录。
+    """
+    db.session.info.setdefault('changed_user_ids', set()).add(user_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('changed_user_ids', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _evict_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_payload_cache.pop(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('changed_user_ids', None)
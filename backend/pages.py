@@ -0,0 +1,36 @@
+"""
+页面外壳缓存
+
+前端页面模板不依赖请求上下文，每个模板只在首次访问时渲染一次，渲染结果连同
+内容哈希（强 ETag）和预压缩版本保存在内存中；浏览器重新验证时直接返回 304。
+TEMPLATES_AUTO_RELOAD 或调试模式下每次请求重新渲染，模板和静态资源的修改立即生效。
+"""
+import threading
+from flask import current_app, render_template
+from backend.assets import Asset, auto_reload, send_asset
+
+
+class PageShells:
+    """已渲染的页面"""
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_name):
+        """渲染后的页面，首次访问时渲染"""
+        if auto_reload():
+            return Asset(render_template(template_name).encode('utf-8'), 'text/html')
+        page = self._pages.get(template_name)
+        if page is None:
+            with self._lock:
+                page = self._pages.get(template_name)
+                if page is None:
+                    page = Asset(render_template(template_name).encode('utf-8'), 'text/html')
+                    self._pages[template_name] = page
+        return page
+
+
+def render_page(template_name):
+    """返回预先渲染的页面，内容未变化时返回 304"""
+    return send_asset(current_app.extensions['page_shells'].get(template_name))
@@ -1,21 +1,47 @@
 """
 账号管理路由
 """
-from flask import Blueprint, request, jsonify, session
+import math
+import uuid
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from backend.idempotency import idempotent
+from backend.importer import IMPORT_FORMATS, detect_format, import_accounts
 from backend.models import db, Account
-from sqlalchemy import or_, and_
+from backend.models.account import (
+    MAX_PRICE_CENTS, knife_skin_masks_matching, account_serializer,
+    check_listing_fields, check_knife_skins, validate_listing, listing_row
+)
+from backend.models.search import apply_search
+from backend.utils.auth import login_required, current_user_id, current_user_is_admin
+from backend.utils.compression import gzip_json
+from backend.utils.money import parse_amount
+from backend.utils.pagination import keyset_paginate, InvalidCursor
 
 account_bp = Blueprint('account', __name__)
 
-# 允许的刀皮列表
-ALLOWED_KNIFE_SKINS = ['北极星', '黑海', '赤霄怜悯', '影锋', '信条']
+# 列表排序方式：排序列, 是否倒序（每种排序都有对应的 (status, 排序列) 索引）
+ACCOUNT_SORTS = {
+    'newest': (Account.created_at, True),
+    'price': (Account.order_amount, False),
+    'assets': (Account.pure_coin_assets, True),
+    'level': (Account.level, True),
+}
+
+def _listing_payload(serializer, rows, output_format):
+    """列表数据：rows 格式为对象数组；columnar 格式只输出一次列名，每行为值数组"""
+    if output_format == 'columnar':
+        return {'columns': list(serializer.fields), 'rows': serializer.dump_columnar(rows)}
+    return {'accounts': serializer.dump_rows(rows)}
 
 @account_bp.route('/', methods=['GET'])
+@gzip_json
 def get_accounts():
     """获取账号列表（支持搜索和筛选）"""
     # 获取查询参数
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')  # 游标分页（传入空字符串表示第一页）
     
     # 筛选条件
     safe_box_slots = request.args.getlist('safe_box_slots')  # 保险箱格数（可多选）
@@ -24,8 +50,37 @@ def get_accounts():
     min_assets = request.args.get('min_assets', type=float)  # 最小资产
     max_assets = request.args.get('max_assets', type=float)  # 最大资产
     knife_skins = request.args.getlist('knife_skins')  # 刀皮（可多选）
+    knife_skins_match = request.args.get('knife_skins_match', 'any')  # any: 包含任意一个, all: 包含全部
+    min_price = parse_amount(request.args.get('min_price'))  # 最低租金（元，转换为分）
+    max_price = parse_amount(request.args.get('max_price'))  # 最高租金（元，转换为分）
     server_region = request.args.get('server_region')  # 区服
     status = request.args.get('status', 'available')  # 状态
+    keywords = request.args.get('q', '').split()  # 关键词（检索区服、段位、常用地、备注）
+    sort = request.args.get('sort', 'relevance' if keywords else 'newest')  # 排序：relevance, newest, price, assets, level
+    fields = request.args.get('fields')  # 只返回指定字段（逗号分隔），id 与排序列总会返回
+    output_format = request.args.get('format', 'rows')  # rows: 对象数组, columnar: 列名 + 值数组
+    
+    if sort == 'relevance':
+        if not keywords:
+            return jsonify({'success': False, 'message': '按相关度排序需要提供关键词'}), 400
+        if cursor is not None:
+            return jsonify({'success': False, 'message': '按相关度排序不支持游标分页'}), 400
+    elif sort not in ACCOUNT_SORTS:
+        return jsonify({'success': False, 'message': f'不支持的排序方式: {sort}'}), 400
+    
+    if output_format not in ('rows', 'columnar'):
+        return jsonify({'success': False, 'message': f'不支持的格式: {output_format}'}), 400
+    
+    # 输出字段：只查询需要的列
+    serializer = account_serializer
+    if fields:
+        selected = {name.strip() for name in fields.split(',') if name.strip()} | {'id'}
+        if sort != 'relevance':
+            selected.add(ACCOUNT_SORTS[sort][0].key)
+        try:
+            serializer = account_serializer.subset(selected)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
     
     # 构建查询
     query = Account.query.filter_by(status=status)
@@ -47,27 +102,78 @@ def get_accounts():
     if max_assets:
         query = query.filter(Account.pure_coin_assets <= max_assets)
     
+    # 租金筛选
+    if min_price:
+        query = query.filter(Account.order_amount >= min_price)
+    if max_price:
+        query = query.filter(Account.order_amount <= max_price)
+    
     # 区服筛选
     if server_region:
         query = query.filter(Account.server_region.like(f'%{server_region}%'))
     
-    # 刀皮筛选（包含任意一个指定的刀皮）
+    # 刀皮筛选（默认包含任意一个指定的刀皮，knife_skins_match=all 时需包含全部）
     if knife_skins:
-        # 使用JSON查询
-        conditions = []
-        for skin in knife_skins:
-            conditions.append(Account.knife_skins.contains([skin]))
-        if conditions:
-            query = query.filter(or_(*conditions))
+        masks = knife_skin_masks_matching(knife_skins, match_all=knife_skins_match == 'all')
+        query = query.filter(Account.knife_skin_mask.in_(masks))
+    
+    # 关键词检索
+    hits = None
+    if keywords:
+        query, hits = apply_search(query, Account, keywords)
+    
+    # 只读取输出的列，结果行直接序列化，不构建模型对象
+    query = query.with_entities(*serializer.columns)
+    
+    # 按相关度排序：总数仍由过滤后的查询统计，只有取当前页时才连接命中结果
+    if sort == 'relevance':
+        total = query.order_by(None).count()
+        if hits is not None:
+            query = query.join(hits, hits.c.rowid == Account.id).order_by(hits.c.rank, Account.id.desc())
+        else:
+            query = query.order_by(Account.created_at.desc(), Account.id.desc())
+        page, per_page = max(page, 1), max(per_page, 1)
+        accounts = query.limit(per_page).offset((page - 1) * per_page).all()
+        
+        return jsonify({
+            'success': True,
+            **_listing_payload(serializer, accounts, output_format),
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': math.ceil(total / per_page)
+        }), 200
+    
+    sort_column, descending = ACCOUNT_SORTS[sort]
+    
+    # 游标分页：不统计总数，直接定位到下一页
+    if cursor is not None:
+        try:
+            accounts, next_cursor = keyset_paginate(
+                query, Account, cursor, per_page, sort_column=sort_column, descending=descending
+            )
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': '无效的游标'}), 400
+        
+        return jsonify({
+            'success': True,
+            **_listing_payload(serializer, accounts, output_format),
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }), 200
     
     # 分页
-    pagination = query.order_by(Account.created_at.desc()).paginate(
+    if descending:
+        ordering = (sort_column.desc(), Account.id.desc())
+    else:
+        ordering = (sort_column.asc(), Account.id.asc())
+    pagination = query.order_by(*ordering).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
     return jsonify({
         'success': True,
-        'accounts': [account.to_dict() for account in pagination.items],
+        **_listing_payload(serializer, pagination.items, output_format),
         'total': pagination.total,
         'page': page,
         'per_page': per_page,
@@ -85,82 +191,18 @@ def get_account(account_id):
     return jsonify({'success': True, 'account': account.to_dict()}), 200
 
 @account_bp.route('/', methods=['POST'])
+@login_required
 def create_account():
     """发布账号"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    data = request.get_json()
-    
-    # 验证必填字段（account_number 由系统生成）
-    required_fields = ['pure_coin_assets', 'safe_box_slots', 'price', 'server_region', 'total_assets']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'success': False, 'message': f'缺少必填字段: {field}'}), 400
-    
-    # 验证总资产 > 纯币资产
-    total_assets = float(data.get('total_assets', 0))
-    pure_coin = float(data.get('pure_coin_assets', 0))
+    user_id = current_user_id()
     
-    if total_assets <= pure_coin:
-        return jsonify({'success': False, 'message': '总资产必须大于纯币资产'}), 400
-    
-    # 验证保险箱格数
-    if data['safe_box_slots'] not in [4, 6, 9]:
-        return jsonify({'success': False, 'message': '保险箱格数只能是4、6或9'}), 400
-    
-    # 验证刀皮
-    knife_skins = data.get('knife_skins', [])
-    if knife_skins:
-        if not isinstance(knife_skins, list):
-            return jsonify({'success': False, 'message': '刀皮必须是数组'}), 400
-        for skin in knife_skins:
-            if skin not in ALLOWED_KNIFE_SKINS:
-                return jsonify({'success': False, 'message': f'不允许的刀皮: {skin}'}), 400
+    error, fields = validate_listing(request.get_json(silent=True))
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
     
     # 生成唯一的账号编号
-    import uuid
-    from datetime import datetime
     account_number = f'ACC{datetime.now().strftime("%Y%m%d%H%M%S")}{uuid.uuid4().hex[:6].upper()}'
-    
-    # 创建账号（临时）以计算押金
-    temp_account = Account(
-        user_id=user_id,
-        account_number=account_number,
-        pure_coin_assets=data['pure_coin_assets'],
-        safe_box_slots=data['safe_box_slots'],
-        price=data['price'],
-        deposit=0,  # 先设为0，下面会覆盖
-        total_assets=data.get('total_assets')
-    )
-    
-    # 计算押金（租金的30%）
-    rental_amount = temp_account.calculate_order_amount()
-    calculated_deposit = round(rental_amount * 0.3, 2)
-    
-    # 创建最终账号
-    account = Account(
-        user_id=user_id,
-        account_number=account_number,
-        collection_time=data.get('collection_time'),
-        login_time=data.get('login_time'),
-        common_location=data.get('common_location'),
-        server_region=data.get('server_region'),
-        login_method=data.get('login_method'),
-        face_verification=data.get('face_verification'),
-        rank=data.get('rank'),
-        total_assets=data.get('total_assets'),
-        pure_coin_assets=data['pure_coin_assets'],
-        level=data.get('level'),
-        stamina_level=data.get('stamina_level'),
-        safe_box_slots=data['safe_box_slots'],
-        aw_bullets=data.get('aw_bullets'),
-        knife_skins=knife_skins,
-        price=data['price'],
-        deposit=calculated_deposit,
-        remarks=data.get('remarks')
-    )
+    account = Account(user_id=user_id, account_number=account_number, **fields)
     
     try:
         db.session.add(account)
@@ -170,34 +212,130 @@ def create_account():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'发布失败: {str(e)}'}), 500
 
+@account_bp.route('/bulk', methods=['POST'])
+@login_required
+@idempotent
+def bulk_create_accounts():
+    """
+    批量发布账号
+
+    请求体 {"accounts": [...], "partial": false}。全部数据先校验一遍，再用一条 executemany
+    在同一个事务中插入。默认有任何一条不合法时整批不插入并返回各条的错误；partial 为 true 时
+    插入合法的条目，不合法的条目在 errors 中按下标报告。
+    """
+    user_id = current_user_id()
+    
+    data = request.get_json(silent=True) or {}
+    items = data.get('accounts')
+    partial = bool(data.get('partial', False))
+    max_items = current_app.config['ACCOUNT_BULK_MAX']
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'message': 'accounts 必须是非空数组'}), 400
+    if len(items) > max_items:
+        return jsonify({'success': False, 'message': f'一次最多发布{max_items}个账号'}), 400
+    
+    now = datetime.now()
+    batch = f'ACC{now.strftime("%Y%m%d%H%M%S")}{uuid.uuid4().hex[:6].upper()}'
+    rows, indexes, errors = [], [], []
+    for index, item in enumerate(items):
+        error, fields = validate_listing(item)
+        if error:
+            errors.append({'index': index, 'message': error})
+            continue
+        # 同一批次共用前缀，按下标编号，比单条发布的编号长，两者不会重复
+        rows.append(listing_row(fields, user_id=user_id, account_number=f'{batch}{index:05d}', now=now))
+        indexes.append(index)
+    
+    if errors and (not partial or not rows):
+        return jsonify({'success': False, 'message': '部分账号数据不合法', 'errors': errors}), 400
+    
+    try:
+        table = Account.__table__
+        ids = db.session.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'发布失败: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'message': f'成功发布{len(ids)}个账号',
+        'created': [{'index': index, 'id': account_id} for index, account_id in zip(indexes, ids)],
+        'errors': errors
+    }), 201
+
+@account_bp.route('/import', methods=['POST'])
+@login_required
+def import_accounts_file():
+    """
+    导入账号库存（CSV 或 NDJSON）
+
+    可以上传表单文件（字段 file），也可以直接把文件作为请求体；格式由 format 参数、
+    文件扩展名或 Content-Type 决定。按 external_key 新增或更新账号，重复导入同一文件是安全的，
+    因此不需要 Idempotency-Key（计算请求指纹会把整个文件读入内存）。
+    """
+    user_id = current_user_id()
+    
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if upload:
+        stream = upload.stream
+        file_format = request.args.get('format') or detect_format(upload.filename, upload.mimetype)
+    else:
+        stream = request.stream
+        file_format = request.args.get('format') or detect_format(content_type=request.mimetype)
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({'success': False, 'message': '文件格式只能是 csv 或 ndjson'}), 400
+    
+    try:
+        report = import_accounts(
+            user_id, stream, file_format,
+            current_app.config['IMPORT_CHUNK_SIZE'], current_app.config['IMPORT_MAX_ERRORS']
+        )
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'导入失败: {str(e)}'}), 500
+    
+    result = report.to_dict()
+    if report.aborted:
+        return jsonify({'success': False, 'message': f'导入中断: {report.aborted}', 'report': result}), 400
+    return jsonify({
+        'success': True,
+        'message': f'导入完成：新增{report.inserted}个，更新{report.updated}个，拒绝{report.rejected}行',
+        'report': result
+    }), 200
+
 @account_bp.route('/<int:account_id>', methods=['PUT'])
+@login_required
 def update_account(account_id):
     """更新账号信息"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     account = Account.query.get(account_id)
     if not account:
         return jsonify({'success': False, 'message': '账号不存在'}), 404
     
     # 验证权限
-    if account.user_id != user_id and not session.get('is_admin'):
+    if account.user_id != user_id and not current_user_is_admin():
         return jsonify({'success': False, 'message': '无权限修改此账号'}), 403
     
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': '账号数据格式不正确'}), 400
+    
+    # 验证字段类型，与发布时的规则一致
+    error = check_listing_fields(data)
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
     
     # 更新字段
     if 'safe_box_slots' in data and data['safe_box_slots'] not in [4, 6, 9]:
         return jsonify({'success': False, 'message': '保险箱格数只能是4、6或9'}), 400
     
     if 'knife_skins' in data:
-        knife_skins = data['knife_skins']
-        if knife_skins and not isinstance(knife_skins, list):
-            return jsonify({'success': False, 'message': '刀皮必须是数组'}), 400
-        for skin in knife_skins:
-            if skin not in ALLOWED_KNIFE_SKINS:
-                return jsonify({'success': False, 'message': f'不允许的刀皮: {skin}'}), 400
+        error, data['knife_skins'] = check_knife_skins(data['knife_skins'])
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
     
     # 更新允许的字段
     allowed_fields = [
@@ -207,6 +345,13 @@ def update_account(account_id):
         'aw_bullets', 'knife_skins', 'price', 'deposit', 'remarks', 'status'
     ]
     
+    # 金额字段以元传入，保存为分
+    for field in ('price', 'deposit'):
+        if field in data:
+            data[field] = parse_amount(data[field])
+            if data[field] is None or not 0 <= data[field] < MAX_PRICE_CENTS:
+                return jsonify({'success': False, 'message': f'{field} 格式不正确'}), 400
+    
     for field in allowed_fields:
         if field in data:
             setattr(account, field, data[field])
@@ -219,18 +364,17 @@ def update_account(account_id):
         return jsonify({'success': False, 'message': f'更新失败: {str(e)}'}), 500
 
 @account_bp.route('/<int:account_id>', methods=['DELETE'])
+@login_required
 def delete_account(account_id):
     """删除账号"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     account = Account.query.get(account_id)
     if not account:
         return jsonify({'success': False, 'message': '账号不存在'}), 404
     
     # 验证权限
-    if account.user_id != user_id and not session.get('is_admin'):
+    if account.user_id != user_id and not current_user_is_admin():
         return jsonify({'success': False, 'message': '无权限删除此账号'}), 403
     
     try:
@@ -1,8 +1,12 @@
 """
 用户认证路由
 """
-from flask import Blueprint, request, jsonify, session
+from datetime import date
+from flask import Blueprint, request, jsonify, session, current_app
 from backend.models import db, User
+from backend.models.user import user_payload_cache
+from backend.sessions import regenerate_session
+from backend.utils.auth import current_user, current_user_id
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -55,7 +59,16 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'success': False, 'message': '用户名或密码错误'}), 401
     
-    # 设置会话
+    # 哈希参数调整后，在登录成功时按新参数重新计算，失败不影响本次登录
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+    
+    # 设置会话：登录前的会话ID作废，换用新ID，防止会话固定
+    regenerate_session(session)
     session['user_id'] = user.id
     session['username'] = user.username
     session['is_admin'] = user.is_admin
@@ -68,20 +81,46 @@ def login():
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """用户登出"""
+    """用户登出（删除服务端会话记录和 Cookie）"""
     session.clear()
     return jsonify({'success': True, 'message': '登出成功'}), 200
 
+def _user_etag(user_id, updated_at):
+    """用户信息版本号：updated_at 随每次写入变化，日期决定 has_daily_lottery"""
+    return f'u{user_id}-{updated_at:%Y%m%d%H%M%S%f}-{date.today():%Y%m%d}'
+
+
 @auth_bp.route('/current', methods=['GET'])
 def get_current_user():
-    """获取当前登录用户信息"""
-    user_id = session.get('user_id')
-    
+    """
+    获取当前登录用户信息
+
+    先按主键只读取 updated_at 计算 ETag：与 If-None-Match 相同时直接返回 304；
+    否则优先使用进程内缓存的序列化结果，缓存未命中才加载完整用户。
+    版本号来自数据库，多进程部署下也不会返回过期数据。
+    """
+    user_id = current_user_id()
     if not user_id:
         return jsonify({'success': False, 'message': '未登录'}), 401
     
-    user = User.query.get(user_id)
-    if not user:
+    updated_at = db.session.query(User.updated_at).filter_by(id=user_id).scalar()
+    if updated_at is None:
         return jsonify({'success': False, 'message': '用户不存在'}), 404
     
-    return jsonify({'success': True, 'user': user.to_dict()}), 200
+    etag = _user_etag(user_id, updated_at)
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        cached = user_payload_cache.get(user_id)
+        if cached and cached[0] == etag:
+            body = cached[1]
+        else:
+            body = current_app.json.dumps({'success': True, 'user': current_user().to_dict()})
+            user_payload_cache.set(user_id, (etag, body))
+        response = current_app.response_class(body, mimetype='application/json')
+    
+    # 浏览器可以缓存，但每次使用前都要带 If-None-Match 重新验证
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
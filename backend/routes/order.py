@@ -1,60 +1,104 @@
 """
 订单管理路由
 """
-from flask import Blueprint, request, jsonify, session
-from backend.models import db, Order, Account, User
+from flask import Blueprint, request, jsonify, current_app
+from backend.models import db, Order, Account, User, credit_balance, debit_balance, mark_user_changed
+from backend.models.commission import record_commission
+from backend.idempotency import idempotent
+from backend.utils.auth import login_required, current_user, current_user_id, current_user_is_admin
+from backend.utils.compression import gzip_json
+from backend.utils.money import apply_ratio
+from backend.utils.pagination import keyset_paginate, InvalidCursor
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import uuid
-from decimal import Decimal
 
 order_bp = Blueprint('order', __name__)
 
+def _compare_and_set(model, row_id, expected_status, **values):
+    """
+    条件更新：仅当记录仍处于 expected_status 时才写入新值
+
+    在数据库中以单条 UPDATE ... WHERE status = ? 完成检查和修改，
+    并发请求中只有一个能成功，返回是否更新成功。
+    """
+    table = model.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.id == row_id, table.c.status == expected_status)
+        .values(**values)
+    )
+    return result.rowcount == 1
+
+def _order_detail_options():
+    """订单详情需要的关联对象，随订单一次性JOIN加载，避免逐条查询"""
+    return (
+        joinedload(Order.account),
+        joinedload(Order.renter),
+        joinedload(Order.account_owner),
+    )
+
+def _order_detail(order):
+    """订单信息（包含账号和双方用户信息）"""
+    order_dict = order.to_dict()
+    if order.account:
+        order_dict['account'] = order.account.to_dict()
+    if order.renter:
+        order_dict['renter'] = {'id': order.renter.id, 'username': order.renter.username}
+    if order.account_owner:
+        order_dict['owner'] = {'id': order.account_owner.id, 'username': order.account_owner.username}
+    return order_dict
+
 @order_bp.route('/', methods=['GET'])
+@login_required
+@gzip_json
 def get_orders():
     """获取订单列表"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     # 获取查询参数
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     order_type = request.args.get('type', 'all')  # all, rented, owned
+    cursor = request.args.get('cursor')  # 游标分页（传入空字符串表示第一页）
     
     # 构建查询
     if order_type == 'rented':
         # 我租赁的订单
-        query = Order.query.filter_by(renter_id=user_id)
+        query = Order.query.options(*_order_detail_options()).filter_by(renter_id=user_id)
     elif order_type == 'owned':
         # 我出租的订单
-        query = Order.query.filter_by(owner_id=user_id)
+        query = Order.query.options(*_order_detail_options()).filter_by(owner_id=user_id)
     else:
         # 所有相关订单
-        query = Order.query.filter(
+        query = Order.query.options(*_order_detail_options()).filter(
             (Order.renter_id == user_id) | (Order.owner_id == user_id)
         )
     
     # 分页
-    pagination = query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    next_cursor = None
+    if cursor is not None:
+        # 游标分页：不统计总数，直接定位到下一页
+        try:
+            orders, next_cursor = keyset_paginate(query, Order, cursor, per_page)
+        except InvalidCursor:
+            return jsonify({'success': False, 'message': '无效的游标'}), 400
+    else:
+        pagination = query.order_by(Order.created_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        orders = pagination.items
     
-    # 获取订单详情（包含账号信息）
-    orders_data = []
-    for order in pagination.items:
-        order_dict = order.to_dict()
-        # 添加账号信息
-        account = Account.query.get(order.account_id)
-        if account:
-            order_dict['account'] = account.to_dict()
-        # 添加用户信息
-        renter = User.query.get(order.renter_id)
-        owner = User.query.get(order.owner_id)
-        if renter:
-            order_dict['renter'] = {'id': renter.id, 'username': renter.username}
-        if owner:
-            order_dict['owner'] = {'id': owner.id, 'username': owner.username}
-        orders_data.append(order_dict)
+    # 获取订单详情（账号和用户信息已随订单一并加载）
+    orders_data = [_order_detail(order) for order in orders]
+    
+    if cursor is not None:
+        return jsonify({
+            'success': True,
+            'orders': orders_data,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        }), 200
     
     return jsonify({
         'success': True,
@@ -66,34 +110,27 @@ def get_orders():
     }), 200
 
 @order_bp.route('/<int:order_id>', methods=['GET'])
+@login_required
 def get_order(order_id):
     """获取订单详情"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
-    order = Order.query.get(order_id)
+    order = Order.query.options(*_order_detail_options()).get(order_id)
     if not order:
         return jsonify({'success': False, 'message': '订单不存在'}), 404
     
     # 验证权限
-    if order.renter_id != user_id and order.owner_id != user_id and not session.get('is_admin'):
+    if order.renter_id != user_id and order.owner_id != user_id and not current_user_is_admin():
         return jsonify({'success': False, 'message': '无权限查看此订单'}), 403
     
-    order_dict = order.to_dict()
-    # 添加账号信息
-    account = Account.query.get(order.account_id)
-    if account:
-        order_dict['account'] = account.to_dict()
-    
-    return jsonify({'success': True, 'order': order_dict}), 200
+    return jsonify({'success': True, 'order': _order_detail(order)}), 200
 
 @order_bp.route('/', methods=['POST'])
+@login_required
+@idempotent
 def create_order():
     """创建订单"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     data = request.get_json()
     
@@ -114,14 +151,14 @@ def create_order():
     if account.user_id == user_id:
         return jsonify({'success': False, 'message': '不能租赁自己的账号'}), 400
     
-    # 计算订单金额
-    rental_amount = account.calculate_order_amount()
-    deposit_amount = float(account.deposit)
+    # 计算订单金额（分）
+    rental_amount = account.order_amount
+    deposit_amount = account.deposit
     total_amount = rental_amount + deposit_amount
     
     # 检查用户余额
-    user = User.query.get(user_id)
-    if float(user.balance) < total_amount:
+    user = current_user()
+    if user.balance < total_amount:
         return jsonify({'success': False, 'message': '余额不足，请先充值'}), 400
     
     # 生成订单编号
@@ -140,23 +177,30 @@ def create_order():
     )
     
     try:
+        # 订单创建时立即标记账号为已租出（待支付），账号已被他人租出时放弃
+        if not _compare_and_set(Account, account.id, 'available', status='rented'):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '账号不可租赁'}), 400
+        
         db.session.add(order)
+        db.session.commit()
         
-        # 订单创建时立即标记账号为已租出（待支付）
-        account.status = 'rented'
+        # 通知超时调度器有新的待支付订单
+        scheduler = current_app.extensions.get('order_expiry')
+        if scheduler:
+            scheduler.notify_new_order()
         
-        db.session.commit()
         return jsonify({'success': True, 'message': '订单创建成功', 'order': order.to_dict()}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'订单创建失败: {str(e)}'}), 500
 
 @order_bp.route('/<int:order_id>/pay', methods=['POST'])
+@login_required
+@idempotent
 def pay_order(order_id):
     """支付订单"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     order = Order.query.get(order_id)
     if not order:
@@ -170,35 +214,26 @@ def pay_order(order_id):
     if order.status != 'pending':
         return jsonify({'success': False, 'message': '订单状态不正确'}), 400
     
-    # 检查用户余额
-    user = User.query.get(user_id)
-    if float(user.balance) < float(order.total_amount):
-        return jsonify({'success': False, 'message': '余额不足'}), 400
-    
-    # 获取账号和出租方
-    account = Account.query.get(order.account_id)
-    owner = User.query.get(order.owner_id)
-    
-    # 获取管理员账户
-    admin = User.query.filter_by(is_admin=True).first()
-    
     try:
-        # 扣除租赁方余额
-        user.balance -= Decimal(str(order.total_amount))
+        # 更新订单状态为'正在租赁'，订单已被并发请求支付或取消时放弃
+        if not _compare_and_set(Order, order.id, 'pending', status='renting', paid_at=datetime.now()):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '订单状态不正确'}), 400
         
-        # 租金给出租方
-        owner.balance += Decimal(str(order.rental_amount))
+        # 扣除租赁方余额（余额检查与扣减在同一条UPDATE中完成）
+        if debit_balance(user_id, order.total_amount, 'order_payment', order.id) is None:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '余额不足'}), 400
         
-        # 定金50%给下单方(租赁方)
-        user.balance += Decimal(str(order.deposit_amount)) / 2
+        # 租金给出租方
+        credit_balance(order.owner_id, order.rental_amount, 'order_income', order.id)
         
-        # 定金50%给管理员
-        if admin:
-            admin.balance += Decimal(str(order.deposit_amount)) / 2
+        # 定金50%作为平台抽成（按分四舍五入），记入抽成流水，定期结算到平台账户
+        commission = apply_ratio(order.deposit_amount, 50, 100)
+        record_commission(order.id, commission)
         
-        # 更新订单状态为'正在租赁'
-        order.status = 'renting'
-        order.paid_at = datetime.now()
+        # 其余定金退给下单方(租赁方)
+        credit_balance(user_id, order.deposit_amount - commission, 'deposit_refund', order.id)
         
         # 账号状态已在订单创建时设置为'rented'，这里不需要再改
         
@@ -209,40 +244,42 @@ def pay_order(order_id):
         return jsonify({'success': False, 'message': f'支付失败: {str(e)}'}), 500
 
 @order_bp.route('/<int:order_id>/complete', methods=['POST'])
+@login_required
 def complete_order(order_id):
     """完成订单（租赁结束）"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     order = Order.query.get(order_id)
     if not order:
         return jsonify({'success': False, 'message': '订单不存在'}), 404
     
     # 验证权限（租赁方或出租方都可以完成订单）
-    if order.renter_id != user_id and order.owner_id != user_id and not session.get('is_admin'):
+    if order.renter_id != user_id and order.owner_id != user_id and not current_user_is_admin():
         return jsonify({'success': False, 'message': '无权限操作此订单'}), 403
     
     # 检查订单状态 - 只有'renting'状态才能完成
     if order.status != 'renting':
         return jsonify({'success': False, 'message': '订单状态不正确，只有正在租赁的订单才能确认为已组赁'}), 400
     
-    # 获取租赁方和账号
-    renter = User.query.get(order.renter_id)
-    account = Account.query.get(order.account_id)
-    
     try:
         # 订单完成时，更新状态并增加租赁方的抽奖次数
         
-        # 更新订单状态为'已组赁'
-        order.status = 'completed'
-        order.completed_at = datetime.now()
+        # 更新订单状态为'已组赁'，订单已被并发请求处理时放弃
+        if not _compare_and_set(Order, order.id, 'renting', status='completed', completed_at=datetime.now()):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '订单状态不正确，只有正在租赁的订单才能确认为已组赁'}), 400
         
         # 更新账号状态回到可租赁
-        account.status = 'available'
+        _compare_and_set(Account, order.account_id, 'rented', status='available')
         
         # 增加租赁方的免费抽奖次数
-        renter.lottery_chances += 1
+        users = User.__table__
+        db.session.execute(
+            users.update()
+            .where(users.c.id == order.renter_id)
+            .values(lottery_chances=users.c.lottery_chances + 1)
+        )
+        mark_user_changed(order.renter_id)
         
         db.session.commit()
         return jsonify({'success': True, 'message': '订单已确认为已组赁，资金分配完成，已获得1次免费抽奖机会', 'order': order.to_dict()}), 200
@@ -251,18 +288,17 @@ def complete_order(order_id):
         return jsonify({'success': False, 'message': f'操作失败: {str(e)}'}), 500
 
 @order_bp.route('/<int:order_id>/cancel', methods=['POST'])
+@login_required
 def cancel_order(order_id):
     """取消订单"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
     order = Order.query.get(order_id)
     if not order:
         return jsonify({'success': False, 'message': '订单不存在'}), 404
     
     # 验证权限
-    if order.renter_id != user_id and not session.get('is_admin'):
+    if order.renter_id != user_id and not current_user_is_admin():
         return jsonify({'success': False, 'message': '无权限取消此订单'}), 403
     
     # 只能取消待支付的订单
@@ -270,14 +306,13 @@ def cancel_order(order_id):
         return jsonify({'success': False, 'message': '只能取消待支付的订单'}), 400
     
     try:
-        # 获取账号，取消订单时恢复账号为可租赁状态
-        account = Account.query.get(order.account_id)
-        
-        order.status = 'cancelled'
+        # 订单已被并发请求支付或取消时放弃
+        if not _compare_and_set(Order, order.id, 'pending', status='cancelled'):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '只能取消待支付的订单'}), 400
         
         # 恢复账号为可租赁
-        if account:
-            account.status = 'available'
+        _compare_and_set(Account, order.account_id, 'rented', status='available')
         
         db.session.commit()
         return jsonify({'success': True, 'message': '订单已取消', 'order': order.to_dict()}), 200
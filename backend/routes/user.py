@@ -1,32 +1,38 @@
 """
 用户管理路由
 """
-from flask import Blueprint, request, jsonify, session
-from backend.models import db, User
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import func
+from backend.models import db, User, Account, credit_balance, debit_balance
+from backend.models.commission import get_platform_user_id, pending_commission_total
+from backend.models.account import account_serializer
+from backend.models.ledger import user_statement
+from backend.models.lottery import draw_lottery
+from backend.idempotency import idempotent
+from backend.utils.auth import login_required, current_user, current_user_id, current_user_is_admin
+from backend.utils.compression import gzip_json
+from backend.utils.money import parse_amount, to_cents, to_yuan
+from backend.utils.pagination import keyset_paginate, InvalidCursor
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/profile', methods=['GET'])
+@login_required
 def get_profile():
     """获取用户个人信息"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({'success': False, 'message': '用户不存在'}), 404
     
     return jsonify({'success': True, 'user': user.to_dict()}), 200
 
 @user_bp.route('/profile', methods=['PUT'])
+@login_required
 def update_profile():
     """更新用户个人信息"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+    user_id = current_user_id()
     
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({'success': False, 'message': '用户不存在'}), 404
     
@@ -54,14 +60,48 @@ def update_profile():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'更新失败: {str(e)}'}), 500
 
+@user_bp.route('/me/accounts', methods=['GET'])
+@login_required
+@gzip_json
+def get_my_accounts():
+    """获取我发布的账号（包含全部状态）"""
+    user_id = current_user_id()
+    
+    per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor', '')  # 游标（为空时返回第一页）
+    status = request.args.get('status')  # 状态（不传则返回全部状态）
+    
+    query = Account.query.with_entities(*account_serializer.columns).filter_by(user_id=user_id)
+    if status:
+        query = query.filter_by(status=status)
+    
+    try:
+        accounts, next_cursor = keyset_paginate(query, Account, cursor, per_page)
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': '无效的游标'}), 400
+    
+    # 各状态的账号数量
+    status_counts = dict(
+        db.session.query(Account.status, func.count())
+        .filter(Account.user_id == user_id)
+        .group_by(Account.status)
+        .all()
+    )
+    
+    return jsonify({
+        'success': True,
+        'accounts': account_serializer.dump_rows(accounts),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+        'status_counts': status_counts,
+        'total': sum(status_counts.values())
+    }), 200
+
 @user_bp.route('/change-password', methods=['POST'])
+@login_required
 def change_password():
     """修改密码"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({'success': False, 'message': '用户不存在'}), 404
     
@@ -86,132 +126,148 @@ def change_password():
         return jsonify({'success': False, 'message': f'密码修改失败: {str(e)}'}), 500
 
 @user_bp.route('/recharge', methods=['POST'])
+@login_required
+@idempotent
 def recharge():
     """充值"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'success': False, 'message': '用户不存在'}), 404
+    user_id = current_user_id()
     
     data = request.get_json()
     
     # 验证金额
-    amount = data.get('amount')
+    amount = parse_amount(data.get('amount'))
     if not amount or amount <= 0:
         return jsonify({'success': False, 'message': '充值金额必须大于0'}), 400
+    max_amount = current_app.config['MAX_TRANSACTION_AMOUNT']
+    if amount > to_cents(max_amount):
+        return jsonify({'success': False, 'message': f'单笔充值金额不能超过{max_amount}元'}), 400
     
     try:
-        user.balance += amount
+        balance = credit_balance(user_id, amount, 'recharge')
+        if balance is None:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': '用户不存在'}), 404
         db.session.commit()
         return jsonify({
             'success': True, 
-            'message': f'充值成功，当前余额: {float(user.balance)}',
-            'balance': float(user.balance)
+            'message': f'充值成功，当前余额: {to_yuan(balance)}',
+            'balance': to_yuan(balance)
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'充值失败: {str(e)}'}), 500
 
 @user_bp.route('/withdraw', methods=['POST'])
+@login_required
+@idempotent
 def withdraw():
     """提现"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'success': False, 'message': '用户不存在'}), 404
+    user_id = current_user_id()
     
     data = request.get_json()
     
     # 验证金额
-    amount = data.get('amount')
+    amount = parse_amount(data.get('amount'))
     if not amount or amount <= 0:
         return jsonify({'success': False, 'message': '提现金额必须大于0'}), 400
-    
-    # 检查余额
-    if float(user.balance) < amount:
-        return jsonify({'success': False, 'message': '余额不足'}), 400
+    max_amount = current_app.config['MAX_TRANSACTION_AMOUNT']
+    if amount > to_cents(max_amount):
+        return jsonify({'success': False, 'message': f'单笔提现金额不能超过{max_amount}元'}), 400
     
     try:
-        user.balance -= amount
+        # 余额检查与扣减在同一条UPDATE中完成
+        balance = debit_balance(user_id, amount, 'withdraw')
+        if balance is None:
+            db.session.rollback()
+            if not current_user():
+                return jsonify({'success': False, 'message': '用户不存在'}), 404
+            return jsonify({'success': False, 'message': '余额不足'}), 400
         db.session.commit()
         return jsonify({
             'success': True, 
-            'message': f'提现申请已提交，当前余额: {float(user.balance)}',
-            'balance': float(user.balance)
+            'message': f'提现申请已提交，当前余额: {to_yuan(balance)}',
+            'balance': to_yuan(balance)
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'提现失败: {str(e)}'}), 500
 
 @user_bp.route('/balance', methods=['GET'])
+@login_required
 def get_balance():
     """获取余额"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    user = User.query.get(user_id)
+    user = current_user()
     if not user:
         return jsonify({'success': False, 'message': '用户不存在'}), 404
     
-    return jsonify({'success': True, 'balance': float(user.balance)}), 200
+    return jsonify({'success': True, 'balance': to_yuan(user.balance)}), 200
 
-@user_bp.route('/lottery-chance', methods=['POST'])
-def use_lottery_chance():
-    """使用订单获得的免費抽奖次数"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
-    
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'success': False, 'message': '用户不存在'}), 404
-    
-    # 检查是否有免費次数
-    if user.lottery_chances < 1:
-        return jsonify({'success': False, 'message': '你不拥有免費抽奖次数'}), 400
+@user_bp.route('/me/statement', methods=['GET'])
+@login_required
+@gzip_json
+def get_statement():
+    """资金明细（按时间倒序，游标分页）"""
+    per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor', '')  # 游标（为空时返回第一页）
     
     try:
-        user.lottery_chances -= 1
-        db.session.commit()
-        return jsonify({
-            'success': True, 
-            'message': '已使用1次抽奖次数',
-            'lottery_chances': user.lottery_chances
-        }), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'success': False, 'message': f'操作失败: {str(e)}'}), 500
+        entries, next_cursor = user_statement(current_user_id(), cursor, per_page)
+    except InvalidCursor:
+        return jsonify({'success': False, 'message': '无效的游标'}), 400
+    
+    return jsonify({
+        'success': True,
+        'entries': entries,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }), 200
 
-@user_bp.route('/use-daily-lottery', methods=['POST'])
-def use_daily_lottery():
-    """使用每日免费抽奖机会"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({'success': False, 'message': '请先登录'}), 401
+@user_bp.route('/platform-revenue', methods=['GET'])
+@login_required
+def get_platform_revenue():
+    """获取平台收入（管理员）"""
+    if not current_user_is_admin():
+        return jsonify({'success': False, 'message': '无权限查看平台收入'}), 403
     
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'success': False, 'message': '用户不存在'}), 404
+    platform_user_id = get_platform_user_id()
+    platform_user = User.query.get(platform_user_id) if platform_user_id else None
+    settled = platform_user.balance if platform_user else 0
+    pending = pending_commission_total()
+    
+    return jsonify({
+        'success': True,
+        'settled_balance': to_yuan(settled),  # 平台账户余额
+        'pending_commission': to_yuan(pending),  # 尚未结算的抽成
+        'total': to_yuan(settled + pending)
+    }), 200
+
+@user_bp.route('/lottery/draw', methods=['POST'])
+@login_required
+def lottery_draw():
+    """抽奖（服务端抽取奖品、扣减次数并发放奖金），支持一次连抽多次"""
+    user_id = current_user_id()
+    data = request.get_json(silent=True) or {}
     
-    # 检查是否有今日免费抽奖机会
-    if not user.has_daily_lottery():
-        return jsonify({'success': False, 'message': '您今天已经使用过免费抽奖机会，请明天再来'}), 400
+    count = data.get('count', 1)
+    max_batch = current_app.config['LOTTERY_MAX_BATCH']
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= max_batch:
+        return jsonify({'success': False, 'message': f'抽奖次数必须是1到{max_batch}之间的整数'}), 400
     
     try:
-        user.use_daily_lottery()
-        db.session.commit()
-        return jsonify({
-            'success': True, 
-            'message': '已使用今日免费抽奖机会',
-            'has_daily_lottery': user.has_daily_lottery()
-        }), 200
+        prizes = draw_lottery(user_id, count)
     except Exception as e:
         db.session.rollback()
-        return jsonify({'success': False, 'message': f'操作失败: {str(e)}'}), 500
+        return jsonify({'success': False, 'message': f'抽奖失败: {str(e)}'}), 500
+    
+    if prizes is None:
+        return jsonify({'success': False, 'message': '抽奖次数不足，每天一次免费抽奖或完成租赁订单可获得'}), 400
+    
+    user = User.query.get(user_id)
+    return jsonify({
+        'success': True,
+        'prizes': [{'name': prize['name'], 'amount': to_yuan(prize['amount'])} for prize in prizes],
+        'total_amount': to_yuan(sum(prize['amount'] for prize in prizes)),
+        'balance': to_yuan(user.balance),
+        'lottery_chances': user.lottery_chances,
+        'has_daily_lottery': user.has_daily_lottery()
+    }), 200
@@ -0,0 +1,94 @@
+"""
+待支付订单超时调度
+
+后台线程每次只关心最早到期的一笔待支付订单：通过 (status, created_at)
+索引查出最早的创建时间，休眠到它到期后批量取消所有已超时的订单，再计算
+下一个到期时间。无论积压多少待支付订单，内存占用和每次唤醒的开销都是常数级。
+
+同一个线程每隔 settle_interval 秒把未结算的平台抽成计入平台账户。
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from backend.models import db
+from backend.models.commission import settle_commissions
+from backend.models.order import earliest_pending_created_at, expire_pending_orders
+
+# 没有待支付订单时的最长休眠时间（秒），新订单会提前唤醒
+IDLE_INTERVAL = 60
+
+
+class OrderExpiryScheduler:
+    """待支付订单超时调度器"""
+    
+    def __init__(self, ttl_seconds, batch_size, settle_interval=None):
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        self.settle_interval = settle_interval  # 结算平台抽成的间隔（秒），为 None 时不结算
+        self._next_settle = 0
+        self._wakeup = threading.Condition()
+        self._idle = False
+        self._stopped = False
+        self._thread = None
+    
+    def start(self, app):
+        """启动后台线程"""
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, args=(app,), name='order-expiry', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5):
+        """停止后台线程"""
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def notify_new_order(self):
+        """有新的待支付订单；调度器空闲时唤醒以计算到期时间"""
+        if self._idle:
+            with self._wakeup:
+                self._wakeup.notify()
+    
+    def run_once(self):
+        """
+        取消所有已超时的订单，到期时结算平台抽成
+
+        返回距下一笔订单到期的秒数（没有待支付订单时为 None）。线程最多休眠 IDLE_INTERVAL 秒，
+        结算最多比 settle_interval 晚这么久。
+        """
+        expire_pending_orders(self.ttl_seconds, self.batch_size)
+        earliest = earliest_pending_created_at()
+        self._settle_if_due()
+        db.session.remove()
+        if earliest is None:
+            return None
+        deadline = earliest + timedelta(seconds=self.ttl_seconds)
+        return max((deadline - datetime.now()).total_seconds(), 1)
+    
+    def _settle_if_due(self):
+        """距上次结算超过 settle_interval 秒时结算平台抽成"""
+        if self.settle_interval is None or time.monotonic() < self._next_settle:
+            return
+        settle_commissions()
+        self._next_settle = time.monotonic() + self.settle_interval
+    
+    def _run(self, app):
+        while not self._stopped:
+            try:
+                with app.app_context():
+                    delay = self.run_once()
+            except Exception as e:
+                app.logger.exception('订单超时扫描失败: %s', e)
+                delay = IDLE_INTERVAL
+            
+            with self._wakeup:
+                if self._stopped:
+                    break
+                self._idle = delay is None
+                self._wakeup.wait(IDLE_INTERVAL if delay is None else min(delay, IDLE_INTERVAL))
+                self._idle = False
@@ -0,0 +1,243 @@
+"""
+服务端会话
+
+Cookie 中只保存随机生成的会话ID，会话内容放在服务端存储中，登出后会话在服务端
+立即失效，也能统计当前有效的会话数。通过 Config.SESSION_TYPE 选择存储：
+
+- cookie：Flask 默认的签名 Cookie，不使用服务端存储
+- memory：进程内 LRU，适合单进程部署
+- sqlalchemy：数据库 sessions 表，多进程共享
+
+每个请求按会话ID读取一次存储（内存字典或主键查询），标记为 sessionless 的页面和
+静态文件请求不读取；内容未变化且剩余有效期超过一半时不回写。过期会话读取时视为不存在，并由清理任务按 expires_at 分批删除。
+"""
+import secrets
+import time
+from datetime import datetime
+from flask.sessions import SecureCookieSession, SessionInterface, session_json_serializer
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from werkzeug.exceptions import HTTPException
+from backend.models import db, SessionRecord
+from backend.utils.cache import LRUCache
+
+SWEEP_BATCH_SIZE = 1000
+
+
+def sessionless(view):
+    """标记不使用会话的视图（页面、静态文件），请求这些地址时不读取会话存储"""
+    view.sessionless = True
+    return view
+
+
+class ServerSession(SecureCookieSession):
+    """保存在服务端的会话，沿用 Flask 对 modified/accessed 的跟踪"""
+
+    def __init__(self, initial=None, sid=None, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.expires_at = expires_at
+        self.new = expires_at is None
+        self.discarded_sids = []
+
+    def regenerate(self):
+        """换用新的会话ID，旧ID在保存会话时从存储中删除（登录时调用，防止会话固定）"""
+        if not self.new:
+            self.discarded_sids.append(self.sid)
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+def regenerate_session(session):
+    """清空会话并换用新的会话ID；签名 Cookie 会话没有服务端ID，只清空内容"""
+    session.clear()
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+class MemorySessionStore:
+    """进程内会话存储，超过容量时淘汰最久未使用的会话"""
+
+    def __init__(self, maxsize=10000):
+        self._cache = LRUCache(maxsize)
+
+    def load(self, sid):
+        """读取会话，返回 (内容, 过期时间)，不存在或已过期时返回 None"""
+        entry = self._cache.get(sid)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if expires_at <= datetime.now():
+            self._cache.pop(sid)
+            return None
+        return session_json_serializer.loads(data), expires_at
+
+    def save(self, sid, data, expires_at):
+        """写入会话"""
+        self._cache.set(sid, (session_json_serializer.dumps(dict(data)), expires_at))
+
+    def delete(self, sid):
+        """删除会话"""
+        self._cache.pop(sid)
+
+    def sweep(self, batch_size=SWEEP_BATCH_SIZE):
+        """删除最多 batch_size 个过期会话，返回删除数量"""
+        now = datetime.now()
+        expired = [sid for sid, (_, expires_at) in self._cache.items() if expires_at <= now]
+        for sid in expired[:batch_size]:
+            self._cache.pop(sid)
+        return len(expired[:batch_size])
+
+    def count(self):
+        """有效会话数"""
+        now = datetime.now()
+        return sum(1 for _, (_, expires_at) in self._cache.items() if expires_at > now)
+
+
+class SqlSessionStore:
+    """数据库会话存储，使用独立连接读写，不影响请求中的 db.session 事务"""
+
+    table = SessionRecord.__table__
+
+    def load(self, sid):
+        """读取会话，返回 (内容, 过期时间)，不存在或已过期时返回 None"""
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.data, self.table.c.expires_at).where(self.table.c.sid == sid)
+            ).first()
+        if row is None or row.expires_at <= datetime.now():
+            return None
+        return session_json_serializer.loads(row.data), row.expires_at
+
+    def save(self, sid, data, expires_at):
+        """写入会话，已存在时覆盖"""
+        values = {'sid': sid, 'data': session_json_serializer.dumps(dict(data)), 'expires_at': expires_at}
+        stmt = insert(self.table).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.table.c.sid],
+            set_={'data': stmt.excluded.data, 'expires_at': stmt.excluded.expires_at}
+        )
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def delete(self, sid):
+        """删除会话"""
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.sid == sid))
+
+    def sweep(self, batch_size=SWEEP_BATCH_SIZE):
+        """按 expires_at 索引删除最多 batch_size 个过期会话，返回删除数量"""
+        expired = (
+            select(self.table.c.sid)
+            .where(self.table.c.expires_at <= datetime.now())
+            .limit(batch_size)
+        )
+        with db.engine.begin() as conn:
+            return conn.execute(delete(self.table).where(self.table.c.sid.in_(expired))).rowcount
+
+    def count(self):
+        """有效会话数"""
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).where(self.table.c.expires_at > datetime.now())
+            ).scalar()
+
+
+SESSION_STORES = {
+    'memory': lambda config: MemorySessionStore(config['SESSION_MEMORY_MAXSIZE']),
+    'sqlalchemy': lambda config: SqlSessionStore(),
+}
+
+
+class ServerSessionInterface(SessionInterface):
+    """Cookie 只保存会话ID的会话接口"""
+
+    def __init__(self, store, sweep_interval=300):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and not self._is_sessionless(app, request):
+            loaded = self.store.load(sid)
+            if loaded:
+                data, expires_at = loaded
+                return ServerSession(data, sid, expires_at)
+        # 未知或已过期的会话ID不沿用，重新生成
+        return ServerSession()
+
+    @staticmethod
+    def _is_sessionless(app, request):
+        """请求的视图是否标记为不使用会话（会话在路由匹配之前打开，这里单独匹配一次）"""
+        try:
+            endpoint, _ = app.create_url_adapter(request).match()
+        except HTTPException:
+            return False
+        return getattr(app.view_functions.get(endpoint), 'sessionless', False)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        # 已换用新ID的旧会话立即失效
+        for sid in session.discarded_sids:
+            self.store.delete(sid)
+
+        # 会话被清空（登出）时删除服务端记录和 Cookie
+        if not session:
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly
+                )
+                response.vary.add('Cookie')
+            return
+
+        now = datetime.now()
+        lifetime = app.permanent_session_lifetime
+        if not session.modified:
+            if not app.config['SESSION_REFRESH_EACH_REQUEST'] or session.expires_at - now > lifetime / 2:
+                self._maybe_sweep()
+                return
+
+        self.store.save(session.sid, session, now + lifetime)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
+        response.vary.add('Cookie')
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        """每隔 sweep_interval 秒顺带清理一批过期会话"""
+        if time.monotonic() < self._next_sweep:
+            return
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        self.store.sweep()
+
+
+def init_session(app):
+    """按 SESSION_TYPE 设置会话接口，cookie 时保留 Flask 默认实现"""
+    session_type = app.config['SESSION_TYPE']
+    if session_type == 'cookie':
+        return
+    if session_type not in SESSION_STORES:
+        raise ValueError(f'不支持的 SESSION_TYPE: {session_type}')
+    store = SESSION_STORES[session_type](app.config)
+    app.session_interface = ServerSessionInterface(store, app.config['SESSION_SWEEP_INTERVAL'])
@@ -0,0 +1,38 @@
+"""
+登录校验与当前用户
+
+会话中的 user_id、is_admin 由 Flask 签名保护，只需要用户ID或管理员标记的
+接口直接信任会话，不访问数据库；需要完整用户信息时通过 current_user()
+获取，同一请求内最多查询一次，结果缓存在 flask.g 上。
+"""
+from functools import wraps
+from flask import g, jsonify, session
+from backend.models import User
+
+
+def current_user_id():
+    """当前登录用户ID，未登录时返回 None"""
+    return session.get('user_id')
+
+
+def current_user_is_admin():
+    """当前登录用户是否为管理员"""
+    return bool(session.get('is_admin'))
+
+
+def current_user():
+    """当前登录用户，同一请求内只查询一次；未登录或用户不存在时返回 None"""
+    if '_current_user' not in g:
+        user_id = current_user_id()
+        g._current_user = User.query.get(user_id) if user_id else None
+    return g._current_user
+
+
+def login_required(view):
+    """要求登录的接口，未登录时返回401"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user_id():
+            return jsonify({'success': False, 'message': '请先登录'}), 401
+        return view(*args, **kwargs)
+    return wrapper
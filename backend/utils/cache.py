@@ -0,0 +1,49 @@
+"""
+进程内缓存
+"""
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存，超过 maxsize 时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """读取条目，命中时移到最近使用的位置"""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        """写入条目"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """移除条目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self):
+        """当前全部条目的快照"""
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
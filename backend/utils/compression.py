@@ -0,0 +1,28 @@
+"""
+响应压缩
+"""
+import gzip
+from functools import wraps
+from flask import current_app, request
+
+
+def gzip_json(view):
+    """
+    列表接口的 gzip 压缩
+
+    响应体不小于 GZIP_MIN_SIZE 且客户端接受 gzip 时压缩后返回；小响应压缩收益
+    低于开销，原样返回。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = current_app.make_response(view(*args, **kwargs))
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or not request.accept_encodings['gzip']):
+            return response
+        data = response.get_data()
+        if len(data) >= current_app.config['GZIP_MIN_SIZE']:
+            response.set_data(gzip.compress(data, compresslevel=current_app.config['GZIP_LEVEL']))
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+    return wrapper
@@ -0,0 +1,35 @@
+"""
+JSON 编码
+
+安装了 orjson 时使用 orjson 编码响应，未安装时保留 Flask 默认实现。orjson 原生支持的
+日期时间类型交给 Flask 默认的 default 处理，输出格式与默认实现一致。
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """基于 orjson 的 JSON 编解码"""
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.option)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    """orjson 可用时替换应用的 JSON 编码"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
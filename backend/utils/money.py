@@ -0,0 +1,52 @@
+"""
+金额工具
+
+金额在数据库和后端计算中一律使用以分为单位的整数（Cents 列类型），加减、比较和索引
+都是精确的整数运算；只在接口边界换算：请求中的元金额用 parse_amount / to_cents 转为分，
+响应中用 to_yuan 输出为 float。按比例计算（押金、抽成、订单金额）用 apply_ratio
+做整数四舍五入，不经过浮点数。
+"""
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from sqlalchemy import Integer
+from sqlalchemy.types import TypeDecorator
+
+
+class Cents(TypeDecorator):
+    """金额列：以分为单位的整数"""
+    impl = Integer
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return int
+
+
+def to_cents(amount):
+    """金额（元）转换为分，四舍五入到分"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def to_yuan(cents):
+    """分转换为元，用于接口输出"""
+    return cents / 100
+
+
+def parse_amount(value):
+    """解析请求中的金额（元），返回分；不是有效数字时返回 None"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    try:
+        return to_cents(value)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def apply_ratio(cents, numerator, denominator):
+    """cents × numerator ÷ denominator，四舍五入到分（整数运算）"""
+    value = cents * numerator
+    if value < 0:
+        return -apply_ratio(-cents, numerator, denominator)
+    return (2 * value + denominator) // (2 * denominator)
@@ -0,0 +1,102 @@
+"""
+游标分页工具
+
+键集分页：不使用 OFFSET，也不执行 COUNT(*)，每一页都直接从上一页
+最后一行的 (排序列, id) 位置继续向后查找，深翻页与首页开销一致。
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import tuple_, and_, or_
+
+# 游标模式下单页最大条数
+MAX_PER_PAGE = 100
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析"""
+
+
+def _dump_value(value):
+    """将排序列的值转换为可JSON序列化的形式"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(column, value):
+    """按排序列的类型还原游标中的值"""
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def encode_cursor(sort_value, row_id):
+    """将 (排序列的值, id) 编码为不透明游标"""
+    raw = json.dumps([_dump_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    """解析游标，返回 (排序列的值, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _load_value(sort_column, sort_value), int(row_id)
+    except (ValueError, TypeError, ArithmeticError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+
+def _after(sort_column, id_column, sort_value, row_id, descending):
+    """
+    位于游标之后的行的过滤条件
+
+    SQLite 中 NULL 在升序时排最前、降序时排最后，可空的排序列需要单独处理。
+    """
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < row_id)
+        condition = tuple_(sort_column, id_column) < tuple_(sort_value, row_id)
+        return or_(condition, sort_column.is_(None)) if sort_column.expression.nullable else condition
+
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > row_id), sort_column.isnot(None))
+    return tuple_(sort_column, id_column) > tuple_(sort_value, row_id)
+
+
+def keyset_paginate(query, model, cursor, per_page, sort_column=None, descending=True):
+    """
+    按 (排序列, id) 进行键集分页，排序列默认为 created_at 倒序
+
+    cursor 为空字符串时从第一页开始。返回 (items, next_cursor)，
+    没有下一页时 next_cursor 为 None。
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    if sort_column is None:
+        sort_column = model.created_at
+
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        query = query.filter(_after(sort_column, model.id, sort_value, row_id, descending))
+
+    if descending:
+        ordering = (sort_column.desc(), model.id.desc())
+    else:
+        ordering = (sort_column.asc(), model.id.asc())
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+
+    return rows, next_cursor
@@ -0,0 +1,117 @@
+"""
+密码哈希服务
+
+KDF 计算在有界进程池中执行，请求线程只等待结果，不再和其他请求争用 CPU 与 GIL。
+排队中的任务数有上限，登录、注册突发时超出上限的请求在等待 PASSWORD_HASH_TIMEOUT
+秒后返回 503，而不是让所有 worker 都卡在哈希计算上。
+
+进程池用 forkserver（不支持时用 spawn）启动子进程，不在多线程的服务进程中直接 fork。
+子进程异常退出导致进程池损坏时重建进程池并重试一次，仍然失败则在当前线程中计算。
+
+哈希参数来自 Config.PASSWORD_HASH_METHOD（Werkzeug 格式，需写明全部参数，如
+scrypt:32768:8:1），登录成功时若已存储的哈希参数与配置不同则按新参数重新计算。
+"""
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """排队的哈希任务已达上限"""
+
+
+class PasswordHasher:
+    """密码哈希服务，workers 为 0 时在当前线程中计算"""
+
+    def __init__(self, method, workers=0, max_pending=16, timeout=5):
+        self.method = method
+        self.timeout = timeout
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = self._new_executor() if workers else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _new_executor(self):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def _replace_broken(self, broken):
+        """重建损坏的进程池（并发请求只重建一次），返回新的进程池"""
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _submit(self, func, *args):
+        executor = self._executor
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            executor = self._replace_broken(executor)
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            return func(*args)
+
+    def _run(self, func, *args):
+        if self._executor is None:
+            return func(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy()
+        try:
+            return self._submit(func, *args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """按当前参数计算密码哈希"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """批量计算密码哈希，进程池中并行执行，用于批量创建用户"""
+        if self._executor is None:
+            return [generate_password_hash(password, self.method) for password in passwords]
+        executor = self._executor
+        try:
+            return list(executor.map(generate_password_hash, passwords, [self.method] * len(passwords)))
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            return [generate_password_hash(password, self.method) for password in passwords]
+
+    def verify(self, pwhash, password):
+        """验证密码"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """已存储的哈希是否使用了与当前配置不同的参数"""
+        return pwhash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+
+def get_password_hasher():
+    """当前应用的密码哈希服务，首次使用时按配置创建"""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        config = current_app.config
+        hasher = PasswordHasher(
+            config['PASSWORD_HASH_METHOD'],
+            config['PASSWORD_HASH_WORKERS'],
+            config['PASSWORD_HASH_MAX_PENDING'],
+            config['PASSWORD_HASH_TIMEOUT'],
+        )
+        if current_app.extensions.setdefault('password_hasher', hasher) is not hasher:
+            hasher.shutdown()
+            return current_app.extensions['password_hasher']
+        atexit.register(hasher.shutdown)
+    return hasher
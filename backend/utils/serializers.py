@@ -0,0 +1,98 @@
+"""
+模型序列化
+
+每个模型输出的字段及各字段的编码函数在导入时按列类型确定一次，序列化时不再
+逐字段判断：金额（分）转为元，Numeric 转 float，DateTime 用 isoformat 输出 'YYYY-MM-DD HH:MM:SS'，
+Date 输出 'YYYY-MM-DD'，其余列原样输出。
+
+列表接口可以只查询 serializer.columns（返回结果行而非模型对象），跳过 ORM 对象
+构建和 identity map，再用 dump_row 直接序列化；subset 返回只包含部分字段的序列化器，
+用于按请求的字段只查询需要的列。
+"""
+from operator import attrgetter
+from sqlalchemy import Date, DateTime, Numeric
+from backend.utils.cache import LRUCache
+from backend.utils.money import Cents, to_yuan
+
+
+def format_datetime(value):
+    """日期时间格式化为 'YYYY-MM-DD HH:MM:SS'"""
+    return value.isoformat(' ', 'seconds')
+
+
+def date_isoformat(value):
+    """日期格式化为 'YYYY-MM-DD'"""
+    return value.isoformat()
+
+
+def _encoder_for(column_type):
+    if isinstance(column_type, Cents):
+        return to_yuan
+    if isinstance(column_type, Numeric):
+        return float
+    if isinstance(column_type, DateTime):
+        return format_datetime
+    if isinstance(column_type, Date):
+        return date_isoformat
+    return None
+
+
+class ModelSerializer:
+    """按固定字段列表序列化模型对象或查询结果行"""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+        self.columns = tuple(getattr(model, name) for name in self.fields)
+        # attrgetter 只有一个字段时返回单个值而不是元组
+        self._get = attrgetter(*self.fields) if len(self.fields) > 1 else lambda obj: (getattr(obj, self.fields[0]),)
+        self._encoders = tuple(
+            (name, encoder)
+            for name, column in zip(self.fields, self.columns)
+            if (encoder := _encoder_for(column.type)) is not None
+        )
+        self._encoder_indexes = tuple(
+            (self.fields.index(name), encoder) for name, encoder in self._encoders
+        )
+        self._subsets = LRUCache(maxsize=64)
+
+    def subset(self, fields):
+        """只包含指定字段的序列化器（按原字段顺序），有不支持的字段时抛出 ValueError"""
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ValueError(f'不支持的字段: {", ".join(sorted(unknown))}')
+        selected = tuple(name for name in self.fields if name in fields)
+        serializer = self._subsets.get(selected)
+        if serializer is None:
+            serializer = ModelSerializer(self.model, selected)
+            self._subsets.set(selected, serializer)
+        return serializer
+
+    def dump(self, obj):
+        """序列化模型对象"""
+        return self.dump_row(self._get(obj))
+
+    def dump_row(self, row):
+        """序列化按 self.columns 顺序查询的结果行"""
+        data = dict(zip(self.fields, row))
+        for name, encode in self._encoders:
+            value = data[name]
+            if value is not None:
+                data[name] = encode(value)
+        return data
+
+    def dump_rows(self, rows):
+        """序列化多行查询结果"""
+        return [self.dump_row(row) for row in rows]
+
+    def dump_columnar(self, rows):
+        """列式序列化：每行输出为按 self.fields 顺序排列的值列表"""
+        result = []
+        for row in rows:
+            values = list(row)
+            for index, encode in self._encoder_indexes:
+                value = values[index]
+                if value is not None:
+                    values[index] = encode(value)
+            result.append(values)
+        return result
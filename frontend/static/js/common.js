@@ -59,7 +59,9 @@ async function apiRequest(url, options = {}) {
         const data = await response.json();
         
         if (!response.ok) {
-            throw new Error(data.message || '请求失败');
+            const error = new Error(data.message || '请求失败');
+            error.status = response.status;
+            throw error;
         }
         
         return data;
@@ -69,14 +71,46 @@ async function apiRequest(url, options = {}) {
     }
 }
 
+// 生成幂等键
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+// 带 Idempotency-Key 的写请求（下单、支付、充值、提现）
+// 网络错误或相同请求仍在处理中(409)时用同一个键重试，服务端只执行一次
+async function idempotentRequest(url, options = {}, key = newIdempotencyKey(), retries = 2) {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await apiRequest(url, {
+                ...options,
+                headers: { 'Idempotency-Key': key, ...options.headers }
+            });
+        } catch (error) {
+            const retryable = error instanceof TypeError || error.status === 409;
+            if (!retryable || attempt >= retries) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 500 * (attempt + 1)));
+        }
+    }
+}
+
 // 获取当前用户信息
-async function getCurrentUser() {
-    try {
-        const data = await apiRequest('/auth/current');
-        return data.user;
-    } catch (error) {
-        return null;
+// 同一时刻的多次调用（导航栏、登录检查、页面本身）共用一个请求；
+// 浏览器带 If-None-Match 重新验证，用户信息未变化时服务端只返回 304
+let currentUserRequest = null;
+
+function getCurrentUser() {
+    if (!currentUserRequest) {
+        currentUserRequest = apiRequest('/auth/current', { cache: 'no-cache' })
+            .then(data => data.user)
+            .catch(() => null)
+            .finally(() => { currentUserRequest = null; });
     }
+    return currentUserRequest;
 }
 
 // 检查登录状态
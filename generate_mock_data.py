@@ -5,7 +5,14 @@ import sys
 sys.path.insert(0, '/home/ubuntu/game_rental_platform')
 
 from backend.app import create_app
-from backend.models import db, User, Account, Order
+from backend.models import (
+    db, User, Account, Order, PlatformCommission, SessionRecord, IdempotencyKey,
+    LedgerTransaction, LedgerEntry, LedgerSnapshot
+)
+from backend.models.account import SAFE_BOX_RATIOS
+from backend.migrations import upgrade_database
+from backend.utils.money import apply_ratio, to_cents
+from backend.utils.passwords import get_password_hasher
 from datetime import datetime, timedelta
 import random
 
@@ -30,7 +37,7 @@ def generate_users(count=20):
         username='admin',
         email='admin@example.com',
         phone='13800000000',
-        balance=0.00,
+        balance=0,
         is_admin=True
     )
     admin.set_password('admin123')
@@ -43,12 +50,15 @@ def generate_users(count=20):
             username=f'user{i:03d}',
             email=f'user{i:03d}@example.com',
             phone=f'138{i:08d}',
-            balance=round(random.uniform(100, 10000), 2),
+            balance=to_cents(round(random.uniform(100, 10000), 2)),
             is_admin=False
         )
-        user.set_password('123456')
         users.append(user)
     
+    # 普通用户的密码哈希在进程池中并行计算
+    for user, password_hash in zip(users[1:], get_password_hasher().hash_many(['123456'] * count)):
+        user.password_hash = password_hash
+    
     print(f"创建了 {count} 个普通用户 (密码: 123456)")
     return users
 
@@ -77,13 +87,12 @@ def generate_accounts(users, count=50):
         # 随机等级
         level = random.randint(20, 100)
         
-        # 计算价格（基于纯币资产）
-        ratio_map = {9: 38, 6: 40, 4: 42}
-        ratio = ratio_map[safe_box_slots]
-        price = round(pure_coin_assets * 100 / ratio, 2)
+        # 计算价格（基于纯币资产，单位：分）
+        ratio = SAFE_BOX_RATIOS[safe_box_slots]
+        price = apply_ratio(to_cents(pure_coin_assets), 100, ratio)
         
         # 押金（价格的30%）
-        deposit = round(price * 0.3, 2)
+        deposit = apply_ratio(price, 30, 100)
         
         account = Account(
             user_id=owner.id,
@@ -134,7 +143,7 @@ def generate_orders(users, accounts, count=30):
         
         # 计算金额
         rental_amount = account.calculate_order_amount()
-        deposit_amount = float(account.deposit)
+        deposit_amount = account.deposit
         total_amount = rental_amount + deposit_amount
         
         # 随机订单状态
@@ -178,11 +187,17 @@ def main():
     with app.app_context():
         # 创建所有表
         print("正在创建数据库表...")
-        db.create_all()
+        upgrade_database()
         print("数据库表创建成功！")
         
         # 清空现有数据
         print("\n正在清空现有数据...")
+        LedgerSnapshot.query.delete()
+        LedgerEntry.query.delete()
+        LedgerTransaction.query.delete()
+        PlatformCommission.query.delete()
+        SessionRecord.query.delete()
+        IdempotencyKey.query.delete()
         Order.query.delete()
         Account.query.delete()
         User.query.delete()
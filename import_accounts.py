@@ -0,0 +1,75 @@
+"""
+导入账号库存脚本
+
+用法：python import_accounts.py stock.csv --seller user001 [--format csv|ndjson] [--chunk-size 1000]
+
+文件按行流式读取，每批在一个事务中写入，按 external_key 新增或更新该卖家的账号。
+"""
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend.app import create_app
+from backend.importer import IMPORT_FORMATS, detect_format, import_accounts
+from backend.models import User
+from backend.migrations import upgrade_database
+
+
+def print_progress(report):
+    """在同一行刷新进度"""
+    print(
+        f"\r已处理 {report.rows} 行：新增 {report.inserted}，更新 {report.updated}，"
+        f"拒绝 {report.rejected}，{report.rows_per_sec:.0f} 行/秒",
+        end='', flush=True
+    )
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='导入账号库存（CSV 或 NDJSON）')
+    parser.add_argument('path', help='CSV 或 NDJSON 文件')
+    parser.add_argument('--seller', required=True, help='卖家用户名')
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='文件格式，默认按扩展名判断')
+    parser.add_argument('--chunk-size', type=int, help='每个事务写入的行数，默认为 IMPORT_CHUNK_SIZE')
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.path)
+    if file_format is None:
+        parser.error('无法根据扩展名判断文件格式，请指定 --format')
+
+    app = create_app()
+
+    with app.app_context():
+        upgrade_database()
+
+        seller = User.query.filter_by(username=args.seller).first()
+        if seller is None:
+            print(f"用户不存在: {args.seller}")
+            sys.exit(1)
+
+        with open(args.path, 'rb') as stream:
+            report = import_accounts(
+                seller.id, stream, file_format,
+                args.chunk_size or app.config['IMPORT_CHUNK_SIZE'],
+                app.config['IMPORT_MAX_ERRORS'],
+                on_progress=print_progress
+            )
+        print()
+
+        for error in report.errors:
+            print(f"第 {error['line']} 行: {error['message']}")
+        if report.rejected > len(report.errors):
+            print(f"……另有 {report.rejected - len(report.errors)} 行被拒绝")
+
+        print("\n" + "="*50)
+        print(f"共 {report.rows} 行，新增 {report.inserted} 个账号，更新 {report.updated} 个，拒绝 {report.rejected} 行")
+        print(f"耗时 {report.elapsed:.2f} 秒，{report.rows_per_sec:.0f} 行/秒")
+        print("="*50)
+
+        if report.aborted:
+            print(f"导入中断: {report.aborted}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
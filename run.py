@@ -8,14 +8,14 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from backend.app import create_app
-from backend.models import db
+from backend.migrations import upgrade_database
 
 if __name__ == '__main__':
     app = create_app()
     
-    # 创建数据库表
+    # 创建数据库表并升级已有数据库
     with app.app_context():
-        db.create_all()
+        upgrade_database()
         print("数据库表检查完成！")
     
     # 运行应用
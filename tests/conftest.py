@@ -0,0 +1,94 @@
+"""
+测试夹具
+
+每个测试使用临时目录中的独立数据库，并按 upgrade_database() 建表；
+会话使用进程内存储，不启动待支付订单超时调度，密码哈希在当前线程中计算。
+"""
+import threading
+import time
+import pytest
+from backend.app import create_app
+from backend.config import Config
+from backend.migrations import upgrade_database
+from backend.models import db, User, Account
+
+
+@pytest.fixture
+def session_type():
+    """会话存储类型，测试中可以用同名参数覆盖"""
+    return 'memory'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, session_type):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path / "test.db"}')
+    monkeypatch.setattr(Config, 'SESSION_TYPE', session_type)
+    monkeypatch.setattr(Config, 'ORDER_EXPIRY_ENABLED', False)
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_WORKERS', 0)
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        upgrade_database()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id, is_admin=False):
+    """直接在会话中写入登录状态"""
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['is_admin'] = is_admin
+
+
+def create_user(username, balance=0, is_admin=False, password=None):
+    """创建用户，balance 单位为分；不需要登录接口时不计算密码哈希"""
+    user = User(username=username, password_hash='x', balance=balance, is_admin=is_admin)
+    if password:
+        user.set_password(password)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def create_account(user_id, number, **fields):
+    """创建可租赁的账号"""
+    values = dict(
+        pure_coin_assets=100, total_assets=1000, safe_box_slots=4,
+        price=1000, deposit=3000, server_region='QQ', level=30
+    )
+    values.update(fields)
+    account = Account(user_id=user_id, account_number=number, **values)
+    db.session.add(account)
+    db.session.commit()
+    return account.id
+
+
+def run_threads(app, count, target):
+    """同时启动 count 个线程执行 target(index)，返回耗时"""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(index):
+        with app.app_context():
+            try:
+                barrier.wait()
+                target(index)
+            except Exception as e:  # 线程中的断言失败也要让测试失败
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return time.perf_counter() - started
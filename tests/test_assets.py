@@ -0,0 +1,151 @@
+"""
+静态资源与响应压缩测试
+
+带哈希的地址返回 immutable 缓存头，哈希不符或缺失时按 ETag 重新验证；CSS 中的
+图片地址改写为带哈希的地址；只有 Accept-Encoding 允许时才返回 gzip 版本。
+gzip_json 跳过小于 GZIP_MIN_SIZE 的响应体，只在客户端接受 gzip 时压缩大响应。
+"""
+import gzip
+import pytest
+from backend.assets import AssetManifest, MIN_COMPRESS_SIZE
+from tests.conftest import create_user, create_account
+
+CSS = 'css/style.css'
+
+
+def _manifest(app):
+    return app.extensions['assets']
+
+
+def _get(client, url, encoding=None, etag=None):
+    headers = {}
+    if encoding is not None:
+        headers['Accept-Encoding'] = encoding
+    if etag is not None:
+        headers['If-None-Match'] = etag
+    return client.get(url, headers=headers)
+
+
+def test_hashed_url_resolves_with_immutable_cache(app, client):
+    url = _manifest(app).url(CSS)
+    assert url.startswith(f'/static/{CSS}?v=')
+
+    response = _get(client, url)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/css'
+    assert response.cache_control.public and response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 24 * 3600
+
+    for stale in (f'/static/{CSS}', f'/static/{CSS}?v=000000000000'):
+        response = _get(client, stale)
+        assert response.status_code == 200
+        assert response.cache_control.no_cache
+        assert not response.cache_control.immutable
+
+    assert _get(client, '/static/css/missing.css').status_code == 404
+    assert _manifest(app).url('css/missing.css') == '/static/css/missing.css'
+
+
+def test_templates_use_hashed_urls(app, client):
+    body = _get(client, '/').get_data(as_text=True)
+    assert _manifest(app).url(CSS) in body
+
+
+def test_css_references_rewritten_to_hashed_urls(app, client):
+    image_url = _manifest(app).url('images/banner-hero.jpg')
+    css = _get(client, _manifest(app).url(CSS)).get_data(as_text=True)
+    assert image_url in css
+    assert "url('/static/images/banner-hero.jpg')" not in css
+
+    image = _get(client, image_url)
+    assert image.status_code == 200
+    assert image.cache_control.immutable
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'gzip, deflate, br', 'deflate, gzip;q=0.5'])
+def test_gzip_served_when_accepted(app, client, encoding):
+    plain = _get(client, f'/static/{CSS}', encoding='identity')
+    response = _get(client, _manifest(app).url(CSS), encoding=encoding)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers['ETag'] != plain.headers['ETag']
+
+
+@pytest.mark.parametrize('encoding', [None, 'identity', 'deflate', 'gzip;q=0'])
+def test_gzip_not_served_unless_accepted(app, client, encoding):
+    response = _get(client, _manifest(app).url(CSS), encoding=encoding)
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.data[:2] != b'\x1f\x8b'
+
+
+def test_binary_and_small_files_are_not_compressed(app, client, tmp_path):
+    response = _get(client, _manifest(app).url('images/banner-hero.jpg'), encoding='gzip')
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' not in response.vary
+
+    (tmp_path / 'small.js').write_text('console.log(1)')
+    (tmp_path / 'large.js').write_text('x' * MIN_COMPRESS_SIZE)
+    with app.test_request_context():
+        assets = AssetManifest(str(tmp_path)).assets()
+    assert assets['small.js'].encodings == {}
+    assert 'gzip' in assets['large.js'].encodings
+
+
+def test_conditional_request_returns_304_per_encoding(app, client):
+    url = _manifest(app).url(CSS)
+    plain = _get(client, url, encoding='identity')
+    compressed = _get(client, url, encoding='gzip')
+
+    assert _get(client, url, encoding='identity', etag=plain.headers['ETag']).status_code == 304
+    assert _get(client, url, encoding='gzip', etag=compressed.headers['ETag']).status_code == 304
+    # 未压缩版本的 ETag 不能用于 gzip 版本
+    assert _get(client, url, encoding='gzip', etag=plain.headers['ETag']).status_code == 200
+
+
+def test_manifest_reloads_changed_files_when_auto_reload(app, tmp_path):
+    (tmp_path / 'app.js').write_text('var a = 1;')
+    manifest = AssetManifest(str(tmp_path))
+    with app.test_request_context():
+        old_url = manifest.url('app.js')
+        (tmp_path / 'app.js').write_text('var a = 2;')
+        # 未开启自动重新加载时沿用首次生成的资源表
+        assert manifest.url('app.js') == old_url
+
+        app.config['TEMPLATES_AUTO_RELOAD'] = True
+        assert manifest.url('app.js') != old_url
+
+
+def _list_accounts(client, encoding=None):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    return client.get('/api/accounts/', query_string={'per_page': 100}, headers=headers)
+
+
+def test_gzip_json_skips_small_bodies(app, client):
+    response = _list_accounts(client, 'gzip')
+
+    assert len(response.data) < app.config['GZIP_MIN_SIZE']
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_json()['accounts'] == []
+
+
+def test_gzip_json_compresses_large_bodies_when_accepted(app, client):
+    user = create_user('seller')
+    for i in range(30):
+        create_account(user, f'ACC{i}', remarks='满级全英雄稀有刀皮' * 5)
+
+    plain = _list_accounts(client)
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.vary
+    assert len(plain.data) >= app.config['GZIP_MIN_SIZE']
+    assert _list_accounts(client, 'gzip;q=0').data == plain.data
+
+    compressed = _list_accounts(client, 'gzip, deflate')
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+
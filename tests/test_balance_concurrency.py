@@ -0,0 +1,97 @@
+"""
+余额并发测试
+
+多个线程对同一用户并发充值、提现并支付订单。余额的检查和扣减在同一条
+条件 UPDATE 中完成，不会丢失更新，也不会透支：系统中的资金总额始终等于
+初始余额加上成功的充值减去成功的提现，资金流水与余额一致。
+"""
+import random
+import threading
+from sqlalchemy import func
+from backend.models import db, User
+from backend.models.commission import pending_commission_total
+from backend.models.ledger import reconcile_ledger
+from backend.utils.money import to_cents
+from tests.conftest import create_user, create_account, login, run_threads
+
+WORKERS = 8
+OPERATIONS = 40
+INITIAL_BALANCE = 50_000
+
+
+def _total_money():
+    """全部用户余额加上未结算的平台抽成（分）"""
+    return db.session.query(func.sum(User.balance)).scalar() + pending_commission_total()
+
+
+def test_concurrent_recharge_and_withdraw_conserve_money(app):
+    user = create_user('user', balance=INITIAL_BALANCE)
+    db.session.remove()
+
+    credits, debits, rejected = [], [], []
+    lock = threading.Lock()
+
+    def hammer(index):
+        client = app.test_client()
+        login(client, user)
+        rng = random.Random(index)
+        for _ in range(OPERATIONS):
+            amount = round(rng.uniform(0.01, 300), 2)
+            action = 'recharge' if rng.random() < 0.4 else 'withdraw'
+            response = client.post(f'/api/users/{action}', json={'amount': amount})
+            assert response.status_code in (200, 400), response.get_json()
+            with lock:
+                if response.status_code == 400:
+                    rejected.append(amount)
+                elif action == 'recharge':
+                    credits.append(to_cents(amount))
+                else:
+                    debits.append(to_cents(amount))
+            # 余额任何时候都不能为负
+            assert response.get_json().get('balance', 0) >= 0
+
+    run_threads(app, WORKERS, hammer)
+
+    balance = db.session.get(User, user).balance
+    assert balance == INITIAL_BALANCE + sum(credits) - sum(debits)
+    assert balance >= 0
+    assert rejected, '提现应当有因余额不足被拒绝的情况'
+    assert reconcile_ledger()['problems'] == []
+
+
+def test_concurrent_payments_and_withdrawals_conserve_money(app):
+    owner = create_user('owner')
+    renter = create_user('renter', balance=INITIAL_BALANCE)
+    account_ids = [create_account(owner, f'ACC{i}', price=5000, deposit=1500) for i in range(20)]
+
+    client = app.test_client()
+    login(client, renter)
+    order_ids = [client.post('/api/orders/', json={'account_id': account_id}).get_json()['order']['id']
+                 for account_id in account_ids]
+    initial_total = _total_money()
+    db.session.remove()
+
+    withdrawn = []
+    lock = threading.Lock()
+
+    def work(index):
+        client = app.test_client()
+        login(client, renter)
+        if index % 2 == 0:
+            # 支付线程：每个线程尝试支付全部订单，重复支付被拒绝
+            for order_id in order_ids:
+                response = client.post(f'/api/orders/{order_id}/pay')
+                assert response.status_code in (200, 400), response.get_json()
+        else:
+            for _ in range(OPERATIONS):
+                response = client.post('/api/users/withdraw', json={'amount': 25})
+                assert response.status_code in (200, 400), response.get_json()
+                if response.status_code == 200:
+                    with lock:
+                        withdrawn.append(2500)
+
+    run_threads(app, WORKERS, work)
+
+    assert db.session.get(User, renter).balance >= 0
+    assert _total_money() == initial_total - sum(withdrawn)
+    assert reconcile_ledger()['problems'] == []
@@ -0,0 +1,30 @@
+"""
+充值、提现金额上限测试
+
+超过 MAX_TRANSACTION_AMOUNT 的金额在写入前以400拒绝，不会溢出 INTEGER 列后返回500。
+"""
+import pytest
+from backend.models import db, User
+from tests.conftest import create_user, login
+
+
+@pytest.mark.parametrize('action', ['recharge', 'withdraw'])
+@pytest.mark.parametrize('amount', [1000000.01, 10 ** 17, '99999999999999'])
+def test_amount_above_limit_is_rejected(app, client, action, amount):
+    user = create_user('user', balance=100)
+    login(client, user)
+
+    response = client.post(f'/api/users/{action}', json={'amount': amount})
+
+    assert response.status_code == 400
+    assert '不能超过' in response.get_json()['message']
+    db.session.expire_all()
+    assert db.session.get(User, user).balance == 100
+
+
+def test_amount_at_limit_is_accepted(app, client):
+    user = create_user('user')
+    login(client, user)
+
+    assert client.post('/api/users/recharge', json={'amount': 1000000}).status_code == 200
+    assert client.post('/api/users/withdraw', json={'amount': 1000000}).status_code == 200
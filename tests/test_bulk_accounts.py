@@ -0,0 +1,95 @@
+"""
+批量发布测试
+
+不合法的条目（字段类型错误、负资产等）在校验时按下标报告，不会写入数据库。
+"""
+from backend.models import db, Account
+from tests.conftest import create_user, create_account, login
+
+
+def _listing(**fields):
+    values = dict(
+        pure_coin_assets=100, total_assets=1000, safe_box_slots=4, price=10,
+        server_region='QQ', level=30, remarks='备注'
+    )
+    values.update(fields)
+    return values
+
+
+MALFORMED = [
+    (_listing(remarks={'text': '备注'}), 'remarks 必须是字符串'),
+    (_listing(rank=['王者']), 'rank 必须是字符串'),
+    (_listing(level='abc'), 'level 必须是整数'),
+    (_listing(stamina_level=True), 'stamina_level 必须是整数'),
+    (_listing(aw_bullets=1.5), 'aw_bullets 必须是整数'),
+    (_listing(level=2 ** 63), 'level 必须是整数'),
+    (_listing(pure_coin_assets=-100), '资产不能为负数'),
+]
+
+
+def test_partial_inserts_valid_rows_and_reports_malformed(app, client):
+    user = create_user('seller')
+    login(client, user)
+    items = [_listing(level=10)]
+    for item, _ in MALFORMED:
+        items.extend([item, _listing(level=len(items) + 10)])
+
+    response = client.post('/api/accounts/bulk', json={'accounts': items, 'partial': True})
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+
+    assert [error['index'] for error in body['errors']] == list(range(1, len(items), 2))
+    assert [error['message'] for error in body['errors']] == [message for _, message in MALFORMED]
+    assert [created['index'] for created in body['created']] == list(range(0, len(items), 2))
+    assert Account.query.count() == len(MALFORMED) + 1
+
+    # 整数列中只有整数，按等级从高到低排序正常
+    response = client.get('/api/accounts/?sort=level&cursor=')
+    levels = [account['level'] for account in response.get_json()['accounts']]
+    assert levels == sorted(levels, reverse=True)
+
+
+def test_malformed_row_rejects_whole_batch_without_partial(app, client):
+    user = create_user('seller')
+    login(client, user)
+
+    response = client.post('/api/accounts/bulk', json={'accounts': [_listing(), _listing(level='abc')]})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'index': 1, 'message': 'level 必须是整数'}]
+    assert Account.query.count() == 0
+
+
+def test_create_and_update_check_field_types(app, client):
+    user = create_user('seller')
+    login(client, user)
+
+    response = client.post('/api/accounts/', json=_listing(login_method={'a': 1}))
+    assert response.status_code == 400
+    assert Account.query.count() == 0
+
+    account = create_account(user, 'ACC1')
+    response = client.put(f'/api/accounts/{account}', json={'level': '30'})
+    assert response.status_code == 400
+    response = client.put(f'/api/accounts/{account}', json={'total_assets': -1})
+    assert response.status_code == 400
+    response = client.put(f'/api/accounts/{account}', json={'level': 40, 'remarks': '新备注'})
+    assert response.status_code == 200
+    assert response.get_json()['account']['level'] == 40
+
+
+def test_null_knife_skins_are_treated_as_empty(app, client):
+    user = create_user('seller')
+    login(client, user)
+
+    response = client.post('/api/accounts/', json=_listing(knife_skins=None))
+    assert response.status_code == 201
+    assert response.get_json()['account']['knife_skins'] == []
+
+    account = create_account(user, 'ACC1', knife_skins=['黑海'])
+    response = client.put(f'/api/accounts/{account}', json={'knife_skins': None})
+    assert response.status_code == 200
+    assert response.get_json()['account']['knife_skins'] == []
+    assert db.session.get(Account, account).knife_skin_mask == 0
+
+    response = client.put(f'/api/accounts/{account}', json={'knife_skins': '黑海'})
+    assert response.status_code == 400
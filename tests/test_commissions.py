@@ -0,0 +1,94 @@
+"""
+平台抽成结算测试
+
+每条未结算的抽成恰好计入平台账户一次，并发结算和调度器的定期结算都不会重复入账。
+"""
+import threading
+from backend.models import db, User
+from backend.models.commission import PlatformCommission, pending_commission_total, settle_commissions
+from backend.models.ledger import reconcile_ledger
+from backend.scheduler import OrderExpiryScheduler
+from backend.utils.money import apply_ratio
+from tests.conftest import create_user, create_account, login, run_threads
+
+DEPOSIT = 3001  # 奇数分，抽成按分四舍五入
+
+
+def _pay_orders(client, owner, count, start=0):
+    for i in range(start, start + count):
+        account_id = create_account(owner, f'ACC{i}', deposit=DEPOSIT)
+        order = client.post('/api/orders/', json={'account_id': account_id}).get_json()['order']
+        assert client.post(f'/api/orders/{order["id"]}/pay').status_code == 200
+
+
+def _platform_balance(admin):
+    db.session.expire_all()
+    return db.session.get(User, admin).balance
+
+
+def test_settle_moves_every_pending_commission_once(app, client):
+    admin = create_user('admin', is_admin=True)
+    owner = create_user('owner')
+    renter = create_user('renter', balance=10_000_000)
+    login(client, renter)
+    _pay_orders(client, owner, 5)
+    commission = apply_ratio(DEPOSIT, 50, 100)
+    assert pending_commission_total() == 5 * commission
+
+    assert settle_commissions() == 5 * commission
+    assert _platform_balance(admin) == 5 * commission
+    assert pending_commission_total() == 0
+    assert PlatformCommission.query.filter(PlatformCommission.settled_at.is_(None)).count() == 0
+
+    # 没有新的抽成时不再入账，新的抽成下次结算
+    assert settle_commissions() == 0
+    _pay_orders(client, owner, 2, start=5)
+    assert settle_commissions() == 2 * commission
+    assert _platform_balance(admin) == 7 * commission
+    assert reconcile_ledger()['problems'] == []
+
+
+def test_concurrent_settlements_do_not_double_credit(app, client):
+    admin = create_user('admin', is_admin=True)
+    owner = create_user('owner')
+    renter = create_user('renter', balance=10_000_000)
+    login(client, renter)
+    _pay_orders(client, owner, 10)
+    pending = pending_commission_total()
+    db.session.remove()
+
+    settled = []
+    lock = threading.Lock()
+
+    def settle(index):
+        total = settle_commissions()
+        with lock:
+            settled.append(total)
+
+    run_threads(app, 6, settle)
+
+    assert sum(settled) == pending
+    assert _platform_balance(admin) == pending
+    assert reconcile_ledger()['problems'] == []
+
+
+def test_scheduler_settles_periodically(app, client):
+    admin = create_user('admin', is_admin=True)
+    owner = create_user('owner')
+    renter = create_user('renter', balance=10_000_000)
+    login(client, renter)
+    _pay_orders(client, owner, 3)
+    pending = pending_commission_total()
+
+    # 与后台线程一样在独立的应用上下文中运行
+    scheduler = OrderExpiryScheduler(900, 500, settle_interval=3600)
+    with app.app_context():
+        scheduler.run_once()
+    assert _platform_balance(admin) == pending
+
+    # 间隔未到时不结算
+    _pay_orders(client, owner, 1, start=3)
+    with app.app_context():
+        scheduler.run_once()
+    assert pending_commission_total() > 0
+    assert _platform_balance(admin) == pending
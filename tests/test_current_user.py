@@ -0,0 +1,47 @@
+"""
+当前用户接口的 ETag 测试
+
+If-None-Match 与当前版本相同时返回 304；余额变化后 ETag 随之变化，旧的 ETag
+重新验证时返回包含新余额的完整响应，不会复用缓存中过期的序列化结果。
+"""
+from tests.conftest import create_user, login
+
+
+def _current(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/api/auth/current', headers=headers)
+
+
+def test_if_none_match_returns_304(app, client):
+    login(client, create_user('user', balance=1000))
+
+    first = _current(client)
+    assert first.status_code == 200
+    assert first.get_json()['user']['balance'] == 10.0
+    etag = first.headers['ETag']
+    assert first.cache_control.private and first.cache_control.no_cache
+
+    revalidated = _current(client, etag)
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+    # 其他版本的 ETag 不匹配
+    assert _current(client, '"u0-stale"').status_code == 200
+
+
+def test_balance_change_invalidates_etag(app, client):
+    login(client, create_user('user', balance=1000))
+    etag = _current(client).headers['ETag']
+
+    assert client.post('/api/users/recharge', json={'amount': 5}).status_code == 200
+
+    response = _current(client, etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['user']['balance'] == 15.0
+    assert _current(client, response.headers['ETag']).status_code == 304
+
+
+def test_not_logged_in(app, client):
+    assert _current(client).status_code == 401
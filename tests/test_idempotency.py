@@ -0,0 +1,104 @@
+"""
+幂等键测试
+
+相同的 Idempotency-Key 只执行一次；视图没有提交时幂等键保持可用；
+视图提交与保存响应在同一个事务中，并发的相同请求只有一个生效。
+"""
+import threading
+from backend.idempotency import idempotent
+from backend.models import db, User, IdempotencyKey, credit_balance
+from backend.utils.auth import login_required, current_user_id
+from tests.conftest import create_user, login, run_threads
+
+
+def _post(client, path, key, **body):
+    return client.post(path, json=body, headers={'Idempotency-Key': key})
+
+
+def _balance(user_id):
+    db.session.expire_all()
+    return db.session.get(User, user_id).balance
+
+
+def test_replay_returns_saved_response(app, client):
+    user = create_user('user')
+    login(client, user)
+
+    first = _post(client, '/api/users/recharge', 'k1', amount=10)
+    second = _post(client, '/api/users/recharge', 'k1', amount=10)
+
+    assert first.status_code == second.status_code == 200
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.get_json() == first.get_json()
+    assert _balance(user) == 1000
+
+
+def test_same_key_with_different_body_is_rejected(app, client):
+    user = create_user('user')
+    login(client, user)
+
+    assert _post(client, '/api/users/recharge', 'k1', amount=10).status_code == 200
+    response = _post(client, '/api/users/recharge', 'k1', amount=20)
+
+    assert response.status_code == 422
+    assert _balance(user) == 1000
+
+
+def test_early_rejection_frees_the_key(app, client):
+    user = create_user('user')
+    login(client, user)
+
+    # 余额不足，视图回滚后返回400，不保存响应
+    assert _post(client, '/api/users/withdraw', 'w1', amount=5).status_code == 400
+    assert IdempotencyKey.query.count() == 0
+
+    assert client.post('/api/users/recharge', json={'amount': 10}).status_code == 200
+    response = _post(client, '/api/users/withdraw', 'w1', amount=5)
+    assert response.status_code == 200
+    assert 'Idempotent-Replayed' not in response.headers
+    assert _balance(user) == 500
+
+
+def test_failure_after_view_commit_saves_nothing(app, client):
+    @app.route('/test/commit-then-fail', methods=['POST'])
+    @login_required
+    @idempotent
+    def commit_then_fail():
+        credit_balance(current_user_id(), 100, 'recharge')
+        db.session.commit()
+        raise RuntimeError('进程在保存响应前退出')
+
+    user = create_user('user')
+    login(client, user)
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+
+    assert _post(client, '/test/commit-then-fail', 'k1').status_code == 500
+    db.session.rollback()
+
+    # 视图的修改没有单独提交，幂等键没有被占用，重试不会得到409
+    assert _balance(user) == 0
+    assert IdempotencyKey.query.count() == 0
+    assert _post(client, '/api/users/recharge', 'k1', amount=1).status_code == 200
+
+
+def test_concurrent_requests_with_same_key_execute_once(app):
+    user = create_user('user')
+    db.session.remove()
+
+    responses = []
+    lock = threading.Lock()
+
+    def recharge(index):
+        client = app.test_client()
+        login(client, user)
+        response = _post(client, '/api/users/recharge', 'same-key', amount=10)
+        with lock:
+            responses.append((response.status_code, response.get_json()))
+
+    run_threads(app, 8, recharge)
+
+    assert {status for status, _ in responses} == {200}
+    assert len({body['balance'] for _, body in responses}) == 1
+    assert _balance(user) == 1000
+    assert IdempotencyKey.query.count() == 1
@@ -0,0 +1,66 @@
+"""
+库存导入测试
+
+不合法的行和写入失败的批次按行号报告，不影响文件中其他行的导入。
+"""
+import io
+import json
+from sqlalchemy import text
+from backend.importer import import_accounts
+from backend.models import db, Account
+from tests.conftest import create_user
+
+
+def _ndjson(rows):
+    return io.BytesIO('\n'.join(json.dumps(row, ensure_ascii=False) for row in rows).encode())
+
+
+def _row(key, **fields):
+    values = dict(
+        external_key=key, pure_coin_assets=100, total_assets=1000, safe_box_slots=4,
+        price=10, server_region='QQ', level=30
+    )
+    values.update(fields)
+    return values
+
+
+def test_malformed_fields_are_rejected_per_line(app):
+    user = create_user('seller')
+    rows = [
+        _row('A1'),
+        _row('A2', remarks={'text': '备注'}),
+        _row('A3', level=[30]),
+        _row('A4', pure_coin_assets=-1),
+        _row('A5', login_method='QQ'),
+    ]
+
+    report = import_accounts(user, _ndjson(rows), 'ndjson', chunk_size=2)
+
+    assert report.aborted is None
+    assert (report.inserted, report.rejected) == (2, 3)
+    assert report.errors == [
+        {'line': 2, 'message': 'remarks 必须是字符串'},
+        {'line': 3, 'message': 'level 必须是整数'},
+        {'line': 4, 'message': '资产不能为负数'},
+    ]
+    assert sorted(a.external_key for a in Account.query) == ['A1', 'A5']
+
+
+def test_failed_chunk_is_reported_and_import_continues(app):
+    user = create_user('seller')
+    # 数据库拒绝 external_key 为 BAD 的账号，模拟写入时的数据库错误
+    db.session.execute(text(
+        "CREATE TRIGGER reject_bad BEFORE INSERT ON accounts WHEN NEW.external_key = 'BAD' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected by trigger'); END"
+    ))
+    db.session.commit()
+    rows = [_row('A1'), _row('A2'), _row('A3'), _row('BAD'), _row('A5'), _row('A6')]
+
+    report = import_accounts(user, _ndjson(rows), 'ndjson', chunk_size=2)
+
+    assert report.aborted is None
+    assert (report.rows, report.inserted, report.rejected) == (6, 4, 2)
+    assert [error['line'] for error in report.errors] == [3, 4]
+    assert all('写入失败' in error['message'] for error in report.errors)
+    # 失败的批次整批回滚，前后的批次照常写入
+    assert sorted(a.external_key for a in Account.query) == ['A1', 'A2', 'A5', 'A6']
@@ -0,0 +1,112 @@
+"""
+资金流水测试
+
+明细每一行的余额由服务端按快照和分录计算，与游标内容无关；快照之前和之后翻页的结果一致；
+对账在账目一致时没有问题，快照或余额被改动时能发现。
+"""
+from sqlalchemy import func, select
+from backend.models import db, User
+from backend.models.ledger import (
+    LedgerEntry, LedgerSnapshot, ledger_balance, reconcile_ledger, snapshot_balances, user_statement
+)
+from backend.utils.money import to_cents
+from backend.utils.pagination import encode_cursor
+from tests.conftest import create_user, login
+
+
+def _post_entries(client, amounts):
+    for amount in amounts:
+        action = 'recharge' if amount > 0 else 'withdraw'
+        assert client.post(f'/api/users/{action}', json={'amount': abs(amount)}).status_code == 200
+
+
+def _balances_after_each_entry(user_id):
+    """按分录顺序累加得到的每条分录之后的余额"""
+    balances, balance = {}, 0
+    for entry_id, amount in db.session.execute(
+        select(LedgerEntry.id, LedgerEntry.amount).where(LedgerEntry.user_id == user_id).order_by(LedgerEntry.id)
+    ):
+        balance += amount
+        balances[entry_id] = balance
+    return balances
+
+
+def _walk_statement(user_id, per_page):
+    items, cursor = [], ''
+    while cursor is not None:
+        page, cursor = user_statement(user_id, cursor, per_page)
+        items.extend(page)
+    return items
+
+
+def test_statement_balances_across_snapshot(app, client):
+    user = create_user('user', balance=500)
+    login(client, user)
+    _post_entries(client, [10, 20.5, -3, 7])
+    assert snapshot_balances() == 1
+    _post_entries(client, [-1.25, 30, -0.5])
+
+    expected = _balances_after_each_entry(user)
+    for per_page in (1, 2, 3, 100):
+        items = _walk_statement(user, per_page)
+        assert [item['id'] for item in items] == sorted(expected, reverse=True)
+        assert [to_cents(item['balance']) for item in items] == [expected[item['id']] for item in items]
+    assert to_cents(items[0]['balance']) == db.session.get(User, user).balance
+
+
+def test_ledger_balance_before_entry_uses_snapshot_either_side(app, client):
+    user = create_user('user')
+    login(client, user)
+    _post_entries(client, [1, 2, 3])
+    snapshot_balances()
+    _post_entries(client, [4, 5])
+
+    expected = _balances_after_each_entry(user)
+    ids = sorted(expected)
+    for index, entry_id in enumerate(ids):
+        before = expected[ids[index - 1]] if index else 0
+        assert ledger_balance(user, entry_id) == before
+    assert ledger_balance(user) == expected[ids[-1]] == db.session.get(User, user).balance
+
+
+def test_crafted_cursor_cannot_change_balance(app, client):
+    user = create_user('user')
+    login(client, user)
+    _post_entries(client, [10, 20, 30])
+
+    first_page, cursor = user_statement(user, '', 1)
+    honest, _ = user_statement(user, cursor, 2)
+    before_id = first_page[-1]['id']
+    crafted, _ = user_statement(user, encode_cursor(99_999_999, before_id), 2)
+
+    assert crafted == honest
+    assert [to_cents(item['balance']) for item in honest] == [3000, 1000]
+
+    response = client.get('/api/users/me/statement', query_string={'cursor': encode_cursor(99_999_999, before_id)})
+    assert [item['balance'] for item in response.get_json()['entries']] == [30.0, 10.0]
+
+
+def test_snapshot_and_reconcile(app, client):
+    users = [create_user(f'user{i}', balance=100 * i) for i in range(3)]
+    for user in users:
+        login(client, user)
+        _post_entries(client, [5, -1])
+    assert reconcile_ledger()['problems'] == []
+
+    assert snapshot_balances() == 3
+    assert snapshot_balances() == 0  # 没有新分录
+    for user in users:
+        assert ledger_balance(user) == db.session.get(User, user).balance
+    result = reconcile_ledger(chunk_size=2)
+    assert result['problems'] == []
+    assert result['entries'] == db.session.query(func.count(LedgerEntry.id)).scalar()
+    assert result['users'] == 3
+
+    # 改动快照或余额后对账能发现
+    db.session.execute(LedgerSnapshot.__table__.update().where(LedgerSnapshot.user_id == users[0]).values(balance=1))
+    db.session.execute(User.__table__.update().where(User.id == users[1]).values(balance=User.balance + 1))
+    db.session.commit()
+    problems = reconcile_ledger()['problems']
+    assert len(problems) == 2
+    assert f'用户 {users[0]} 的快照余额' in problems[0]
+    assert f'用户 {users[1]} 的余额' in problems[1]
@@ -0,0 +1,133 @@
+"""
+账号列表查询计划回归测试
+
+对 get_accounts 能产生的每种筛选和排序组合，记录实际执行的 SQL 并用
+EXPLAIN QUERY PLAN 检查：每条查询都必须通过索引定位 accounts，出现全表扫描
+（通常伴随临时 B 树排序）说明某个组合没有对应的索引。按范围条件走索引后
+再排序当前页是允许的。
+"""
+import itertools
+import pytest
+from sqlalchemy import event
+from backend.models import db
+from tests.conftest import create_user, create_account, login
+
+# 每种筛选条件的查询参数
+FILTERS = {
+    'slots': {'safe_box_slots': ['4', '6']},
+    'level': {'min_level': 10, 'max_level': 50},
+    'assets': {'min_assets': 10, 'max_assets': 500},
+    'price': {'min_price': 10, 'max_price': 500},
+    'region': {'server_region': 'QQ'},
+    'knife_skins': {'knife_skins': ['黑海']},
+}
+SORTS = ['newest', 'price', 'assets', 'level']
+STATUSES = ['available', 'rented']
+
+
+def _combinations():
+    for size in range(len(FILTERS) + 1):
+        for names in itertools.combinations(FILTERS, size):
+            yield names
+
+
+def _query_string(names, sort, status, cursor):
+    params = {'sort': sort, 'status': status, 'per_page': 5}
+    for name in names:
+        params.update(FILTERS[name])
+    if cursor is not None:
+        params['cursor'] = cursor
+    return params
+
+
+@pytest.fixture
+def listing_statements(app):
+    """记录请求期间执行的 accounts 查询"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM accounts' in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def _plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[3] for row in rows]
+
+
+def _full_scans(plan):
+    """查询计划中对 accounts 的全表扫描"""
+    return [detail for detail in plan if detail in ('SCAN accounts', 'SCAN TABLE accounts')]
+
+
+@pytest.fixture
+def seeded(app):
+    seller = create_user('seller')
+    for i in range(12):
+        create_account(seller, f'A{i}', safe_box_slots=(4, 6, 9)[i % 3], level=10 + i, knife_skins=['黑海'])
+
+
+@pytest.mark.parametrize('paging', ['page', 'cursor'])
+@pytest.mark.parametrize('sort', SORTS)
+def test_listing_queries_use_indexes(client, seeded, listing_statements, sort, paging):
+    failures = []
+    for status in STATUSES:
+        for names in _combinations():
+            del listing_statements[:]
+            cursor = '' if paging == 'cursor' else None
+            response = client.get('/api/accounts/', query_string=_query_string(names, sort, status, cursor))
+            assert response.status_code == 200
+            assert listing_statements
+            for statement, parameters in listing_statements:
+                plan = _plan(statement, parameters)
+                if _full_scans(plan):
+                    failures.append((status, names, plan, statement))
+    assert not failures, '\n'.join(str(failure) for failure in failures[:10])
+
+
+@pytest.mark.parametrize('sort', SORTS + ['relevance'])
+def test_keyword_search_queries_use_indexes(client, seeded, listing_statements, sort):
+    for names in _combinations():
+        del listing_statements[:]
+        params = _query_string(names, sort, 'available', None)
+        params['q'] = 'QQ'
+        response = client.get('/api/accounts/', query_string=params)
+        assert response.status_code == 200
+        for statement, parameters in listing_statements:
+            plan = _plan(statement, parameters)
+            assert not _full_scans(plan), (names, plan, statement)
+
+
+def test_full_scan_is_detected(app):
+    plan = _plan('SELECT id FROM accounts WHERE remarks = ? ORDER BY created_at', ('x',))
+    assert _full_scans(plan)
+
+
+@pytest.mark.parametrize('status', [None, 'available'])
+def test_owner_listing_pages_without_sorting(app, client, listing_statements, status):
+    seller = create_user('seller')
+    for i in range(12):
+        create_account(seller, f'A{i}', status=('available', 'rented')[i % 2])
+    login(client, seller)
+
+    cursor = ''
+    while cursor is not None:
+        del listing_statements[:]
+        params = {'per_page': 4, 'cursor': cursor}
+        if status:
+            params['status'] = status
+        response = client.get('/api/users/me/accounts', query_string=params)
+        assert response.status_code == 200
+        cursor = response.get_json()['next_cursor']
+
+        pages = [(statement, parameters) for statement, parameters in listing_statements if 'ORDER BY' in statement]
+        assert pages
+        for statement, parameters in pages:
+            plan = _plan(statement, parameters)
+            # 按卖家索引定位并按索引顺序读取，不对卖家的全部账号排序
+            assert not _full_scans(plan), plan
+            assert not [detail for detail in plan if 'TEMP B-TREE' in detail], plan
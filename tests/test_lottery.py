@@ -0,0 +1,103 @@
+"""
+抽奖测试
+
+别名表的抽取概率与配置的权重一致；并发抽奖不会把 lottery_chances 扣成负数，
+也不会在次数用完后继续发放奖金。
+"""
+import threading
+from collections import Counter
+import pytest
+from backend.config import Config
+from backend.models import db, User
+from backend.models.ledger import reconcile_ledger
+from backend.models.lottery import AliasTable
+from backend.utils.money import to_cents
+from tests.conftest import create_user, login, run_threads
+
+
+def _alias_probabilities(table):
+    """别名表中每个下标被抽中的精确概率"""
+    n = len(table.prob)
+    probabilities = [p / n for p in table.prob]
+    for i, alias in enumerate(table.alias):
+        probabilities[alias] += (1 - table.prob[i]) / n
+    return probabilities
+
+
+def test_alias_table_matches_weights():
+    for weights in ([weight for _, _, weight in Config.LOTTERY_PRIZES], [1], [1, 1], [1, 999], [3, 0, 7, 1, 1]):
+        total = sum(weights)
+        probabilities = _alias_probabilities(AliasTable(weights))
+        assert probabilities == [pytest.approx(weight / total, abs=1e-12) for weight in weights]
+
+
+def test_alias_table_sampling_distribution():
+    weights = [weight for _, _, weight in Config.LOTTERY_PRIZES]
+    total = sum(weights)
+    table = AliasTable(weights)
+    draws = 200_000
+    counts = Counter(table.sample() for _ in range(draws))
+    for i, weight in enumerate(weights):
+        expected = draws * weight / total
+        # 二项分布的5倍标准差
+        assert abs(counts[i] - expected) <= 5 * (expected * (1 - weight / total)) ** 0.5
+
+
+def test_concurrent_draws_never_overspend_chances(app):
+    chances = 29  # 加上每日免费机会共30次，每次请求抽2次正好用完
+    user = create_user('user')
+    db.session.get(User, user).lottery_chances = chances
+    db.session.commit()
+    db.session.remove()
+
+    won, drawn = [], []
+    codes = Counter()
+    lock = threading.Lock()
+
+    def draw(index):
+        client = app.test_client()
+        login(client, user)
+        for _ in range(10):
+            response = client.post('/api/users/lottery/draw', json={'count': 2})
+            body = response.get_json()
+            with lock:
+                codes[response.status_code] += 1
+                if response.status_code == 200:
+                    drawn.append(len(body['prizes']))
+                    won.extend(to_cents(prize['amount']) for prize in body['prizes'])
+                    assert body['lottery_chances'] >= 0
+
+    elapsed = run_threads(app, 8, draw)
+    print(f'\n{sum(codes.values())} 次抽奖请求，{len(drawn)} 次成功，{sum(codes.values()) / elapsed:.0f} 请求/秒')
+
+    assert set(codes) <= {200, 400}, codes
+    user_row = db.session.get(User, user)
+    assert sum(drawn) == chances + 1
+    assert user_row.lottery_chances == 0
+    assert user_row.balance == sum(won)
+    assert reconcile_ledger()['problems'] == []
+
+
+def test_draw_load_many_users(app):
+    users = [create_user(f'user{i}') for i in range(16)]
+    db.session.remove()
+
+    codes = Counter()
+    lock = threading.Lock()
+
+    def draw(index):
+        client = app.test_client()
+        login(client, users[index])
+        response = client.post('/api/users/lottery/draw', json={'count': 1})
+        with lock:
+            codes[response.status_code] += 1
+        # 今日免费机会已用完
+        response = client.post('/api/users/lottery/draw', json={'count': 1})
+        with lock:
+            codes[response.status_code] += 1
+
+    elapsed = run_threads(app, len(users), draw)
+    print(f'\n{len(users)} 个用户同时抽奖，{2 * len(users) / elapsed:.0f} 请求/秒')
+
+    assert codes == {200: len(users), 400: len(users)}
+    assert reconcile_ledger()['problems'] == []
@@ -0,0 +1,83 @@
+"""
+订单金额重算测试
+
+批量重算与保存账号时的计算必须逐分一致，并且只改动金额有变化的账号。
+"""
+from decimal import Decimal
+from backend.models import db, Account
+from backend.models.account import order_amount_for, deposit_for, recompute_order_amounts
+from tests.conftest import create_user
+
+
+def _insert_accounts(user_id, values):
+    table = Account.__table__
+    db.session.execute(table.insert(), [
+        {
+            'user_id': user_id, 'account_number': f'ACC{i}', 'pure_coin_assets': assets,
+            'safe_box_slots': slots, 'price': 0, 'deposit': 0, 'order_amount': 0,
+            'status': 'available', 'knife_skin_mask': 0,
+        }
+        for i, (assets, slots) in enumerate(values)
+    ])
+    db.session.commit()
+
+
+def test_recompute_matches_save_path_to_the_cent(app):
+    user = create_user('seller')
+    values = [(float(Decimal(cents) / 100), slots) for cents in range(1, 2001) for slots in (4, 6, 9)]
+    _insert_accounts(user, values)
+
+    assert recompute_order_amounts(batch_size=500, with_deposit=True) == len(values)
+
+    db.session.expire_all()
+    for account in Account.query.order_by(Account.id):
+        expected = order_amount_for(account.pure_coin_assets, account.safe_box_slots)
+        assert (account.order_amount, account.deposit) == (expected, deposit_for(expected))
+        # 保存时计算的结果与批量重算一致
+        assert account.calculate_order_amount() == account.order_amount
+
+
+def test_half_cent_rounds_up(app):
+    user = create_user('seller')
+    _insert_accounts(user, [(0.57, 6)])
+    recompute_order_amounts()
+    # 0.57 × 100 ÷ 40 = 1.425 元，四舍五入为 143 分
+    assert Account.query.one().order_amount == 143
+
+
+def test_unchanged_accounts_are_not_touched(app):
+    user = create_user('seller')
+    _insert_accounts(user, [(100, 4), (200, 6)])
+    recompute_order_amounts(with_deposit=True)
+    before = [(a.id, a.updated_at) for a in Account.query.order_by(Account.id)]
+
+    assert recompute_order_amounts(with_deposit=True) == 0
+    db.session.expire_all()
+    assert [(a.id, a.updated_at) for a in Account.query.order_by(Account.id)] == before
+
+
+def test_recompute_keeps_deposit_by_default(app):
+    user = create_user('seller')
+    _insert_accounts(user, [(100, 4)])
+    assert recompute_order_amounts() == 1
+    account = Account.query.one()
+    assert account.deposit == 0
+    assert account.order_amount == order_amount_for(100, 4)
+
+
+def test_recompute_command_keeps_seller_deposit(app):
+    user = create_user('seller')
+    _insert_accounts(user, [(100, 4)])
+    db.session.execute(Account.__table__.update().values(deposit=777))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['recompute-prices'])
+    assert result.exit_code == 0, result.output
+    db.session.expire_all()
+    account = Account.query.one()
+    assert (account.order_amount, account.deposit) == (order_amount_for(100, 4), 777)
+
+    result = app.test_cli_runner().invoke(args=['recompute-prices', '--with-deposit'])
+    assert result.exit_code == 0, result.output
+    db.session.expire_all()
+    assert Account.query.one().deposit == deposit_for(order_amount_for(100, 4))
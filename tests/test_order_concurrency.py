@@ -0,0 +1,91 @@
+"""
+并发下单压力测试
+
+多个租客线程同时抢租同一批账号（文件数据库，每个线程独立的连接），
+账号状态用条件 UPDATE 占用，任何账号都不能被重复租出；
+同一订单上并发的支付和取消只能有一个成功。
+"""
+import random
+import threading
+from collections import Counter
+from backend.models import db, Account, Order, User
+from backend.models.ledger import reconcile_ledger
+from backend.utils.money import apply_ratio
+from tests.conftest import create_user, create_account, login, run_threads
+
+RENTERS = 8
+ACCOUNTS = 40
+
+
+def test_concurrent_renters_never_double_book(app):
+    owner = create_user('owner')
+    renters = [create_user(f'renter{i}', balance=10_000_000) for i in range(RENTERS)]
+    account_ids = [create_account(owner, f'ACC{i}') for i in range(ACCOUNTS)]
+    db.session.remove()
+
+    codes = Counter()
+    created = []
+    lock = threading.Lock()
+
+    def rent(index):
+        client = app.test_client()
+        login(client, renters[index])
+        for account_id in random.sample(account_ids, len(account_ids)):
+            response = client.post('/api/orders/', json={'account_id': account_id})
+            with lock:
+                codes[response.status_code] += 1
+                if response.status_code == 201:
+                    created.append(account_id)
+
+    elapsed = run_threads(app, RENTERS, rent)
+    print(f'\n{RENTERS * ACCOUNTS} 次下单请求，{len(created)} 单成功，'
+          f'{RENTERS * ACCOUNTS / elapsed:.0f} 请求/秒')
+
+    assert set(codes) <= {201, 400}, codes
+    # 每个账号恰好被租出一次
+    assert sorted(created) == sorted(account_ids)
+    orders_per_account = Counter(account_id for (account_id,) in db.session.query(Order.account_id))
+    assert orders_per_account == Counter(account_ids)
+    assert {status for (status,) in db.session.query(Account.status)} == {'rented'}
+
+
+def test_concurrent_pay_and_cancel_settle_each_order_once(app):
+    owner = create_user('owner')
+    renter = create_user('renter', balance=10_000_000)
+    account_ids = [create_account(owner, f'ACC{i}') for i in range(ACCOUNTS)]
+
+    client = app.test_client()
+    login(client, renter)
+    order_ids = [client.post('/api/orders/', json={'account_id': account_id}).get_json()['order']['id']
+                 for account_id in account_ids]
+    db.session.remove()
+
+    outcomes = {order_id: [] for order_id in order_ids}
+    lock = threading.Lock()
+
+    def act(index):
+        client = app.test_client()
+        login(client, renter)
+        action = 'pay' if index % 2 == 0 else 'cancel'
+        for order_id in order_ids:
+            response = client.post(f'/api/orders/{order_id}/{action}')
+            assert response.status_code in (200, 400), response.get_json()
+            if response.status_code == 200:
+                with lock:
+                    outcomes[order_id].append(action)
+
+    run_threads(app, 4, act)
+
+    for order_id, actions in outcomes.items():
+        assert len(actions) == 1, (order_id, actions)
+        order = db.session.get(Order, order_id)
+        expected = 'renting' if actions[0] == 'pay' else 'cancelled'
+        assert order.status == expected
+        assert order.account.status == ('rented' if expected == 'renting' else 'available')
+
+    # 每笔支付只扣款一次
+    paid = [db.session.get(Order, order_id) for order_id, actions in outcomes.items() if actions == ['pay']]
+    # 支付时扣除租金和押金，退回押金中平台抽成以外的部分
+    spent = sum(order.rental_amount + apply_ratio(order.deposit_amount, 50, 100) for order in paid)
+    assert db.session.get(User, renter).balance == 10_000_000 - spent
+    assert reconcile_ledger()['problems'] == []
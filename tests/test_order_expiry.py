@@ -0,0 +1,74 @@
+"""
+待支付订单超时测试
+
+超时未支付的订单取消并释放账号；已支付和未超时的订单不受影响。
+调度器随应用启动和停止。
+"""
+import time
+from datetime import datetime, timedelta
+from backend.app import start_order_expiry, stop_order_expiry
+from backend.models import db, Account, Order
+from backend.models.order import expire_pending_orders
+from tests.conftest import create_user, create_account, login
+
+
+def _create_orders(client, account_ids):
+    return [client.post('/api/orders/', json={'account_id': account_id}).get_json()['order']['id']
+            for account_id in account_ids]
+
+
+def _backdate(order_ids, seconds):
+    created_at = datetime.now() - timedelta(seconds=seconds)
+    db.session.execute(
+        Order.__table__.update().where(Order.id.in_(order_ids)).values(created_at=created_at)
+    )
+    db.session.commit()
+
+
+def _statuses(model, ids):
+    db.session.expire_all()
+    return [db.session.get(model, id_).status for id_ in ids]
+
+
+def test_expired_pending_orders_are_cancelled_and_accounts_released(app, client):
+    owner = create_user('owner')
+    renter = create_user('renter', balance=1_000_000)
+    account_ids = [create_account(owner, f'ACC{i}') for i in range(5)]
+    login(client, renter)
+    order_ids = _create_orders(client, account_ids)
+
+    # 第一笔已支付，前三笔超时，后两笔未超时
+    assert client.post(f'/api/orders/{order_ids[0]}/pay').status_code == 200
+    _backdate(order_ids[:3], 1000)
+
+    assert expire_pending_orders(ttl_seconds=900, batch_size=1) == 2
+
+    assert _statuses(Order, order_ids) == ['renting', 'cancelled', 'cancelled', 'pending', 'pending']
+    assert _statuses(Account, account_ids) == ['rented', 'available', 'available', 'rented', 'rented']
+    # 已取消的订单不能再支付
+    assert client.post(f'/api/orders/{order_ids[1]}/pay').status_code == 400
+    assert expire_pending_orders(ttl_seconds=900) == 0
+
+
+def test_scheduler_starts_and_stops_with_app(app, client):
+    owner = create_user('owner')
+    renter = create_user('renter', balance=1_000_000)
+    account_id = create_account(owner, 'ACC1')
+    login(client, renter)
+    [order_id] = _create_orders(client, [account_id])
+    _backdate([order_id], app.config['PENDING_ORDER_TTL'] + 60)
+    db.session.remove()
+
+    scheduler = start_order_expiry(app)
+    try:
+        assert start_order_expiry(app) is scheduler
+        deadline = time.monotonic() + 5
+        while _statuses(Order, [order_id]) != ['cancelled'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop_order_expiry(app)
+
+    assert _statuses(Order, [order_id]) == ['cancelled']
+    assert _statuses(Account, [account_id]) == ['available']
+    assert 'order_expiry' not in app.extensions
+    assert scheduler._thread is None
@@ -0,0 +1,83 @@
+"""
+订单列表查询次数测试
+
+账号和双方用户随订单一并加载，每页的查询次数与订单数量无关。
+"""
+import contextlib
+import pytest
+from sqlalchemy import event
+from backend.models import db, Order
+from tests.conftest import create_user, create_account, login
+
+
+@contextlib.contextmanager
+def count_queries():
+    """统计期间执行的 SQL 语句数"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'after_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', record)
+
+
+def _create_orders(renter_id, owner_id, count, offset=0):
+    for i in range(offset, offset + count):
+        account_id = create_account(owner_id, f'ACC{i}')
+        db.session.add(Order(
+            order_number=f'ORD{i}', renter_id=renter_id, owner_id=owner_id, account_id=account_id,
+            rental_amount=1000, deposit_amount=300, total_amount=1300
+        ))
+    db.session.commit()
+
+
+def _query_count(client, params):
+    db.session.remove()  # 不复用测试中已加载的对象
+    with count_queries() as statements:
+        response = client.get('/api/orders/', query_string=params)
+    assert response.status_code == 200
+    return len(statements), len(response.get_json()['orders'])
+
+
+@pytest.mark.parametrize('params', [
+    {'type': 'all'},
+    {'type': 'rented'},
+    {'type': 'owned'},
+    {'type': 'all', 'cursor': ''},
+    {'type': 'rented', 'cursor': ''},
+])
+def test_order_listing_query_count_is_constant(app, client, params):
+    renter = create_user('renter')
+    owner = create_user('owner')
+    viewer = owner if params['type'] == 'owned' else renter
+    login(client, viewer)
+    params = dict(params, per_page=50)
+
+    _create_orders(renter, owner, 1)
+    single, rows = _query_count(client, params)
+    assert rows == 1
+
+    _create_orders(renter, owner, 29, offset=1)
+    many, rows = _query_count(client, params)
+    assert rows == 30
+
+    assert many == single
+
+
+def test_order_detail_query_count(app, client):
+    renter = create_user('renter')
+    owner = create_user('owner')
+    _create_orders(renter, owner, 1)
+    order_id = Order.query.first().id
+    login(client, renter)
+
+    db.session.remove()
+    with count_queries() as statements:
+        response = client.get(f'/api/orders/{order_id}')
+    assert response.status_code == 200
+    assert response.get_json()['order']['account'] is not None
+    assert len(statements) <= 2
@@ -0,0 +1,89 @@
+"""
+页面外壳测试
+
+页面只在首次访问时渲染，之后返回缓存的内容；内容未变化时按 ETag 返回 304，
+客户端接受 gzip 时返回预压缩的版本；页面请求不读取会话存储，也不设置 Cookie。
+"""
+import gzip
+import pytest
+import backend.pages
+from tests.conftest import create_user
+
+# /admin 对应的模板不在仓库中，不在此测试
+PAGES = ['/', '/login', '/register', '/rental', '/publish', '/profile', '/activity']
+
+
+@pytest.fixture
+def render_calls(monkeypatch):
+    """记录 render_template 的调用"""
+    calls = []
+    render_template = backend.pages.render_template
+
+    def counting(template_name, **context):
+        calls.append(template_name)
+        return render_template(template_name, **context)
+
+    monkeypatch.setattr(backend.pages, 'render_template', counting)
+    return calls
+
+
+@pytest.mark.parametrize('path', PAGES)
+def test_page_revalidates_with_etag(app, client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/html'
+    assert response.cache_control.no_cache
+    etag = response.headers['ETag']
+
+    revalidated = client.get(path, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+
+def test_page_rendered_once(app, client, render_calls):
+    first = client.get('/rental')
+    for _ in range(3):
+        assert client.get('/rental').data == first.data
+    client.get('/login')
+    assert render_calls == ['rental.html', 'login.html']
+
+
+def test_page_rerendered_when_auto_reload(app, client, render_calls):
+    app.config['TEMPLATES_AUTO_RELOAD'] = True
+    client.get('/rental')
+    client.get('/rental')
+    assert render_calls == ['rental.html', 'rental.html']
+
+
+def test_page_gzip_only_when_accepted(app, client):
+    plain = client.get('/')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.vary
+
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers['ETag'] != plain.headers['ETag']
+    assert client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('session_type', ['memory', 'sqlalchemy'])
+def test_pages_skip_session_store(app, client, monkeypatch, session_type):
+    create_user('user', password='secret')
+    assert client.post('/api/auth/login', json={'username': 'user', 'password': 'secret'}).status_code == 200
+
+    store = app.session_interface.store
+    loads = []
+    load = store.load
+    monkeypatch.setattr(store, 'load', lambda sid: loads.append(sid) or load(sid))
+
+    for path in PAGES:
+        response = client.get(path)
+        assert response.status_code == 200
+        assert 'Set-Cookie' not in response.headers
+        assert 'Cookie' not in response.vary
+    assert loads == []
+
+    # 接口请求仍然读取会话
+    assert client.get('/api/auth/current').get_json()['user']['username'] == 'user'
+    assert len(loads) == 1
@@ -0,0 +1,104 @@
+"""
+游标分页测试
+
+逐页翻完整个列表时，每一行恰好出现一次，顺序与不分页的排序一致；
+排序列有大量重复值和 NULL 时也是如此。深翻页的结果与 OFFSET 分页一致，并输出两者的耗时。
+"""
+import random
+import time
+from datetime import datetime, timedelta
+import pytest
+from backend.models import db, Account
+from backend.routes.account import ACCOUNT_SORTS
+from backend.utils.pagination import encode_cursor, keyset_paginate
+from tests.conftest import create_user
+
+ROWS = 57
+
+
+def _insert_accounts(user_id, count, rng):
+    """插入排序列大量重复（含 NULL 等级）的账号"""
+    base = datetime(2024, 1, 1)
+    db.session.execute(Account.__table__.insert(), [{
+        'user_id': user_id, 'account_number': f'ACC{i}', 'server_region': 'QQ',
+        'pure_coin_assets': rng.choice([100, 250.5, 999]), 'total_assets': 5000, 'safe_box_slots': 4,
+        'price': 0, 'deposit': 0, 'order_amount': rng.choice([0, 1250, 1250, 9999]),
+        'level': rng.choice([None, None, 10, 30, 30]), 'knife_skin_mask': 0, 'status': 'available',
+        'created_at': base + timedelta(minutes=rng.randrange(5)), 'updated_at': base,
+    } for i in range(count)])
+    db.session.commit()
+
+
+def _expected_ids(sort_column, descending):
+    ordering = (sort_column.desc(), Account.id.desc()) if descending else (sort_column.asc(), Account.id.asc())
+    return [id_ for (id_,) in db.session.query(Account.id).order_by(*ordering)]
+
+
+def _walk(client, sort, per_page):
+    ids, cursor, pages = [], '', 0
+    while cursor is not None:
+        response = client.get('/api/accounts/', query_string={'sort': sort, 'per_page': per_page, 'cursor': cursor})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert len(body['accounts']) <= per_page
+        ids.extend(account['id'] for account in body['accounts'])
+        cursor = body['next_cursor']
+        pages += 1
+        assert pages <= ROWS + 1, '游标没有前进'
+    return ids
+
+
+@pytest.mark.parametrize('sort', sorted(ACCOUNT_SORTS))
+@pytest.mark.parametrize('per_page', [1, 7, 100])
+def test_cursor_walks_every_row_once(app, client, sort, per_page):
+    _insert_accounts(create_user('seller'), ROWS, random.Random(1))
+
+    ids = _walk(client, sort, per_page)
+
+    assert len(ids) == len(set(ids)) == ROWS
+    assert ids == _expected_ids(*ACCOUNT_SORTS[sort])
+
+
+@pytest.mark.parametrize('descending', [True, False])
+def test_keyset_paginate_nullable_column_both_directions(app, descending):
+    _insert_accounts(create_user('seller'), ROWS, random.Random(2))
+
+    ids, cursor = [], ''
+    while cursor is not None:
+        rows, cursor = keyset_paginate(
+            db.session.query(Account.id, Account.level), Account, cursor, 4,
+            sort_column=Account.level, descending=descending
+        )
+        ids.extend(row.id for row in rows)
+
+    assert ids == _expected_ids(Account.level, descending)
+
+
+def test_invalid_cursor_is_rejected(app, client):
+    response = client.get('/api/accounts/', query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+def test_deep_cursor_page_matches_offset_page(app, client):
+    rows, per_page, page = 100_000, 20, 5000
+    _insert_accounts(create_user('seller'), rows, random.Random(3))
+    ordered = db.session.query(Account.id, Account.created_at).order_by(
+        Account.created_at.desc(), Account.id.desc()
+    ).all()
+    last = ordered[(page - 1) * per_page - 1]
+    deep_cursor = encode_cursor(last.created_at, last.id)
+
+    def fetch(**params):
+        started = time.perf_counter()
+        response = client.get('/api/accounts/', query_string={'per_page': per_page, **params})
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200
+        return [account['id'] for account in response.get_json()['accounts']], elapsed
+
+    first_ids, first = fetch(cursor='')
+    deep_ids, deep = fetch(cursor=deep_cursor)
+    offset_ids, offset = fetch(page=page)
+    print(f'\n第1页 {first * 1000:.1f}ms，游标第{page}页 {deep * 1000:.1f}ms，OFFSET 第{page}页 {offset * 1000:.1f}ms')
+
+    assert first_ids == [row.id for row in ordered[:per_page]]
+    assert deep_ids == offset_ids == [row.id for row in ordered[(page - 1) * per_page:page * per_page]]
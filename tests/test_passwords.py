@@ -0,0 +1,56 @@
+"""
+密码哈希进程池测试
+"""
+import os
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from backend.utils.passwords import PasswordHasher
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(METHOD, workers=2)
+    yield hasher
+    hasher.shutdown()
+
+
+def _break_pool(hasher):
+    """让一个子进程异常退出，进程池随之损坏"""
+    with pytest.raises(BrokenProcessPool):
+        hasher._executor.submit(os._exit, 1).result()
+
+
+def test_pool_does_not_fork_from_threaded_server(hasher):
+    assert hasher._executor._mp_context.get_start_method() in ('forkserver', 'spawn')
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+
+
+def test_broken_pool_is_rebuilt(hasher):
+    _break_pool(hasher)
+    pwhash = hasher.hash('secret')
+    assert hasher.verify(pwhash, 'secret')
+    assert not hasher.verify(pwhash, 'wrong')
+    # 之后的请求继续使用新的进程池
+    assert hasher._executor.submit(os.getpid).result() != os.getpid()
+
+
+def test_hash_many_survives_broken_pool(hasher):
+    _break_pool(hasher)
+    hashes = hasher.hash_many(['a', 'b'])
+    assert [hasher.verify(h, p) for h, p in zip(hashes, 'ab')] == [True, True]
+
+
+def test_falls_back_to_inline_hashing_when_pool_keeps_breaking(hasher, monkeypatch):
+    def broken_executor():
+        executor = PasswordHasher._new_executor(hasher)
+        with pytest.raises(BrokenProcessPool):
+            executor.submit(os._exit, 1).result()
+        return executor
+
+    _break_pool(hasher)
+    monkeypatch.setattr(hasher, '_new_executor', broken_executor)
+    pwhash = hasher.hash('secret')
+    assert pwhash.startswith(METHOD)
+    assert hasher.verify(pwhash, 'secret')
@@ -0,0 +1,138 @@
+"""
+账号全文检索测试
+
+触发器在账号增删改时同步 accounts_fts；不足3个字符的检索词退回 LIKE；
+FTS5 检索的结果与对同样四列做 LIKE 的结果一致。
+"""
+import random
+import time
+from sqlalchemy import or_, text
+from backend.migrations import upgrade_account_fts
+from backend.models import db, Account
+from backend.models.search import FTS_COLUMNS, apply_search
+from tests.conftest import create_user, create_account
+
+REGIONS = ['QQ区', '微信区', '安卓QQ', '苹果微信']
+RANKS = ['青铜', '白银', '黄金', '铂金', '钻石', '大师', '王者荣耀']
+LOCATIONS = ['北京朝阳', '上海浦东', '广州天河', '深圳南山', '成都高新']
+WORDS = ['满级', '带皮肤', '全英雄', '稀有刀皮', '可改密', '送体力', '高胜率', '限定']
+
+
+def _search(client, q, **params):
+    response = client.get('/api/accounts/', query_string={'q': q, 'per_page': 100, 'sort': 'newest', **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _search_ids(client, q, status='available'):
+    return sorted(account['id'] for account in _search(client, q, status=status)['accounts'])
+
+
+def _like_ids(keywords):
+    columns = [getattr(Account, name) for name in FTS_COLUMNS.values()]
+    query = db.session.query(Account.id)
+    for word in keywords:
+        query = query.filter(or_(*[col.like(f'%{word}%') for col in columns]))
+    return sorted(id_ for (id_,) in query)
+
+
+def test_triggers_keep_index_in_sync(app, client):
+    user = create_user('seller')
+    first = create_account(user, 'ACC1', remarks='稀有刀皮满级号', rank='王者荣耀', common_location='北京朝阳')
+    second = create_account(user, 'ACC2', remarks='普通账号')
+
+    assert _search_ids(client, '稀有刀皮') == [first]
+    assert _search_ids(client, '北京朝阳 王者荣耀') == [first]
+
+    # 更新检索列：旧内容不再命中，新内容命中
+    account = db.session.get(Account, second)
+    account.remarks = '限定皮肤全英雄'
+    db.session.commit()
+    assert _search_ids(client, '普通账号') == []
+    assert _search_ids(client, '全英雄') == [second]
+
+    # 只更新其他列不影响索引
+    account.price = 12345
+    account.status = 'rented'
+    db.session.commit()
+    assert _search_ids(client, '全英雄', status='rented') == [second]
+
+    # Core 批量插入同样触发同步
+    db.session.execute(Account.__table__.insert(), [{
+        'user_id': user, 'account_number': 'ACC3', 'server_region': 'QQ', 'remarks': '批量导入的稀有刀皮',
+        'pure_coin_assets': 100, 'total_assets': 1000, 'safe_box_slots': 4, 'price': 0, 'deposit': 0,
+        'order_amount': 0, 'knife_skin_mask': 0, 'status': 'available',
+    }])
+    db.session.commit()
+    third = db.session.query(Account.id).filter_by(account_number='ACC3').scalar()
+    assert _search_ids(client, '稀有刀皮') == sorted([first, third])
+
+    db.session.delete(db.session.get(Account, first))
+    db.session.commit()
+    assert _search_ids(client, '稀有刀皮') == [third]
+    assert _search_ids(client, '北京朝阳') == []
+
+
+def test_short_keywords_fall_back_to_like(app, client):
+    user = create_user('seller')
+    first = create_account(user, 'ACC1', server_region='QQ', remarks='满级')
+    second = create_account(user, 'ACC2', server_region='微信', remarks='满级号')
+
+    # 2个字符的检索词无法使用 trigram 索引
+    _, hits = apply_search(Account.query, Account, ['满级'])
+    assert hits is None
+    assert _search_ids(client, '满级') == [first, second]
+    assert _search_ids(client, 'QQ') == [first]
+    # 只要有一个检索词不足3个字符就整体退回 LIKE
+    assert _search_ids(client, '满级号 微信') == [second]
+    # 按相关度排序时同样可用
+    body = _search(client, '满级', sort='relevance')
+    assert body['total'] == 2
+
+
+def test_upgrade_indexes_existing_accounts(app, client):
+    user = create_user('seller')
+    account = create_account(user, 'ACC1', remarks='升级前发布的稀有刀皮')
+    # 模拟没有全文索引的旧数据库
+    for name in ('accounts_fts_insert', 'accounts_fts_delete', 'accounts_fts_update'):
+        db.session.execute(text(f'DROP TRIGGER {name}'))
+    db.session.execute(text('DROP TABLE accounts_fts'))
+    db.session.commit()
+
+    upgrade_account_fts()
+    db.session.commit()
+    assert _search_ids(client, '稀有刀皮') == [account]
+
+    # 再次升级不会重复导入
+    upgrade_account_fts()
+    db.session.commit()
+    assert db.session.execute(text('SELECT count(*) FROM accounts_fts')).scalar() == 1
+
+
+def test_fts_matches_like_on_large_table(app):
+    user = create_user('seller')
+    rng = random.Random(6)
+    rows = 100_000
+    table = Account.__table__
+    db.session.execute(table.insert(), [{
+        'user_id': user, 'account_number': f'ACC{i}', 'server_region': rng.choice(REGIONS),
+        'rank': rng.choice(RANKS), 'common_location': rng.choice(LOCATIONS),
+        'remarks': ''.join(rng.sample(WORDS, 3)),
+        'pure_coin_assets': 100, 'total_assets': 1000, 'safe_box_slots': 4, 'price': 0, 'deposit': 0,
+        'order_amount': 0, 'knife_skin_mask': 0, 'status': 'available',
+    } for i in range(rows)])
+    db.session.commit()
+
+    for keywords in (['稀有刀皮'], ['王者荣耀'], ['上海浦东', '高胜率'], ['苹果微信', '全英雄', '可改密'], ['不存在的词']):
+        started = time.perf_counter()
+        query, hits = apply_search(db.session.query(Account.id), Account, keywords)
+        assert hits is not None
+        fts_ids = sorted(id_ for (id_,) in query)
+        fts_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        like_ids = _like_ids(keywords)
+        like_elapsed = time.perf_counter() - started
+
+        print(f'\n{" ".join(keywords)}: {len(fts_ids)} 行，FTS5 {fts_elapsed * 1000:.1f}ms，LIKE {like_elapsed * 1000:.1f}ms')
+        assert fts_ids == like_ids
@@ -0,0 +1,96 @@
+"""
+序列化测试
+
+模型对象、结果行和列式输出的序列化结果一致，经过 JSON 编解码后能还原为原始的值；
+同时输出按列读取与构建模型对象两种方式的耗时。
+"""
+import time
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+import pytest
+from backend.models import db, Account, User
+from backend.models.account import account_serializer
+from backend.models.user import user_serializer
+from backend.utils.money import to_cents
+from tests.conftest import create_user, create_account
+
+
+def _row(serializer, model, id_):
+    return db.session.query(*serializer.columns).filter(model.id == id_).one()
+
+
+def test_account_round_trip(app):
+    user = create_user('seller')
+    account_id = create_account(
+        user, 'ACC1', price=123457, deposit=5, pure_coin_assets=250.75, knife_skins=['黑海', '龙牙'],
+        remarks='备注', collection_time=None
+    )
+    account = db.session.get(Account, account_id)
+
+    data = account_serializer.dump(account)
+    assert data == account.to_dict()
+    assert data == account_serializer.dump_row(_row(account_serializer, Account, account_id))
+    [values] = account_serializer.dump_columnar([_row(account_serializer, Account, account_id)])
+    assert dict(zip(account_serializer.fields, values)) == data
+
+    # JSON 编解码后还原
+    decoded = app.json.loads(app.json.dumps(data))
+    assert decoded == data
+    assert to_cents(decoded['price']) == account.price == 123457
+    assert to_cents(decoded['deposit']) == account.deposit == 5
+    assert to_cents(decoded['order_amount']) == account.order_amount
+    assert decoded['pure_coin_assets'] == 250.75
+    assert decoded['knife_skins'] == ['黑海', '龙牙']
+    assert decoded['collection_time'] is None
+    assert datetime.fromisoformat(decoded['created_at']) == account.created_at.replace(microsecond=0)
+
+    # 与 Flask 默认的 JSON 实现输出相同的内容
+    assert DefaultJSONProvider(app).loads(app.json.dumps(data)) == data
+
+
+def test_user_round_trip_with_dates(app):
+    user_id = create_user('user', balance=10)
+    user = db.session.get(User, user_id)
+    user.last_lottery_date = date(2024, 2, 29)
+    db.session.commit()
+
+    data = user.to_dict()
+    assert data['balance'] == 0.1
+    assert data['has_daily_lottery'] is True
+    assert user_serializer.dump_row(_row(user_serializer, User, user_id)).items() <= data.items()
+    assert app.json.loads(app.json.dumps(data)) == data
+
+
+def test_subset_keeps_field_order_and_rejects_unknown_fields(app):
+    subset = account_serializer.subset({'price', 'id', 'level'})
+    assert subset.fields == ('id', 'level', 'price')
+    assert account_serializer.subset({'level', 'price', 'id'}) is subset
+    assert account_serializer.subset({'id'}).dump_row((7,)) == {'id': 7}
+    with pytest.raises(ValueError):
+        account_serializer.subset({'id', 'password_hash'})
+
+
+def test_row_serialization_matches_model_serialization(app):
+    user = create_user('seller')
+    rows = 5000
+    db.session.execute(Account.__table__.insert(), [{
+        'user_id': user, 'account_number': f'ACC{i}', 'server_region': 'QQ', 'pure_coin_assets': i / 4,
+        'total_assets': 5000, 'safe_box_slots': 4, 'price': i, 'deposit': 2 * i, 'order_amount': i,
+        'level': i % 50 or None, 'knife_skins': ['黑海'], 'knife_skin_mask': 1, 'status': 'available',
+        'created_at': datetime(2024, 1, 1, 12, 0, i % 60), 'updated_at': datetime(2024, 1, 1),
+    } for i in range(rows)])
+    db.session.commit()
+
+    started = time.perf_counter()
+    from_rows = account_serializer.dump_rows(
+        db.session.query(*account_serializer.columns).order_by(Account.id).all()
+    )
+    rows_elapsed = time.perf_counter() - started
+    db.session.expunge_all()
+
+    started = time.perf_counter()
+    from_models = [account.to_dict() for account in Account.query.order_by(Account.id).all()]
+    models_elapsed = time.perf_counter() - started
+    print(f'\n{rows} 个账号：按列读取 {rows_elapsed * 1000:.1f}ms，构建模型对象 {models_elapsed * 1000:.1f}ms')
+
+    assert from_rows == from_models
@@ -0,0 +1,66 @@
+"""
+服务端会话测试
+
+登录时换用新的会话ID：登录前的会话ID（可能由攻击者预先植入）在登录后失效；
+登出后服务端记录立即删除。
+"""
+import pytest
+from tests.conftest import create_user
+
+pytestmark = pytest.mark.parametrize('session_type', ['memory', 'sqlalchemy'])
+
+
+def _login(client, username):
+    response = client.post('/api/auth/login', json={'username': username, 'password': 'secret'})
+    assert response.status_code == 200
+    return client.get_cookie('session').value
+
+
+def _current(client):
+    response = client.get('/api/auth/current')
+    return response.get_json()['user']['username'] if response.status_code == 200 else None
+
+
+def test_login_rotates_planted_session_id(app):
+    create_user('attacker', password='secret')
+    create_user('victim', password='secret')
+
+    attacker = app.test_client()
+    planted = _login(attacker, 'attacker')
+
+    # 受害者的浏览器被植入攻击者的会话ID后登录
+    victim = app.test_client()
+    victim.set_cookie('session', planted)
+    rotated = _login(victim, 'victim')
+
+    assert rotated != planted
+    assert _current(victim) == 'victim'
+    # 攻击者手中的旧会话ID已经失效，拿不到受害者的身份
+    assert _current(attacker) is None
+
+
+def test_login_again_discards_previous_session(app):
+    create_user('user', password='secret')
+    client = app.test_client()
+    first = _login(client, 'user')
+    second = _login(client, 'user')
+    assert first != second
+
+    stale = app.test_client()
+    stale.set_cookie('session', first)
+    assert _current(stale) is None
+    assert app.session_interface.store.count() == 1
+
+
+def test_logout_deletes_server_session(app):
+    create_user('user', password='secret')
+    client = app.test_client()
+    sid = _login(client, 'user')
+
+    assert client.post('/api/auth/logout').status_code == 200
+    assert client.get_cookie('session') is None
+    assert app.session_interface.store.count() == 0
+
+    replay = app.test_client()
+    replay.set_cookie('session', sid)
+    assert _current(replay) is None